@@ -0,0 +1,78 @@
+from __future__ import absolute_import
+
+import argparse
+import timeit
+
+import numpy as np
+
+from stratified_bayesian_optimization.kernels.matern52 import Matern52
+from stratified_bayesian_optimization.kernels.scaled_kernel import ScaledKernel
+from stratified_bayesian_optimization.kernels.tasks_kernel import TasksKernel
+from stratified_bayesian_optimization.kernels.product_kernels import ProductKernels
+from stratified_bayesian_optimization.lib.constant import (
+    MATERN52_NAME,
+    TASKS_KERNEL_NAME,
+)
+
+
+def cross_cov_building_kernel(kernel_ct, params, inputs_1, inputs_2, dimension, *args):
+    """
+    Evaluates the cross covariance as it was done before: building a kernel object from params.
+    """
+    kernel = kernel_ct.define_kernel_from_array(dimension, params, *args)
+    if kernel_ct == ProductKernels:
+        return kernel.cross_cov_dict(inputs_1, inputs_2)
+    return kernel.cross_cov(inputs_1, inputs_2)
+
+
+def time_per_call(function, n_calls):
+    """
+    :param function: f()
+    :param n_calls: int
+    :return: (float) microseconds per call
+    """
+    return 1e6 * min(timeit.repeat(function, number=n_calls, repeat=3)) / n_calls
+
+
+if __name__ == '__main__':
+    # Example:
+    # python -m scripts.benchmark_kernels --n_points 100 --n_calls 5000
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_points', type=int, help='number of historical points', default=100)
+    parser.add_argument('--dimension', type=int, help='dimension of the domain', default=4)
+    parser.add_argument('--n_tasks', type=int, help='number of tasks', default=5)
+    parser.add_argument('--n_calls', type=int, help='number of calls', default=5000)
+    args = parser.parse_args()
+
+    np.random.seed(1)
+    dimension = args.dimension
+    n_tasks = args.n_tasks
+
+    point = np.random.uniform(0, 1, (1, dimension))
+    points = np.random.uniform(0, 1, (args.n_points, dimension))
+    tasks = np.random.randint(0, n_tasks, (args.n_points, 1))
+
+    params_matern = np.random.uniform(1, 2, dimension)
+    params_scaled = np.concatenate((params_matern, [2.0]))
+    params_tasks = np.random.uniform(0, 1, n_tasks * (n_tasks + 1) / 2)
+    params_product = [params_matern, params_tasks]
+
+    inputs_1 = {MATERN52_NAME: point, TASKS_KERNEL_NAME: np.array([[0]])}
+    inputs_2 = {MATERN52_NAME: points, TASKS_KERNEL_NAME: tasks}
+
+    cases = [
+        (Matern52, (params_matern, point, points, dimension)),
+        (ScaledKernel, (params_scaled, point, points, dimension, [MATERN52_NAME])),
+        (TasksKernel, (params_tasks, np.array([[0]]), tasks, n_tasks)),
+        (ProductKernels, (params_product, inputs_1, inputs_2, [dimension, n_tasks],
+                          [MATERN52_NAME, TASKS_KERNEL_NAME])),
+    ]
+
+    print 'cross covariance 1x%d, microseconds per call' % args.n_points
+    print '%-16s %12s %12s %8s' % ('kernel', 'object', 'array', 'speedup')
+    for kernel_ct, arguments in cases:
+        before = time_per_call(
+            lambda: cross_cov_building_kernel(kernel_ct, arguments[0], *arguments[1:]),
+            args.n_calls)
+        after = time_per_call(lambda: kernel_ct.cross_cov_from_params(*arguments), args.n_calls)
+        print '%-16s %12.2f %12.2f %8.2f' % (kernel_ct.__name__, before, after, before / after)
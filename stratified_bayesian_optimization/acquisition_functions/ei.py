@@ -17,12 +17,15 @@ import itertools
 from stratified_bayesian_optimization.util.json_file import JSONFile
 from stratified_bayesian_optimization.lib.optimization import Optimization
 from stratified_bayesian_optimization.lib.parallel import Parallel
+from stratified_bayesian_optimization.bayesian.bayesian_evaluations import BayesianEvaluations
 from stratified_bayesian_optimization.lib.util import (
     wrapper_optimize,
     wrapper_objective_acquisition_function,
     wrapper_gradient_acquisition_function,
+    wrapper_objective_and_gradient_acquisition_function,
     wrapper_sgd,
     wrapper_evaluate_gradient_ei_sample_params,
+    optimize_batch_kriging_believer,
 )
 from stratified_bayesian_optimization.lib.constant import (
     LBFGS_NAME,
@@ -89,7 +92,7 @@ class EI(object):
         """
 
         post_parameters = self.gp.compute_posterior_parameters(
-            point, var_noise, mean, parameters_kernel)
+            point, var_noise, mean, parameters_kernel, diag_only=True)
 
         mu = post_parameters['mean']
         cov = post_parameters['cov']
@@ -104,11 +107,7 @@ class EI(object):
 
         second_term = np.sqrt(cov) * norm.pdf(normalized_factor)
 
-        evaluation = first_term + second_term
-        if len(evaluation.shape) == 2:
-            evaluation = evaluation[0, :]
-
-        return evaluation
+        return first_term + second_term
 
     def evaluate_gradient_sample_params(self, point, random_seed=None):
         """
@@ -142,6 +141,20 @@ class EI(object):
         :return: np.array(n)
         """
 
+        return self.evaluate_with_gradient(point, var_noise, mean, parameters_kernel)[1]
+
+    def evaluate_with_gradient(self, point, var_noise=None, mean=None, parameters_kernel=None):
+        """
+        Computes EI and its gradient. The posterior parameters and the historical best solution
+        are computed only once.
+
+        :param point: np.array(1xn)
+        :param var_noise: float
+        :param mean: float
+        :param parameters_kernel: np.array(l)
+        :return: (np.array(1), np.array(n))
+        """
+
         post_parameters = self.gp.compute_posterior_parameters(
             point, var_noise, mean, parameters_kernel)
 
@@ -154,6 +167,11 @@ class EI(object):
             var_noise, mean, parameters_kernel, self.noisy_evaluations)
 
         std = np.sqrt(cov)
+        normalized_factor = (mu - best) / std
+
+        evaluation = (mu - best) * norm.cdf(normalized_factor) + std * norm.pdf(normalized_factor)
+        if len(evaluation.shape) == 2:
+            evaluation = evaluation[0, :]
 
         gradient = self.gp.gradient_posterior_parameters(point, var_noise, mean, parameters_kernel,
                                                          parallel=False)
@@ -163,7 +181,6 @@ class EI(object):
         grad_std = 0.5 * grad_cov / np.sqrt(cov)
 
         grad_factor = (grad_mu * std - grad_std * (mu - best)) / cov
-        normalized_factor = (mu - best) / std
 
         first_term = grad_mu * norm.cdf(normalized_factor) + \
                      (mu - best) * grad_factor * norm.pdf(normalized_factor)
@@ -172,8 +189,20 @@ class EI(object):
                       std * norm.pdf(normalized_factor) * grad_factor * normalized_factor
 
         gradient = first_term + second_term
-        return gradient[0, :]
+        return evaluation, gradient[0, :]
+
+
+    def optimize_batch(self, q, **opt_params):
+        """
+        Chooses q points to evaluate simultaneously using the kriging believer strategy (see
+        optimize_batch_kriging_believer). The model must be a GPFittingGaussian.
 
+        :param q: (int) number of points
+        :param opt_params: arguments of optimize
+        :return: {'solution': np.array(qxn), 'optimal_value': np.array(q)}
+        """
+
+        return optimize_batch_kriging_believer(self, self.gp, q, **opt_params)
 
     def optimize(self, start=None, random_seed=None, parallel=True, n_restarts=10,
                  n_best_restarts=0, n_samples_parameters=0, start_new_chain=False,
@@ -197,11 +226,9 @@ class EI(object):
 
         if start_new_chain:
             if self.gp.name_model == BAYESIAN_QUADRATURE:
-                self.gp.gp.start_new_chain()
-                self.gp.gp.sample_parameters(DEFAULT_N_PARAMETERS)
+                self.gp.gp.update_chain(DEFAULT_N_PARAMETERS)
             else:
-                self.gp.start_new_chain()
-                self.gp.sample_parameters(DEFAULT_N_PARAMETERS)
+                self.gp.update_chain(DEFAULT_N_PARAMETERS)
 
         bounds = self.gp.bounds
 
@@ -232,19 +259,15 @@ class EI(object):
             start = np.array(start_points)
 
         if n_best_restarts > 0 and n_best_restarts < n_restarts:
-            point_dict = {}
-            for j in xrange(start.shape[0]):
-                point_dict[j] = start[j, :]
-            args = (False, None, True, 0, self, DEFAULT_N_PARAMETERS)
-            ei_values = Parallel.run_function_different_arguments_parallel(
-                wrapper_objective_acquisition_function, point_dict, *args)
-            values = [ei_values[i] for i in ei_values]
+            if self.gp.name_model == BAYESIAN_QUADRATURE:
+                gp_model = self.gp.gp
+            else:
+                gp_model = self.gp
+            values = BayesianEvaluations.evaluate(self.evaluate, start, gp_model,
+                                                  DEFAULT_N_PARAMETERS, None)[0]
             values_index = sorted(range(len(values)), key=lambda k: values[k])
             values_index = values_index[-n_best_restarts:]
-            start = []
-            for j in values_index:
-                start.append(point_dict[j])
-            start = np.array(start)
+            start = start[values_index, :]
 
         n_restarts = start.shape[0]
         bounds = [tuple(bound) for bound in self.bounds_opt]
@@ -259,7 +282,8 @@ class EI(object):
                 objective_function,
                 bounds,
                 grad_function,
-                minimize=False)
+                minimize=False,
+                value_and_grad=wrapper_objective_and_gradient_acquisition_function)
 
             args = (False, None, parallel, 0, optimization, self, n_samples_parameters)
 
@@ -436,20 +460,7 @@ class EI(object):
 
         # TODO: extend to the case where w can be continuous
 
-        n = vectors.shape[0]
-
-        points = {}
-        for i in xrange(n):
-            points[i] = vectors[i, :]
-
-        args = (False, None, False, 0, self,)
-        val = Parallel.run_function_different_arguments_parallel(
-            wrapper_objective_acquisition_function, points, *args)
-
-        values = np.zeros(n)
-        for i in xrange(n):
-            values[i] = val.get(i)
-
+        values = self.evaluate(vectors)
 
 
         f_name = self._filename_ei_evaluations(iteration=iteration,
@@ -466,8 +477,11 @@ class EI(object):
 
         return values
 
-    def clean_cache(self):
+    def clean_cache(self, keep_factors=False):
         """
         Cleans the cache
+
+        :param keep_factors: (boolean) If True, the Cholesky decompositions cached by the model
+            are kept (see GPFittingGaussian.clean_cache).
         """
-        self.gp.clean_cache()
+        self.gp.clean_cache(keep_factors=keep_factors)
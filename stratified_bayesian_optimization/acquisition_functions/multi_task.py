@@ -20,6 +20,7 @@ from stratified_bayesian_optimization.acquisition_functions.ei import EI
 from stratified_bayesian_optimization.initializers.log import SBOLog
 from stratified_bayesian_optimization.lib.util import (
     wrapper_objective_acquisition_function,
+    optimize_batch_kriging_believer,
 )
 from stratified_bayesian_optimization.lib.constant import (
     DEFAULT_N_PARAMETERS,
@@ -110,8 +111,7 @@ class MultiTasks(object):
         """
 
         if n_samples_parameters > 0 and start_new_chain:
-            self.bq.gp.start_new_chain()
-            self.bq.gp.sample_parameters(DEFAULT_N_PARAMETERS)
+            self.bq.gp.update_chain(DEFAULT_N_PARAMETERS)
 
         point = self.optimize_first(random_seed=random_seed, parallel=parallel,
                                     n_restarts=n_restarts,
@@ -124,14 +124,29 @@ class MultiTasks(object):
 
         return {'solution': solution, 'optimal_value': value}
 
+    def optimize_batch(self, q, **opt_params):
+        """
+        Chooses q points to evaluate simultaneously using the kriging believer strategy (see
+        optimize_batch_kriging_believer).
+
+        :param q: (int) number of points
+        :param opt_params: arguments of optimize
+        :return: {'solution': np.array(qxn), 'optimal_value': np.array(q)}
+        """
+
+        return optimize_batch_kriging_believer(self, self.bq.gp, q, **opt_params)
+
     def write_debug_data(self, problem_name, model_type, training_name, n_training, random_seed,
                          n_samples_parameters, **kwargs):
         self.ei.write_debug_data(problem_name, model_type, training_name, n_training, random_seed,
                                  n_samples_parameters)
 
-    def clean_cache(self):
+    def clean_cache(self, keep_factors=False):
         """
         Cleans the cache
+
+        :param keep_factors: (boolean) If True, the Cholesky decompositions cached by the GP are
+            kept (see GPFittingGaussian.clean_cache).
         """
-        self.ei_tasks.clean_cache()
-        self.ei.clean_cache()
+        self.ei_tasks.clean_cache(keep_factors=keep_factors)
+        self.ei.clean_cache(keep_factors=keep_factors)
@@ -32,6 +32,7 @@ from stratified_bayesian_optimization.bayesian.bayesian_evaluations import Bayes
 from stratified_bayesian_optimization.lib.affine_break_points import (
     AffineBreakPointsPrep,
     AffineBreakPoints,
+    AffineBreakPointsBatch,
 )
 from stratified_bayesian_optimization.services.domain import (
     DomainService,
@@ -44,22 +45,23 @@ from stratified_bayesian_optimization.lib.util import (
     wrapper_optimization,
     wrapper_objective_voi,
     wrapper_gradient_voi,
+    wrapper_objective_and_gradient_voi,
     wrapper_evaluate_sbo_by_sample,
     wrapper_optimize,
     wrapper_evaluate_sample,
     wrapper_evaluate_gradient_sample,
     wrapper_evaluate_sbo_mc,
-    wrapper_get_parameters_for_samples,
     wrapper_evaluate_sample_bayesian,
     wrapper_evaluate_sbo_by_sample_bayesian,
     wrapper_evaluate_sbo_by_sample_2,
     wrapper_grad_voi_sgd,
     wrapper_sgd,
-    wrapper_get_parameters_for_samples_2,
     wrapper_evaluate_sbo_by_sample_bayesian_2,
     wrapper_evaluate_hessian_sample,
     wrapper_evaluate_sbo_by_sample_no_sp,
+    wrapper_evaluate_sbo_by_samples_batch,
     wrapper_optimize_posterior_mean,
+    optimize_batch_kriging_believer,
 )
 from stratified_bayesian_optimization.lib.constant import DEFAULT_N_PARAMETERS, DEFAULT_N_SAMPLES
 from stratified_bayesian_optimization.util.json_file import JSONFile
@@ -138,7 +140,7 @@ class SBO(object):
                                random_seed, n_samples_parameters)
 
     def evaluate_sample(self, point, candidate_point, sample, var_noise=None, mean=None,
-                        parameters_kernel=None, cache=True, n_threads=0, clear_cache=True):
+                        parameters_kernel=None, cache=True, n_threads=0):
         """
         Evaluate a sample of a_{n+1}(point) given that candidate_point is chosen.
 
@@ -158,8 +160,7 @@ class SBO(object):
 
         vectors = self.bq.compute_parameters_for_sample(
             point, candidate_point, var_noise=var_noise, mean=mean,
-            parameters_kernel=parameters_kernel, cache=cache, n_threads=n_threads,
-            clear_cache=clear_cache)
+            parameters_kernel=parameters_kernel, cache=cache, n_threads=n_threads)
         value = vectors['a'] + sample * vectors['b']
 
         return value[0, 0]
@@ -365,6 +366,124 @@ class SBO(object):
 
         return {'max': max_, 'optimum': arg_max}
 
+    def evaluate_samples_points(self, points, samples, candidate_point, var_noise=None,
+                                mean=None, parameters_kernel=None, cache=True):
+        """
+        Evaluate the samples of a_{n+1}(points[i, :]) given that candidate_point is chosen, where
+        samples[i] is the sample of the Gaussian r.v. of the point i.
+
+        :param points: np.array(txn)
+        :param samples: np.array(t)
+        :param candidate_point: np.array(1xm)
+        :param var_noise: float
+        :param mean: float
+        :param parameters_kernel: np.array(l)
+        :param cache: (boolean) Use cached data and cache data if cache is True
+        :return: np.array(t)
+        """
+        vectors = self.bq.compute_parameters_for_points(
+            points, candidate_point, var_noise=var_noise, mean=mean,
+            parameters_kernel=parameters_kernel, cache=cache)
+
+        return vectors['a'] + samples * vectors['b']
+
+    def evaluate_gradient_samples_points(self, points, samples, candidate_point, var_noise=None,
+                                         mean=None, parameters_kernel=None, cache=True):
+        """
+        Evaluate the gradients of the samples of a_{n+1}(points[i, :]) given that candidate_point
+        is chosen, where samples[i] is the sample of the Gaussian r.v. of the point i.
+
+        :param points: np.array(txn)
+        :param samples: np.array(t)
+        :param candidate_point: np.array(1xm)
+        :param var_noise: float
+        :param mean: float
+        :param parameters_kernel: np.array(l)
+        :param cache: (boolean) Use cached data and cache data if cache is True
+        :return: np.array(txn)
+        """
+        gradient_params = self.bq.compute_gradient_parameters_for_points(
+            points, candidate_point, var_noise=var_noise, mean=mean,
+            parameters_kernel=parameters_kernel, cache=cache)
+
+        return gradient_params['a'] + samples[:, np.newaxis] * gradient_params['b']
+
+    def evaluate_sbo_by_samples_batch(self, candidate_point, samples, var_noise=None, mean=None,
+                                      parameters_kernel=None, n_restarts=5, **opt_params_mc):
+        """
+        Optimize a_{n+1}(x) given the candidate_point for all the samples of the Gaussian r.v.
+        simultaneously. All the samples share the same starting points, and the points of all the
+        samples and restarts are optimized together with vectorized evaluations of a_{n+1} and its
+        gradient (see Optimization.optimize_batch).
+
+        :param candidate_point: np.array(1xn)
+        :param samples: np.array(s)
+        :param var_noise: float
+        :param mean: float
+        :param parameters_kernel: np.array(l)
+        :param n_restarts: (int) Number of restarts of the optimization algorithm.
+        :param opt_params_mc:
+            -'factr': int
+            -'maxiter': int
+        :return: {'max': np.array(s), 'optimum': np.array(sxn)}
+        """
+
+        bounds_x = [self.bounds_opt[i] for i in xrange(len(self.bounds_opt)) if i in
+                    self.bq.x_domain]
+
+        dim_x = len(bounds_x)
+        n_samples = len(samples)
+
+        if var_noise is None:
+            index_cache = 'mc_mean'
+        else:
+            index_cache = (var_noise, mean, tuple(parameters_kernel))
+
+        start_points = DomainService.get_points_domain(n_restarts + 1, bounds_x,
+                                                       type_bounds=len(bounds_x) * [0])
+        if index_cache in self.bq.optimal_solutions and \
+                len(self.bq.optimal_solutions[index_cache]) > 0:
+            start = self.bq.optimal_solutions[index_cache][-1]['solution']
+            start_points = [start] + start_points[0: -1]
+        start = np.array(start_points)
+        n_starts = start.shape[0]
+
+        starts = np.tile(start, (n_samples, 1))
+        samples_starts = np.repeat(samples, n_starts)
+
+        optimization = Optimization(
+            LBFGS_NAME,
+            self.evaluate_samples_points,
+            [tuple(bound) for bound in bounds_x],
+            self.evaluate_gradient_samples_points,
+            minimize=False, **opt_params_mc)
+
+        results = optimization.optimize_batch(
+            starts, (samples_starts,), (candidate_point, var_noise, mean, parameters_kernel))
+
+        values = results['optimal_value'].reshape((n_samples, n_starts))
+        solutions = results['solution'].reshape((n_samples, n_starts, dim_x))
+
+        index_max = np.argmax(values, axis=1)
+        max_ = values[np.arange(n_samples), index_max]
+        arg_max = solutions[np.arange(n_samples), index_max, :]
+
+        if dim_x < 7:
+            vertex = np.array(list(itertools.product(*bounds_x)))
+            vectors = self.bq.compute_parameters_for_points(
+                vertex, candidate_point, var_noise=var_noise, mean=mean,
+                parameters_kernel=parameters_kernel)
+            values_vertex = vectors['a'][np.newaxis, :] + \
+                samples[:, np.newaxis] * vectors['b'][np.newaxis, :]
+
+            index_vertex = np.argmax(values_vertex, axis=1)
+            max_vertex = values_vertex[np.arange(n_samples), index_vertex]
+            better = max_vertex > max_
+            max_[better] = max_vertex[better]
+            arg_max[better, :] = vertex[index_vertex[better], :]
+
+        return {'max': max_, 'optimum': arg_max}
+
     def generate_samples_starting_points_evaluate_mc(self, n_samples, n_restarts, cache=True):
 
         samples = np.random.normal(0, 1, n_samples)
@@ -431,13 +550,7 @@ class SBO(object):
             value = self.mc_bayesian[tuple(candidate_point[0,:])]
             return value
 
-        arguments = {}
-        for i in xrange(n_samples_parameters):
-            arguments[i] = [parameters[i][2:], parameters[i][0], parameters[i][1]]
-
-        args = (False, None, True, n_threads, candidate_point, self)
-        Parallel.run_function_different_arguments_parallel(
-            wrapper_get_parameters_for_samples, arguments, *args)
+        self.bq.get_parameters_for_samples_batch(candidate_point, parameters)
 
         point_dict = {}
         point_start = {}
@@ -523,7 +636,7 @@ class SBO(object):
     def evaluate_mc_bayesian_candidate_points_no_restarts(
             self, candidate_points, n_samples_parameters, n_samples, n_restarts=10,
             n_threads=0, compute_max_mean=False, compute_gradient=False,
-            method_opt=None, **opt_params_mc):
+            method_opt=None, batch_samples=False, **opt_params_mc):
         """
         Computes the SBO in parallel for several candidate_points. We don't do in parallel the
         restart points.
@@ -536,6 +649,9 @@ class SBO(object):
         :param compute_max_mean:
         :param compute_gradient: boolean
         :param method_opt: str
+        :param batch_samples: (boolean) If True, all the samples of the Gaussian r.v. are optimized
+            simultaneously in one job for each parameter and candidate point
+            (see evaluate_sbo_by_samples_batch), and method_opt is ignored.
         :param opt_params_mc:
         :return: {'evaluations': np.array(n), 'gradient': np.array(nxk)}
         """
@@ -555,37 +671,45 @@ class SBO(object):
 
         n_restarts = start.shape[0]
 
-        arguments = {}
-
         n_candidate_points = candidate_points.shape[0]
 
         for j in xrange(n_candidate_points):
-            for i in xrange(n_samples_parameters):
-                arguments[(j, i)] = [parameters[i][2:], parameters[i][0], parameters[i][1],
-                                     candidate_points[j:j+1,:]]
+            self.bq.get_parameters_for_samples_batch(candidate_points[j:j+1, :], parameters)
+
+        if batch_samples:
+            point_dict = {}
+            for l in xrange(n_candidate_points):
+                for k in xrange(n_samples_parameters):
+                    point_dict[(k, l)] = [candidate_points[l:l+1,:], samples, parameters[k]]
 
-        args = (False, None, True, n_threads, self)
-        Parallel.run_function_different_arguments_parallel(
-            wrapper_get_parameters_for_samples_2, arguments, *args)
+            args = (False, None, True, n_threads, self, n_restarts)
 
-        point_start = {}
+            simulated_batches = Parallel.run_function_different_arguments_parallel(
+                wrapper_evaluate_sbo_by_samples_batch, point_dict, *args, **opt_params_mc)
 
-        for l in xrange(n_candidate_points):
-            for k in xrange(n_samples_parameters):
+            simulated_values = {}
+            for (k, l), batch in simulated_batches.iteritems():
                 for i in xrange(n_samples):
-                    point_start[(i, k, l)] = \
-                        [candidate_points[l:l+1,:], samples[i], parameters[k]]
+                    simulated_values[(i, k, l)] = \
+                        {'max': batch['max'][i], 'optimum': batch['optimum'][i, :]}
+        else:
+            point_start = {}
 
+            for l in xrange(n_candidate_points):
+                for k in xrange(n_samples_parameters):
+                    for i in xrange(n_samples):
+                        point_start[(i, k, l)] = \
+                            [candidate_points[l:l+1,:], samples[i], parameters[k]]
 
-        point_dict = point_start
+            point_dict = point_start
 
-        if method_opt is None:
-            method_opt = LBFGS_NAME
+            if method_opt is None:
+                method_opt = LBFGS_NAME
 
-        args = (False, None, True, n_threads, self, n_threads, method_opt, n_restarts)
+            args = (False, None, True, n_threads, self, n_threads, method_opt, n_restarts)
 
-        simulated_values = Parallel.run_function_different_arguments_parallel(
-            wrapper_evaluate_sbo_by_sample_no_sp, point_dict, *args, **opt_params_mc)
+            simulated_values = Parallel.run_function_different_arguments_parallel(
+                wrapper_evaluate_sbo_by_sample_no_sp, point_dict, *args, **opt_params_mc)
 
         evaluations = np.zeros(n_candidate_points)
         gradient = None
@@ -703,18 +827,10 @@ class SBO(object):
 
         n_restarts = start.shape[0]
 
-        arguments = {}
-
         n_candidate_points = candidate_points.shape[0]
 
         for j in xrange(n_candidate_points):
-            for i in xrange(n_samples_parameters):
-                arguments[(j, i)] = [parameters[i][2:], parameters[i][0], parameters[i][1],
-                                     candidate_points[j:j+1,:]]
-
-        args = (False, None, True, n_threads, self)
-        Parallel.run_function_different_arguments_parallel(
-            wrapper_get_parameters_for_samples_2, arguments, *args)
+            self.bq.get_parameters_for_samples_batch(candidate_points[j:j+1, :], parameters)
 
         point_start = {}
 
@@ -849,18 +965,10 @@ class SBO(object):
 
         n_restarts = start.shape[0]
 
-        arguments = {}
-
         n_candidate_points = candidate_points.shape[0]
 
         for j in xrange(n_candidate_points):
-            for i in xrange(n_samples_parameters):
-                arguments[(j, i)] = [parameters[i][2:], parameters[i][0], parameters[i][1],
-                                     candidate_points[j:j+1,:]]
-
-        args = (False, None, True, n_threads, self)
-        Parallel.run_function_different_arguments_parallel(
-            wrapper_get_parameters_for_samples_2, arguments, *args)
+            self.bq.get_parameters_for_samples_batch(candidate_points[j:j+1, :], parameters)
 
         point_start = {}
 
@@ -1473,6 +1581,58 @@ class SBO(object):
 
         return gradient
 
+    def evaluate_with_gradient(self, point, var_noise=None, mean=None, parameters_kernel=None,
+                               cache=True, n_threads=0):
+        """
+        Evaluates the acquisition function and its gradient at the point. The vectors a and b,
+        and their upper envelope, are computed only once.
+
+        :param point: np.array(1xn)
+        :param var_noise: float
+        :param mean: float
+        :param parameters_kernel: np.array(l)
+        :param cache: (boolean) Use cached data and cache data if cache is True
+        :param n_threads: int
+
+        :return: (float, np.array(n))
+        """
+
+        vectors = self.bq.compute_posterior_parameters_kg(self.discretization, point,
+                                                          var_noise=var_noise, mean=mean,
+                                                          parameters_kernel=parameters_kernel,
+                                                          cache=cache, n_threads=n_threads)
+
+        a = vectors['a']
+        b = vectors['b']
+
+        if not np.all(np.isfinite(b)):
+            return 0.0, np.zeros(point.shape[1])
+
+        a, b, keep = AffineBreakPointsPrep(a, b)
+        keep1, c = AffineBreakPoints(a, b)
+        keep1 = keep1.astype(np.int64)
+        M = len(keep1)
+
+        value = self.hvoi(b, c, keep1)
+
+        if M <= 1:
+            return value, np.zeros(point.shape[1])
+
+        keep = keep[keep1]
+
+        c = c[keep1 + 1]
+        c2 = np.abs(c[0:M - 1])
+        evalC = norm.pdf(c2)
+
+        gradients = self.bq.gradient_vector_b(point, self.discretization[keep, :],
+                                              var_noise=var_noise, mean=mean,
+                                              parameters_kernel=parameters_kernel, cache=cache,
+                                              keep_indexes=keep, n_threads=n_threads)
+
+        gradient = np.dot(evalC, np.diff(gradients, axis=0))
+
+        return value, gradient
+
     def objective_voi(self, point, monte_carlo=False, n_samples=1, n_restarts=1, n_best_restarts=0,
                       n_threads=0, method_opt=None, *model_params, **opt_params_mc):
         """
@@ -1534,6 +1694,35 @@ class SBO(object):
 
         return grad
 
+    def objective_voi_with_gradient(self, point, monte_carlo=False, n_samples=1, n_restarts=1,
+                                    n_best_restarts=0, n_threads=0, method_opt=None,
+                                    *model_params, **opt_params_mc):
+        """
+        Evaluates the VOI and its gradient at point.
+        :param point: np.array(n)
+        :param monte_carlo: (boolean) If True, estimates the function by MC.
+        :param n_samples: (int) Number of samples for the MC method.
+        :param n_restarts: (int) Number of restarts to optimize a_{n+1} given a sample.
+        :param n_best_restarts: (int)
+        :param n_threads: (int)
+        :param model_params: (var_noise, mean, parameters_kernel)
+        :param opt_params_mc:
+            -'factr': int
+            -'maxiter': int
+        :return: (float, np.array(n))
+        """
+
+        if not monte_carlo:
+            point = point.reshape((1, len(point)))
+            return self.evaluate_with_gradient(point, *model_params, n_threads=n_threads)
+
+        value = self.objective_voi(point, monte_carlo, n_samples, n_restarts, n_best_restarts,
+                                   n_threads, method_opt, *model_params, **opt_params_mc)
+        grad = self.grad_obj_voi(point, monte_carlo, n_samples, n_restarts, n_best_restarts,
+                                 n_threads, method_opt, *model_params, **opt_params_mc)
+
+        return value, grad
+
     def random_points_domain(self, n_points):
         """
         Sample n_points random points from the domain of SBO
@@ -1568,12 +1757,24 @@ class SBO(object):
 
         return np.array(start_points)
 
+    def optimize_batch(self, q, **opt_params):
+        """
+        Chooses q points to evaluate simultaneously using the kriging believer strategy (see
+        optimize_batch_kriging_believer).
+
+        :param q: (int) number of points
+        :param opt_params: arguments of optimize
+        :return: {'solution': np.array(qxn), 'optimal_value': np.array(q)}
+        """
+
+        return optimize_batch_kriging_believer(self, self.bq.gp, q, **opt_params)
+
     def optimize(self, start=None, random_seed=None, parallel=True, monte_carlo=False, n_samples=1,
                  n_restarts_mc=1, n_best_restarts_mc=0, n_restarts=1, n_best_restarts=0,
                  start_ei=True, n_samples_parameters=0, start_new_chain=True,
                  compute_max_mean_bayesian=False, maxepoch=10, default_n_samples=None,
                  default_n_samples_parameters=None, default_restarts_mc=None, method_opt_mc=None,
-                 **opt_params_mc):
+                 batch_samples=False, **opt_params_mc):
         """
         Optimizes the VOI.
         :param start: np.array(1xn)
@@ -1595,6 +1796,8 @@ class SBO(object):
         :param default_n_samples_parameters: (int)
         :param default_restarts_mc: int
         :param method_opt_mc: str
+        :param batch_samples: (boolean) If True, the samples of a_{n+1} are optimized
+            simultaneously (see evaluate_mc_bayesian_candidate_points_no_restarts).
         :param opt_params_mc:
             -'factr': int
             -'maxiter': int
@@ -1626,8 +1829,7 @@ class SBO(object):
         n_threads = max(int((mp.cpu_count() - n_jobs) / n_jobs), 1)
 
         if n_samples_parameters > 0 and start_new_chain:
-            self.bq.gp.start_new_chain()
-            self.bq.gp.sample_parameters(n_parameters)
+            self.bq.gp.update_chain(n_parameters)
         elif n_samples_parameters > 0 and len(self.bq.gp.samples_parameters) < n_parameters:
             self.bq.gp.sample_parameters(n_parameters - len(self.bq.gp.samples_parameters))
 
@@ -1774,7 +1976,8 @@ class SBO(object):
                     output = self.evaluate_mc_bayesian_candidate_points_no_restarts(
                         candidate_points, n_parameters, default_n_samples, default_restarts_mc,
                         n_threads=0, compute_max_mean=True,
-                        compute_gradient=False, method_opt=method_opt_mc, **opt_params_mc)
+                        compute_gradient=False, method_opt=method_opt_mc,
+                        batch_samples=batch_samples, **opt_params_mc)
 
                     evaluations = output['evaluations']
 
@@ -1807,7 +2010,8 @@ class SBO(object):
                 wrapper_objective_voi,
                 bounds,
                 wrapper_gradient_voi,
-                minimize=False, **{'maxiter': 10})
+                minimize=False, value_and_grad=wrapper_objective_and_gradient_voi,
+                **{'maxiter': 10})
 
             if n_restarts > int( mp.cpu_count() / 2):
                 args = (False, None, parallel, 0, optimization, self, monte_carlo, n_samples,
@@ -1883,7 +2087,7 @@ class SBO(object):
             output = self.evaluate_mc_bayesian_candidate_points_no_restarts(
                 candidate_points, n_parameters, default_n_samples, default_restarts_mc,
                 n_threads=0, compute_max_mean=True, compute_gradient=True,
-                method_opt=method_opt_mc, **opt_params_mc)
+                method_opt=method_opt_mc, batch_samples=batch_samples, **opt_params_mc)
 
             evaluations = output['evaluations']
             gradients = output['gradient']
@@ -1959,11 +2163,43 @@ class SBO(object):
         else:
             return 0
 
-    def clean_cache(self):
+    @staticmethod
+    def hvoi_batch(a, b):
+        """
+        Computes hvoi for each column of b, i.e. E[max_i a_i + b_i Z] - max_i a_i where Z is a
+        standard normal r.v., using the envelopes of all the columns at once (see
+        AffineBreakPointsBatch). It's zero for the columns with non-finite values.
+
+        :param a: np.array(n)
+        :param b: np.array(nxr)
+        :return: np.array(r)
+        """
+        values = np.zeros(b.shape[1])
+
+        finite = np.all(np.isfinite(b), axis=0)
+        if not np.any(finite):
+            return values
+
+        slopes, c, length = AffineBreakPointsBatch(a, b[:, finite])
+
+        M = b.shape[0]
+        c2 = -np.abs(c[1:M, :])
+        tmp = norm.pdf(c2) + c2 * norm.cdf(c2)
+
+        in_envelope = np.arange(M - 1)[:, np.newaxis] < (length - 1)[np.newaxis, :]
+        values[finite] = np.sum(
+            np.where(in_envelope, np.diff(slopes, axis=0) * tmp, 0.0), axis=0)
+
+        return values
+
+    def clean_cache(self, keep_factors=False):
         """
         Cleans the cache
+
+        :param keep_factors: (boolean) If True, the Cholesky decompositions cached by the GP are
+            kept (see GPFittingGaussian.clean_cache).
         """
-        self.bq.clean_cache()
+        self.bq.clean_cache(keep_factors=keep_factors)
         self.samples = None
         self.optimal_samples = {}
         self.starting_points_sbo = None
@@ -584,11 +584,14 @@ class SDE(object):
         return {'solution': self.iteration_algorithm(n_restarts, n_samples), 'optimal_value': 0}
 
 
-    def clean_cache(self):
+    def clean_cache(self, keep_factors=False):
         """
         Cleans the cache
+
+        :param keep_factors: (boolean) If True, the Cholesky decompositions cached by the model
+            are kept (see GPFittingGaussian.clean_cache).
         """
-        self.gp.clean_cache()
+        self.gp.clean_cache(keep_factors=keep_factors)
         self.parameters = None
 
     def write_debug_data(self, *args, **kwargs):
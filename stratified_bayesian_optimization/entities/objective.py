@@ -4,12 +4,13 @@ from os import path
 import os
 
 from stratified_bayesian_optimization.services.training_data import TrainingDataService
-from stratified_bayesian_optimization.util.json_file import JSONFile
+from stratified_bayesian_optimization.util.json_journal import JSONJournal
 from stratified_bayesian_optimization.lib.constant import (
     PARTIAL_RESULTS,
     PROBLEM_DIR,
     SBO_METHOD,
     MULTI_TASK_METHOD,
+    JOURNAL_COMPACTION_INTERVAL,
 )
 
 
@@ -41,8 +42,8 @@ class Objective(object):
         self.n_training = n_training
         self.problem_name = problem_name
         self.training_name = training_name
-        name_module = TrainingDataService.get_name_module(problem_name)
-        self.module = __import__(name_module, globals(), locals(), -1)
+        self.name_module = TrainingDataService.get_name_module(problem_name)
+        self.module = __import__(self.name_module, globals(), locals(), -1)
         self.method = method
         self.n_samples_parameters = n_samples_parameters
 
@@ -51,22 +52,21 @@ class Objective(object):
         if not os.path.exists(dir):
             os.mkdir(dir)
 
-        file_name = self._filename(
-            problem_name=self.problem_name,
-            training_name=self.training_name,
-            n_points=self.n_training,
-            random_seed=self.random_seed,
-            method=self.method,
-            n_samples_parameters=self.n_samples_parameters,
-        )
+        self.file_path = self.get_file_path(self.problem_name, self.training_name,
+                                            self.random_seed, self.n_training, self.method,
+                                            self.n_samples_parameters)
 
-        self.file_path = path.join(dir, file_name)
+        # Each point is appended to the journal, which is compacted into the file every
+        # JOURNAL_COMPACTION_INTERVAL points (see add_point and read_results).
+        self.journal = JSONJournal(self.file_path)
 
-    def add_point(self, point, model_objective_value):
+    def add_point(self, point, model_objective_value, evaluation=None):
         """
 
         :param point: np.array(k)
         :param model_objective_value: float
+        :param evaluation: (output of evaluate_objective) If it's None, the objective is
+            evaluated at point. It's given when the objective was evaluated in the background.
 
         :return: float (optimal value)
         """
@@ -74,17 +74,103 @@ class Objective(object):
         self.evaluated_points.append(list(point))
         self.model_objective_values.append(model_objective_value)
 
-        eval = self.evaluate_objective(self.module, list(point), n_samples=self.n_samples)
+        eval = evaluation
+        if eval is None:
+            eval = self.evaluate_objective(self.module, list(point), n_samples=self.n_samples)
         self.objective_values.append(eval[0])
 
+        record = {
+            'index': len(self.evaluated_points) - 1,
+            'point': list(point),
+            'model_objective_value': model_objective_value,
+            'objective_value': eval[0],
+        }
+
         if self.noise:
             self.standard_deviation_evaluations.append(eval[1])
+            record['standard_deviation_evaluation'] = eval[1]
 
-        data = self.serialize()
-        JSONFile.write(data, self.file_path)
+        # The first point is written with the whole file, which may have results of a previous
+        # run.
+        if self.journal.n_compactions == 0 or \
+                self.journal.n_records >= JOURNAL_COMPACTION_INTERVAL:
+            self.compact()
+        else:
+            self.journal.append(record)
 
         return eval[0]
 
+    def compact(self):
+        """
+        Writes all the results to the file, and empties the journal.
+        """
+        self.journal.compact(self.serialize())
+
+    @staticmethod
+    def _apply_record(data, record):
+        """
+        Adds a point of the journal to the results.
+
+        :param data: (dict) output of serialize, or None
+        :param record: (dict) record written by add_point
+        :return: dict
+        """
+        if data is None:
+            data = {
+                'evaluated_points': [],
+                'objective_values': [],
+                'model_objective_values': [],
+                'standard_deviation_evaluations': [],
+            }
+
+        # The record may be already in the file if the process died while compacting.
+        if record['index'] != len(data['evaluated_points']):
+            return data
+
+        data['evaluated_points'].append(record['point'])
+        data['objective_values'].append(record['objective_value'])
+        data['model_objective_values'].append(record['model_objective_value'])
+
+        if 'standard_deviation_evaluation' in record:
+            data['standard_deviation_evaluations'].append(record['standard_deviation_evaluation'])
+
+        return data
+
+    @classmethod
+    def get_file_path(cls, problem_name, training_name, random_seed, n_training,
+                      method=SBO_METHOD, n_samples_parameters=0):
+        """
+        Path of the file where the results of an Objective are written.
+
+        :param problem_name: (str)
+        :param training_name: (str)
+        :param random_seed: int
+        :param n_training: int
+        :param method: (str) bgo method
+        :param n_samples_parameters: int
+        :return: str
+        """
+        file_name = cls._filename(
+            problem_name=problem_name,
+            training_name=training_name,
+            n_points=n_training,
+            random_seed=random_seed,
+            method=method,
+            n_samples_parameters=n_samples_parameters,
+        )
+
+        return path.join(PROBLEM_DIR, problem_name, PARTIAL_RESULTS, file_name)
+
+    @classmethod
+    def read_results(cls, file_path):
+        """
+        Reads the results written by an Objective: the file plus the points of its journal.
+
+        :param file_path: str
+        :return: (dict) output of serialize, or None if there are no results
+        """
+        return JSONJournal.read(file_path, cls._apply_record)
+
 
     def serialize(self):
         return {
@@ -95,7 +181,7 @@ class Objective(object):
         }
 
     def set_data_from_file(self):
-        data = JSONFile.read(self.file_path)
+        data = self.read_results(self.file_path)
 
         if data is None:
             return
@@ -105,6 +105,13 @@ class RunSpecEntity(Model):
     optimize_only_posterior_mean = BooleanType(required=False)
     start_optimize_posterior_mean = IntType(required=False)
 
+    # Writes the state of the run after each iteration, and resumes the run from it
+    checkpoint = BooleanType(required=False)
+    resume = BooleanType(required=False)
+
+    # Sends the large arrays to the workers of the pool through memory-mapped files
+    shared_memory = BooleanType(required=False)
+
     @classmethod
     def from_json(cls, specfile):
         """
@@ -176,11 +176,38 @@ class Matern52(AbstractKernel):
         :param inputs_2: np.array(mxd)
         :return: np.array(nxm)
         """
-        r2 = np.abs(Distances.dist_square_length_scale(self.length_scale.value, inputs_1, inputs_2))
+        return self.cross_cov_from_params(self.length_scale.value, inputs_1, inputs_2,
+                                          self.dimension)
+
+    @staticmethod
+    def cross_cov_from_params(params, inputs_1, inputs_2, dimension, **kwargs):
+        """
+        Stateless evaluation of the covariance of the kernel defined by params. No kernel object
+        is built.
+
+        :param params: (np.array(k)) The first part are the parameters for length_scale.
+        :param inputs_1: np.array(nxd)
+        :param inputs_2: np.array(mxd)
+        :param dimension: (int) dimension of the domain of the kernel
+        :return: np.array(nxm)
+        """
+        r2 = np.abs(Distances.dist_square_length_scale(params[0:dimension], inputs_1, inputs_2))
         r = np.sqrt(r2)
         cov = (1.0 + np.sqrt(5)*r + (5.0/3.0)*r2) * np.exp(-np.sqrt(5)*r)
         return cov
 
+    @classmethod
+    def cov_from_params(cls, params, inputs, dimension, **kwargs):
+        """
+        Stateless evaluation of the covariance matrix of the kernel defined by params.
+
+        :param params: (np.array(k)) The first part are the parameters for length_scale.
+        :param inputs: np.array(nxd)
+        :param dimension: (int) dimension of the domain of the kernel
+        :return: np.array(nxn)
+        """
+        return cls.cross_cov_from_params(params, inputs, inputs, dimension)
+
     def gradient_respect_parameters(self, inputs):
         """
 
@@ -245,6 +272,49 @@ class Matern52(AbstractKernel):
         matern52 = cls.define_kernel_from_array(dimension, params)
         return matern52.hessian_respect_point(point, inputs)
 
+    @staticmethod
+    def derivatives_respect_point_from_params(params, point, inputs, dimension, hessian=False):
+        """
+        Stateless evaluation of cov(point, inputs), and of its gradient and Hessian respect to
+        the point, from a single computation of the distances. If point has n rows, they're
+        computed for each pair (point[i], inputs[i]).
+
+        :param params: (np.array(k)) The first part are the parameters for length_scale.
+        :param point: np.array(1xd) or np.array(nxd)
+        :param inputs: np.array(nxd)
+        :param dimension: (int) dimension of the domain of the kernel
+        :param hessian: (boolean) Computes the Hessian if it's True.
+        :return: {
+            'cov': np.array(n),
+            'gradient': np.array(nxd),
+            'hessian': np.array(nxdxd), only if hessian is True
+        }
+        """
+        ls = params[0:dimension]
+
+        r2 = np.abs(Distances.dist_square_length_scale_respect_point(ls, point, inputs))[0, :]
+        r = np.sqrt(r2)
+        scaled_differences = (point - inputs) / (ls ** 2)
+        exp_r = np.exp(-np.sqrt(5) * r)
+
+        # The derivative of the covariance respect to r is -(5/3) * r * (1 + sqrt(5) * r) * exp_r,
+        # and the derivative of r respect to the point is scaled_differences / r.
+        factor = - (5.0 / 3.0) * (1.0 + np.sqrt(5) * r) * exp_r
+
+        derivatives = {
+            'cov': (1.0 + np.sqrt(5) * r + (5.0 / 3.0) * r2) * exp_r,
+            'gradient': factor[:, np.newaxis] * scaled_differences,
+        }
+
+        if hessian:
+            second = (25.0 / 3.0) * exp_r[:, np.newaxis, np.newaxis] * \
+                scaled_differences[:, :, np.newaxis] * scaled_differences[:, np.newaxis, :]
+            diagonal = np.arange(dimension)
+            second[:, diagonal, diagonal] += factor[:, np.newaxis] / (ls ** 2)
+            derivatives['hessian'] = second
+
+        return derivatives
+
     @classmethod
     def evaluate_cov_defined_by_params(cls, params, inputs, dimension, **kwargs):
         """
@@ -255,8 +325,7 @@ class Matern52(AbstractKernel):
         :param dimension: (int) dimension of the domain of the kernel
         :return: (np.array(nxn)) cov(inputs) where the kernel is defined with params
         """
-        matern52 = cls.define_kernel_from_array(dimension, params)
-        return matern52.cov(inputs)
+        return cls.cov_from_params(params, inputs, dimension)
 
     @classmethod
     def evaluate_grad_defined_by_params_respect_params(cls, params, inputs, dimension, **kwargs):
@@ -290,8 +359,7 @@ class Matern52(AbstractKernel):
 
         :return: (np.array(nxk)) cov(inputs_1, inputs_2) where the kernel is defined with params
         """
-        matern52 = cls.define_kernel_from_array(dimension, params)
-        return matern52.cross_cov(inputs_1, inputs_2)
+        return cls.cross_cov_from_params(params, inputs_1, inputs_2, dimension)
 
     @staticmethod
     def define_prior_parameters(data, dimension):
@@ -403,17 +471,24 @@ class GradientLSMatern52(object):
         return cls.gradient_respect_distance_cross(ls, inputs, inputs)
 
     @classmethod
-    def gradient_respect_distance_cross(cls, ls, inputs_1, inputs_2, second=False):
+    def gradient_respect_distance_cross(cls, ls, inputs_1, inputs_2, second=False, pairs=False):
         """
 
         :param ls: (ParameterEntity) length_scale
         :param inputs_1: np.array(nxd)
         :param inputs_2: np.array(mxd)
         :param second: (boolean) Computes second derivative if it's True.
+        :param pairs: (boolean) If it's True, inputs_1 has one row or m rows, and the derivatives
+            are computed only for the pairs (inputs_1[i], inputs_2[i]). The output is then
+            np.array(1xm).
         :return: np.array(nxm) or {'first': np.array(nxm), 'second': np.array(nxm)}
         """
 
-        r2 = np.abs(Distances.dist_square_length_scale(ls.value, inputs_1, inputs_2))
+        if pairs:
+            r2 = np.abs(Distances.dist_square_length_scale_respect_point(
+                ls.value, inputs_1, inputs_2))
+        else:
+            r2 = np.abs(Distances.dist_square_length_scale(ls.value, inputs_1, inputs_2))
         r = np.sqrt(r2)
 
         exp_r = np.exp(-np.sqrt(5) * r)
@@ -444,13 +519,14 @@ class GradientLSMatern52(object):
         Computes the vector of the gradients of cov(point, inputs) respect point.
 
         :param ls: (ParameterEntity) length_scale
-        :param point: np.array(1xd)
+        :param point: np.array(1xd) or np.array(nxd). If point has n rows, the gradient of
+            cov(point[i], inputs[i]) is computed for each i.
         :param inputs: np.array(nxd)
 
         :return: np.array(nxd)
         """
 
-        derivate_respect_to_r = cls.gradient_respect_distance_cross(ls, point, inputs)
+        derivate_respect_to_r = cls.gradient_respect_distance_cross(ls, point, inputs, pairs=True)
         grad_distance_point = \
             Distances.gradient_distance_length_scale_respect_point(ls.value, point, inputs)
 
@@ -467,12 +543,14 @@ class GradientLSMatern52(object):
         Computes the Hessians of cov(point, inputs) respect point.
 
         :param ls: (ParameterEntity) length_scale
-        :param point: np.array(1xd)
+        :param point: np.array(1xd) or np.array(nxd). If point has n rows, the Hessian of
+            cov(point[i], inputs[i]) is computed for each i.
         :param inputs: np.array(nxd)
         :return: np.array(nxdxd)
         """
 
-        derivatives_resp_r = cls.gradient_respect_distance_cross(ls, point, inputs, second=True)
+        derivatives_resp_r = cls.gradient_respect_distance_cross(ls, point, inputs, second=True,
+                                                                 pairs=True)
 
         hessian_respect_point = Distances.gradient_distance_length_scale_respect_point(
             ls.value, point, inputs, second=True
@@ -303,7 +303,8 @@ class ProductKernels(AbstractKernel):
         """
         Computes the vector of the gradients of cov(point, inputs) respect point.
 
-        :param point: np.array(1xd)
+        :param point: np.array(1xd) or np.array(nxd). If point has n rows, the gradient of
+            cov(point[i], inputs[i]) is computed for each i.
         :param inputs: np.array(nxd)
 
         :return: np.array(nxd)
@@ -382,7 +383,7 @@ class ProductKernels(AbstractKernel):
         for name in self.names:
             hess[name] = self.kernels[name].hessian_respect_point(point[name], inputs[name])
             grad[name] = self.kernels[name].grad_respect_point(point[name], inputs[name])
-            cov[name] = self.kernels[name].cross_cov(point[name], inputs[name]).transpose()
+            cov[name] = self.cov_respect_point(self.kernels[name], point[name], inputs[name])
 
         hessian = {}
         diagonal_hessian = {}
@@ -427,7 +428,7 @@ class ProductKernels(AbstractKernel):
 
         for name in self.names:
             grad[name] = self.kernels[name].grad_respect_point(point[name], inputs[name])
-            cov[name] = self.kernels[name].cross_cov(point[name], inputs[name]).transpose()
+            cov[name] = self.cov_respect_point(self.kernels[name], point[name], inputs[name])
 
         gradient = {}
 
@@ -436,6 +437,26 @@ class ProductKernels(AbstractKernel):
 
         return gradient
 
+    @staticmethod
+    def cov_respect_point(kernel, point, inputs):
+        """
+        Computes cov(point, inputs) with the kernel. If point has n rows, cov(point[i], inputs[i])
+        is computed for each i, evaluating the kernel only in the distinct rows of point.
+
+        :param kernel: kernel instance
+        :param point: np.array(1xd) or np.array(nxd)
+        :param inputs: np.array(nxd)
+        :return: np.array(nx1)
+        """
+
+        if point.shape[0] == 1:
+            return kernel.cross_cov(point, inputs).transpose()
+
+        distinct_points, index = np.unique(point, axis=0, return_inverse=True)
+        cov = kernel.cross_cov(distinct_points, inputs)
+
+        return cov[index, np.arange(inputs.shape[0])].reshape((inputs.shape[0], 1))
+
     @classmethod
     def evaluate_grad_respect_point(cls, params, point, inputs, dimension, *args,
                                     **kernel_parameters):
@@ -493,10 +514,7 @@ class ProductKernels(AbstractKernel):
 
         :return: cov(inputs) where the kernel is defined with params
         """
-
-        kernel = cls.define_kernel_from_array(dimension, params, *args, **kernel_parameters)
-
-        return kernel.cov_dict(inputs)
+        return cls.cov_from_params(params, inputs, dimension, *args, **kernel_parameters)
 
     @classmethod
     def evaluate_grad_defined_by_params_respect_params(cls, params, inputs, dimension, *args,
@@ -542,10 +560,47 @@ class ProductKernels(AbstractKernel):
 
         :return: (np.array(nxk)) cov(inputs_1, inputs_2) where the kernel is defined with params
         """
+        return cls.cross_cov_from_params(params, inputs_1, inputs_2, dimension, *args,
+                                         **kernel_parameters)
 
-        kernel = cls.define_kernel_from_array(dimension, params, *args, **kernel_parameters)
+    @staticmethod
+    def cross_cov_from_params(params, inputs_1, inputs_2, dimension, *args, **kernel_parameters):
+        """
+        Stateless evaluation of the covariance of the kernel defined by params. No kernel object
+        is built.
 
-        return kernel.cross_cov_dict(inputs_1, inputs_2)
+        :param params: [np.array(k)] The first part are related to the parameters of the first
+            kernel and so on.
+        :param inputs_1: {(str) kernel_name: np.array(nxd)}
+        :param inputs_2: {(str) kernel_name: np.array(mxd)}
+        :param dimension: [int] list with the dimensions of the kernel
+        :param args: [str] List with the names of the kernels.
+        :param kernel_parameters: additional kernel parameters,
+            - SAME_CORRELATION: (boolean) True or False. Parameter used only for task kernel.
+        :return: np.array(nxm)
+        """
+
+        return reduce(lambda K1, K2: K1 * K2,
+                      [find_kernel_constructor(name).cross_cov_from_params(
+                          param, inputs_1[name], inputs_2[name], dim, **kernel_parameters)
+                       for name, dim, param in zip(args[0], dimension, params)])
+
+    @classmethod
+    def cov_from_params(cls, params, inputs, dimension, *args, **kernel_parameters):
+        """
+        Stateless evaluation of the covariance matrix of the kernel defined by params.
+
+        :param params: [np.array(k)] The first part are related to the parameters of the first
+            kernel and so on.
+        :param inputs: {(str) kernel_name: np.array(nxd)}
+        :param dimension: [int] list with the dimensions of the kernel
+        :param args: [str] List with the names of the kernels.
+        :param kernel_parameters: additional kernel parameters,
+            - SAME_CORRELATION: (boolean) True or False. Parameter used only for task kernel.
+        :return: np.array(nxn)
+        """
+        return cls.cross_cov_from_params(params, inputs, inputs, dimension, *args,
+                                         **kernel_parameters)
 
     @classmethod
     def evaluate_cross_cov_defined_by_params_array(cls, params, inputs_1, inputs_2, dimension,
@@ -565,12 +620,20 @@ class ProductKernels(AbstractKernel):
         :return: (np.array(nxk)) cov(inputs_1, inputs_2) where the kernel is defined with params
         """
 
-        kernel = cls.define_kernel_from_array(dimension, params, *args, **kernel_parameters)
-
-        inputs_1 = kernel.inputs_from_array_to_dict(inputs_1)
-        inputs_2 = kernel.inputs_from_array_to_dict(inputs_2)
-
-        return kernel.cross_cov_dict(inputs_1, inputs_2)
+        inputs_1_dict = {}
+        inputs_2_dict = {}
+        cont = 0
+        for name, dim in zip(args[0], dimension):
+            # The dimension of the tasks kernel is the number of tasks, but its inputs are
+            # the indexes of the tasks.
+            if name == TASKS_KERNEL_NAME:
+                dim = 1
+            inputs_1_dict[name] = inputs_1[:, cont: cont + dim]
+            inputs_2_dict[name] = inputs_2[:, cont: cont + dim]
+            cont += dim
+
+        return cls.cross_cov_from_params(params, inputs_1_dict, inputs_2_dict, dimension, *args,
+                                         **kernel_parameters)
 
     @staticmethod
     def compare_kernels(kernel1, kernel2):
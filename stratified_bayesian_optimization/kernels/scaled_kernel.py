@@ -282,9 +282,7 @@ class ScaledKernel(AbstractKernel):
 
         :return: cov(inputs) where the kernel is defined with params
         """
-        kernel = cls.define_kernel_from_array(dimension, params, *args)
-
-        return kernel.cov(inputs)
+        return cls.cov_from_params(params, inputs, dimension, *args)
 
     @classmethod
     def evaluate_grad_defined_by_params_respect_params(cls, params, inputs, dimension, *args):
@@ -324,9 +322,42 @@ class ScaledKernel(AbstractKernel):
 
         :return: (np.array(nxk)) cov(inputs_1, inputs_2) where the kernel is defined with params
         """
+        return cls.cross_cov_from_params(params, inputs_1, inputs_2, dimension, *args)
 
-        kernel = cls.define_kernel_from_array(dimension, params, *args)
-        return kernel.cross_cov(inputs_1, inputs_2)
+    @staticmethod
+    def cross_cov_from_params(params, inputs_1, inputs_2, dimension, *args):
+        """
+        Stateless evaluation of the covariance of the kernel defined by params. No kernel object
+        is built.
+
+        :param params: (np.array(k)) The first part are the parameters for the kernel instance, the
+            second part is the parameter for sigma2.
+        :param inputs_1: np.array(nxd)
+        :param inputs_2: np.array(mxd)
+        :param dimension: (int) dimension of the domain of the kernel
+        :param args: [str] List with the names of the kernels.
+        :return: np.array(nxm)
+        """
+
+        for name in args[0]:
+            kernel_ct = find_kernel_constructor(name)
+
+        return kernel_ct.cross_cov_from_params(params[0: -1], inputs_1, inputs_2, dimension) * \
+            params[-1:]
+
+    @classmethod
+    def cov_from_params(cls, params, inputs, dimension, *args):
+        """
+        Stateless evaluation of the covariance matrix of the kernel defined by params.
+
+        :param params: (np.array(k)) The first part are the parameters for the kernel instance, the
+            second part is the parameter for sigma2.
+        :param inputs: np.array(nxd)
+        :param dimension: (int) dimension of the domain of the kernel
+        :param args: [str] List with the names of the kernels.
+        :return: np.array(nxn)
+        """
+        return cls.cross_cov_from_params(params, inputs, inputs, dimension, *args)
 
     @staticmethod
     def define_prior_parameters(data, dimension, var_evaluations=None):
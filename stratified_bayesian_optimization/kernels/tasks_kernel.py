@@ -199,57 +199,102 @@ class TasksKernel(AbstractKernel):
         if self.base_cov_matrix is not None:
             return
 
-        if self.n_tasks == 1:
-            covM = np.zeros((self.n_tasks, self.n_tasks))
-            covM[0, 0] = self.lower_triang.value[0]
-            L = covM
-            self.chol_base_cov_matrix = L
-            self.base_cov_matrix = covM
+        L, covM = self.base_cov_matrix_from_params(self.lower_triang.value, self.n_tasks,
+                                                   self.same_correlation)
 
-        if not self.same_correlation:
-            count = 0
-            L = np.zeros((self.n_tasks, self.n_tasks))
-            for i in range(self.n_tasks):
-                for j in range(i + 1):
-                    L[i, j] = np.exp(self.lower_triang.value[count + j])
-                count += i + 1
+        self.chol_base_cov_matrix = L
+        self.base_cov_matrix = covM
+
+    @staticmethod
+    def base_cov_matrix_from_params(params, n_tasks, same_correlation=False):
+        """
+        Compute the covariance matrix between the tasks defined by params (see
+        compute_cov_matrix).
+
+        :param params: np.array(k)
+        :param n_tasks: (int) number of tasks
+        :param same_correlation: (boolean)
+        :return: (np.array(n_tasks x n_tasks), np.array(n_tasks x n_tasks)) L, L * L^T if
+            same_correlation is False. Otherwise, both matrices are the covariance matrix.
+        """
+
+        if not same_correlation:
+            L = np.zeros((n_tasks, n_tasks))
+            rows, columns = np.tril_indices(n_tasks)
+            L[rows, columns] = np.exp(params[0: len(rows)])
 
             covM = np.dot(L, np.transpose(L))
         else:
-            covM = np.zeros((self.n_tasks, self.n_tasks))
+            covM = np.zeros((n_tasks, n_tasks))
 
-            if self.n_tasks > 1:
-                value = self.lower_triang.value[1]
+            if n_tasks > 1:
+                value = params[1]
                 covM.fill(np.exp(value))
 
-                for i in xrange(self.n_tasks):
-                    covM[i, i] = np.exp(self.lower_triang.value[0]) + np.exp(value) * \
-                                                                      (self.n_tasks - 1 )
+                diagonal = np.exp(params[0]) + np.exp(value) * (n_tasks - 1)
+                covM[np.diag_indices(n_tasks)] = diagonal
             else:
-                covM[0, 0] = np.exp(self.lower_triang.value[0])
+                covM[0, 0] = np.exp(params[0])
             L = covM
 
+        return L, covM
 
-        self.chol_base_cov_matrix = L
-        self.base_cov_matrix = covM
+    @classmethod
+    def cross_cov_from_params(cls, params, inputs_1, inputs_2, dimension, **kwargs):
+        """
+        Stateless evaluation of the covariance of the kernel defined by params. No kernel object
+        is built.
 
-    def cross_cov(self, inputs_1, inputs_2):
+        :param params: (np.array(k))
+        :param inputs_1: np.array(nx1)
+        :param inputs_2: np.array(mx1)
+        :param dimension: (int) number of tasks
+        :param kwargs: {SAME_CORRELATION: boolean}
+        :return: np.array(nxm)
+        """
+        same_correlation = kwargs.get(SAME_CORRELATION, False)
+        base_cov_matrix = cls.base_cov_matrix_from_params(params, dimension, same_correlation)[1]
+
+        return cls.cross_cov_given_base_matrix(base_cov_matrix, inputs_1, inputs_2)
+
+    @classmethod
+    def cov_from_params(cls, params, inputs, dimension, **kwargs):
         """
+        Stateless evaluation of the covariance matrix of the kernel defined by params.
 
+        :param params: (np.array(k))
+        :param inputs: np.array(nx1)
+        :param dimension: (int) number of tasks
+        :param kwargs: {SAME_CORRELATION: boolean}
+        :return: np.array(nxn)
+        """
+        return cls.cross_cov_from_params(params, inputs, inputs, dimension, **kwargs)
+
+    @staticmethod
+    def cross_cov_given_base_matrix(base_cov_matrix, inputs_1, inputs_2):
+        """
+
+        :param base_cov_matrix: np.array(n_tasks x n_tasks)
         :param inputs_1: np.array(nx1)
         :param inputs_2: np.array(mx1)
         :return: np.array(nxm)
         """
+        s = np.ravel(inputs_1).astype(int)
+        t = np.ravel(inputs_2).astype(int)
 
-        self.compute_cov_matrix()
+        return base_cov_matrix[s[:, np.newaxis], t[np.newaxis, :]]
 
-        s, t = np.meshgrid(inputs_1, inputs_2)
-        s = s.astype(int)
-        t = t.astype(int)
+    def cross_cov(self, inputs_1, inputs_2):
+        """
 
-        cov = self.base_cov_matrix[s, t].transpose()
+        :param inputs_1: np.array(nx1)
+        :param inputs_2: np.array(mx1)
+        :return: np.array(nxm)
+        """
+
+        self.compute_cov_matrix()
 
-        return cov
+        return self.cross_cov_given_base_matrix(self.base_cov_matrix, inputs_1, inputs_2)
 
     def gradient_respect_parameters(self, inputs):
         """
@@ -333,10 +378,7 @@ class TasksKernel(AbstractKernel):
 
         :return: cov(inputs) where the kernel is defined with params
         """
-        same_correlation = kwargs.get(SAME_CORRELATION, False)
-        task_kernels = cls.define_kernel_from_array(dimension, params,
-                                                    same_correlation=same_correlation)
-        return task_kernels.cov(inputs)
+        return cls.cov_from_params(params, inputs, dimension, **kwargs)
 
     @classmethod
     def evaluate_cross_cov_defined_by_params(cls, params, inputs_1, inputs_2, dimension, **kwargs):
@@ -351,11 +393,7 @@ class TasksKernel(AbstractKernel):
 
         :return: (np.array(nxk)) cov(inputs_1, inputs_2) where the kernel is defined with params
         """
-        same_correlation = kwargs.get(SAME_CORRELATION, False)
-        task_kernels = cls.define_kernel_from_array(dimension, params,
-                                                    same_correlation=same_correlation)
-
-        return task_kernels.cross_cov(inputs_1, inputs_2)
+        return cls.cross_cov_from_params(params, inputs_1, inputs_2, dimension, **kwargs)
 
     @classmethod
     def evaluate_hessian_respect_point(cls, params, point, inputs, dimension):
@@ -106,4 +106,87 @@ def AffineBreakPoints(a, b):
 
     Alen = Alen + 1
     A = A[1:Alen] - 1
-    return A, c
\ No newline at end of file
+    return A, c
+
+# Batched version of AffineBreakPointsPrep and AffineBreakPoints for r vectors b that share the
+# vector a. The inputs are an M-vector a and an (M x r)-matrix b. The lines a_i + b_i z of each
+# column that can't be in the upper envelope are removed as in AffineBreakPointsPrep, the rest
+# are sorted by slope (breaking ties with the y-intercept, and keeping only the largest
+# y-intercept for each slope), and the upper envelope of each column is built by walking its
+# sorted lines once, with the stacks of all the columns updated simultaneously.
+
+# The outputs are:
+#   slopes: (M x r)-matrix, slopes[k, l] is the slope of the k-th line of the envelope of the
+#       column l, for k < length[l].
+#   c: ((M + 1) x r)-matrix, c[k, l] is the left breakpoint of the k-th line of the envelope of
+#       the column l (c[0, l] = -Inf), for k < length[l].
+#   length: r-vector, number of lines in the envelope of each column.
+
+def AffineBreakPointsBatch(a, b):
+    M, r = b.shape
+    columns = np.arange(r)
+
+    a = np.tile(np.reshape(a.astype(np.float), (M, 1)), (1, r))
+
+    # Same preprocessing step as in AffineBreakPointsPrep.
+    i1 = np.argmin(b, axis=0)
+    i2 = np.argmax(a[:, 0])
+    i3 = np.argmax(b, axis=0)
+    a1 = a[i1, columns]
+    b1 = b[i1, columns]
+    a2 = a[i2, 0]
+    b2 = b[i2, :]
+    a3 = a[i3, columns]
+    b3 = b[i3, columns]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cleft = (a - a1) / (b1 - b)
+        cright = (a - a3) / (b3 - b)
+        c2left = (a2 - a1) / (b1 - b2)
+        c2right = (a2 - a3) / (b3 - b2)
+    keep = (b == b1) | (b == b3) | (cleft <= c2left) | (cright >= c2right)
+
+    # The removed lines are moved to the end, and the other lines are sorted in ascending order
+    # of slope, breaking ties with the y-intercept.
+    ind = np.lexsort((a, b, ~keep), axis=0)
+    a = a[ind, columns]
+    b = b[ind, columns]
+    keep = keep[ind, columns]
+    n_keep = np.sum(keep, axis=0)
+
+    # Only the last line of each group of lines with the same slope is used.
+    valid = keep.copy()
+    valid[0: M - 1, :] &= (np.diff(b, axis=0) != 0) | ~keep[1:, :]
+
+    stack = np.zeros((M, r), dtype=np.int64)
+    c = np.zeros((M + 1, r))
+    c[0, :] = -float('Inf')
+    length = np.zeros(r, dtype=np.int64)
+
+    for i in xrange(np.max(n_keep)):
+        active = valid[i, :]
+
+        # Removes the last line of the stack while the new line is above it at its left
+        # breakpoint.
+        while True:
+            index = columns[active & (length > 1)]
+            if len(index) == 0:
+                break
+            top = stack[length[index] - 1, index]
+            intersection = (a[top, index] - a[i, index]) / (b[i, index] - b[top, index])
+            remove = intersection <= c[length[index] - 1, index]
+            if not np.any(remove):
+                break
+            length[index[remove]] -= 1
+
+        index = columns[active & (length > 0)]
+        top = stack[length[index] - 1, index]
+        c[length[index], index] = (a[top, index] - a[i, index]) / (b[i, index] - b[top, index])
+
+        index = columns[active]
+        stack[length[index], index] = i
+        length[index] += 1
+
+    slopes = b[stack, columns]
+
+    return slopes, c, length
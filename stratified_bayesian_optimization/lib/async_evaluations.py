@@ -0,0 +1,165 @@
+from __future__ import absolute_import
+
+import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+from stratified_bayesian_optimization.initializers.log import SBOLog
+from stratified_bayesian_optimization.lib.constant import ASYNC_EVALUATIONS_POLLING_INTERVAL
+from stratified_bayesian_optimization.lib.parallel import (
+    Parallel,
+    MyPool,
+)
+
+logger = SBOLog(__name__)
+
+
+def _initialize_process():
+    """
+    Initializes a process of the pool of evaluations. The persistent pool of the parent (see
+    Parallel.pool) can't be used from the process, so the evaluations that run functions in
+    parallel create their own pools.
+    """
+    Parallel._pool = None
+    Parallel._shared = {}
+    Parallel._arrays_dir = None
+
+
+class AsyncEvaluations(object):
+    """
+    Runs evaluations of functions (e.g. of the objective function) in a background pool, so the
+    caller can keep working while they run. At most n_in_flight evaluations run at once.
+
+    If deterministic is True, the results are returned in the order in which the evaluations
+    were submitted, so the results don't depend on which evaluation finishes first. Otherwise,
+    they're returned in order of completion.
+
+    The processes of the pool aren't daemonic, so the evaluations can run functions in parallel
+    too (e.g. objectives that call Parallel.run_function_different_arguments_parallel).
+    """
+
+    def __init__(self, n_in_flight=1, deterministic=True, threads=False):
+        """
+        :param n_in_flight: (int) maximum number of evaluations running at once
+        :param deterministic: (boolean)
+        :param threads: (boolean) uses threads instead of processes if it's True
+        """
+        self.n_in_flight = n_in_flight
+        self.deterministic = deterministic
+
+        if threads:
+            self._pool = ThreadPool(n_in_flight)
+        else:
+            self._pool = MyPool(processes=n_in_flight, initializer=_initialize_process)
+
+        # {key: (multiprocessing.pool.AsyncResult, submission time)}
+        self._jobs = OrderedDict()
+
+        self.n_submitted = 0
+        self.n_completed = 0
+        self.total_time = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(terminate=exc_type is not None)
+
+    @property
+    def n_pending(self):
+        """
+        :return: (int) number of submitted evaluations whose result hasn't been returned
+        """
+        return len(self._jobs)
+
+    def submit(self, key, function, *args, **kwargs):
+        """
+        Starts the evaluation of function(*args, **kwargs) in the background. If there are
+        n_in_flight running evaluations, it starts when one of them finishes.
+
+        :param key: hashable object that identifies the evaluation
+        :param function: function that can be pickled (e.g. defined at the top of a module)
+        :param args: arguments of function
+        :param kwargs: arguments of function
+        """
+        if key in self._jobs:
+            raise ValueError("There is already a pending evaluation with key %s" % str(key))
+
+        self._jobs[key] = (self._pool.apply_async(function, args=args, kwds=kwargs), time.time())
+        self.n_submitted += 1
+
+    def next_result(self, block=True):
+        """
+        Returns the result of the next evaluation: the oldest one if deterministic is True,
+        otherwise the first one that finishes. Exceptions raised by the function are re-raised.
+
+        :param block: (boolean) If it's False, returns None if the result isn't ready yet.
+        :return: (key, output of the function), or None if there are no pending evaluations.
+        """
+
+        if len(self._jobs) == 0:
+            return None
+
+        key = None
+        while key is None:
+            if self.deterministic:
+                candidates = [next(iter(self._jobs))]
+            else:
+                candidates = self._jobs.keys()
+
+            for candidate in candidates:
+                if self._jobs[candidate][0].ready():
+                    key = candidate
+                    break
+
+            if key is None:
+                if not block:
+                    return None
+                if self.deterministic:
+                    self._jobs[candidates[0]][0].wait()
+                else:
+                    time.sleep(ASYNC_EVALUATIONS_POLLING_INTERVAL)
+
+        job, submission_time = self._jobs.pop(key)
+        self.n_completed += 1
+        self.total_time += time.time() - submission_time
+
+        return key, job.get()
+
+    def statistics(self):
+        """
+        :return: {
+            'submitted': int,
+            'completed': int,
+            'pending': int,
+            'mean_time': float, mean seconds between the submission of an evaluation and the
+                moment its result was returned
+        }
+        """
+        mean_time = 0.0
+        if self.n_completed > 0:
+            mean_time = self.total_time / self.n_completed
+
+        return {
+            'submitted': self.n_submitted,
+            'completed': self.n_completed,
+            'pending': len(self._jobs),
+            'mean_time': mean_time,
+        }
+
+    def close(self, terminate=False):
+        """
+        Waits for the running evaluations and closes the pool. The results that weren't
+        returned are discarded.
+
+        :param terminate: (boolean) If it's True, the running evaluations are stopped.
+        """
+        if len(self._jobs) > 0:
+            logger.info("Discarding %d pending evaluations" % len(self._jobs))
+            self._jobs = OrderedDict()
+
+        if terminate:
+            self._pool.terminate()
+        else:
+            self._pool.close()
+        self._pool.join()
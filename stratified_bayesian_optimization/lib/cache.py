@@ -0,0 +1,178 @@
+from __future__ import absolute_import
+
+import sys
+
+from collections import OrderedDict
+
+import numpy as np
+
+from stratified_bayesian_optimization.lib.constant import DEFAULT_CACHE_MAX_BYTES
+
+
+class LRUCache(object):
+    """
+    Dictionary with a bounded memory budget. When the budget is exceeded, the least recently
+    used entries are evicted. It also keeps counters of hits, misses and evictions.
+    """
+
+    # If it's True, the copies of the caches keep their entries. Parallel._dumps sets it while it
+    # pickles objects whose large arrays are written to memory-mapped files, so the workers get
+    # the cached factors without copying them in each task.
+    pickle_entries = False
+
+    def __init__(self, max_bytes=None):
+        """
+        :param max_bytes: (int) maximum number of bytes used by the cached values. If it's None,
+            DEFAULT_CACHE_MAX_BYTES is used.
+        """
+        if max_bytes is None:
+            max_bytes = DEFAULT_CACHE_MAX_BYTES
+
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._data = OrderedDict()
+        self._sizes = {}
+
+    @classmethod
+    def size_of(cls, value):
+        """
+        Estimates the memory used by value.
+
+        :param value: np.array, tuple, list, dict or scalar
+        :return: int
+        """
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+        if isinstance(value, (tuple, list)):
+            return sum(cls.size_of(element) for element in value)
+        if isinstance(value, dict):
+            return sum(cls.size_of(element) for element in value.itervalues())
+        return sys.getsizeof(value)
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value and marks it as the most recently used entry.
+
+        :param key: hashable object
+        :param default: returned if key is not cached
+        :return: cached value or default
+        """
+        if key not in self._data:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        value = self._data.pop(key)
+        self._data[key] = value
+        return value
+
+    def __getitem__(self, key):
+        if key not in self._data:
+            self.misses += 1
+            raise KeyError(key)
+        return self.get(key)
+
+    def __setitem__(self, key, value):
+        if key in self._data:
+            self.pop(key)
+
+        size = self.size_of(value)
+
+        if size > self.max_bytes:
+            return
+
+        while len(self._data) > 0 and self.n_bytes + size > self.max_bytes:
+            old_key = next(iter(self._data))
+            self.pop(old_key)
+            self.evictions += 1
+
+        self._data[key] = value
+        self._sizes[key] = size
+        self.n_bytes += size
+
+    def pop(self, key, *default):
+        if key not in self._data:
+            if len(default) > 0:
+                return default[0]
+            raise KeyError(key)
+        self.n_bytes -= self._sizes.pop(key)
+        return self._data.pop(key)
+
+    def __delitem__(self, key):
+        self.pop(key)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __eq__(self, other):
+        if isinstance(other, LRUCache):
+            other = other._data
+        return dict(self._data) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __getstate__(self):
+        """
+        Copies of the cache (pickle, deepcopy) keep the budget and the counters, but not the
+        entries: the models are pickled for every job sent to other processes, and sending a
+        full cache is much slower than recomputing the few entries used by the job. The entries
+        are kept if pickle_entries is True (see Parallel._dumps).
+        """
+        state = self.__dict__.copy()
+        if LRUCache.pickle_entries:
+            return state
+        state['_data'] = OrderedDict()
+        state['_sizes'] = {}
+        state['n_bytes'] = 0
+        return state
+
+    def keys(self):
+        return self._data.keys()
+
+    def values(self):
+        return self._data.values()
+
+    def items(self):
+        return self._data.items()
+
+    def iteritems(self):
+        return self._data.iteritems()
+
+    def clear(self):
+        """
+        Removes all the entries, but keeps the counters.
+        """
+        self._data = OrderedDict()
+        self._sizes = {}
+        self.n_bytes = 0
+
+    def statistics(self):
+        """
+        :return: {
+            'hits': int,
+            'misses': int,
+            'evictions': int,
+            'entries': int,
+            'n_bytes': int,
+            'max_bytes': int,
+        }
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._data),
+            'n_bytes': self.n_bytes,
+            'max_bytes': self.max_bytes,
+        }
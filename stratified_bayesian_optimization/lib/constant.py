@@ -74,6 +74,64 @@ WEIGHTS = 'weights'
 QUADRATURES = 'quadrature'
 POSTERIOR_MEAN = 'posterior_mean'
 B_NEW = 'quadratures_with_candidate'
+SAMPLES = 'samples'
+
+# Maximum number of bytes used by every cache of the models
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 ** 2
+
+# Maximum number of bytes used by the cache of the squared differences of the training points (see
+# Distances). Training sets whose differences don't fit are not cached.
+DISTANCES_CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+# Maximum number of points whose quadratures are computed with one evaluation of the kernel
+N_POINTS_QUADRATURE_BATCH = 1000
+
+# Maximum number of points whose covariance matrix is computed at once to get its diagonal (see
+# GPFittingGaussian.evaluate_cov_diagonal)
+N_POINTS_COV_DIAGONAL_BATCH = 100
+
+# Number of rows solved at each step of the substitution done over a stack of triangular matrices
+# (see la_functions.solve_triangular_batch)
+N_ROWS_TRIANGULAR_BATCH = 64
+
+# Arrays with at least this number of bytes are sent to the workers of the persistent pool through
+# memory-mapped files when shared memory is enabled (see Parallel.pool)
+MIN_BYTES_SHARED_MEMORY = 1024 ** 2
+
+# Number of deltas of a shared object that are sent with each call to the persistent pool. When
+# there are more, the object is shipped again as the new base of its copies (see
+# Parallel.share_state)
+MAX_PARALLEL_STATE_DELTAS = 50
+
+# Number of changes of the data of a GP kept to update its copies in the workers of the persistent
+# pool (see GPFittingGaussian.parallel_state_delta)
+MAX_CHANGES_DATA_LOGGED = 1000
+
+# Seconds between checks of the running evaluations when the results are collected in order of
+# completion (see AsyncEvaluations)
+ASYNC_EVALUATIONS_POLLING_INTERVAL = 0.05
+
+# Suffix of the append-only journals of the results and GP models (see JSONJournal)
+JOURNAL_SUFFIX = '.journal'
+
+# The journals are synced to disk after this number of records
+JOURNAL_FSYNC_INTERVAL = 10
+
+# The journals are compacted into their JSON file after this number of records
+JOURNAL_COMPACTION_INTERVAL = 50
+
+# Maximum number of journals of GP models kept open by GPFittingService.write_gp_model. The least
+# recently written ones are closed
+MAX_OPEN_JOURNALS = 10
+
+# Suffix of the directories of the GP models saved as .npy blocks (see NPYFile)
+NPY_MODEL_SUFFIX = '.npy_model'
+
+# Name of the JSON header of the directories written by NPYFile
+NPY_HEADER_FILE = 'header.json'
+
+# Suffix of the checkpoints of the BGO runs, written next to their partial results (see NPYFile)
+CHECKPOINT_SUFFIX = '.checkpoint'
 
 #BGO methods
 SBO_METHOD = 'sbo'
@@ -93,4 +151,11 @@ BAYESIAN_QUADRATURE = 'bayesian_quadrature'
 # Default number of sampled parameters
 DEFAULT_N_PARAMETERS = 20
 
+# When the chain of the parameters is warm started, it's only restarted (with burning) if the
+# effective sample size of the reweighted samples is smaller than this fraction of the samples
+MIN_EFFECTIVE_SAMPLE_SIZE_RATIO = 0.5
+
+# Number of slice sampling steps applied to each resampled parameter of a warm started chain
+N_REJUVENATION_STEPS = 1
+
 DEFAULT_N_SAMPLES = 100
\ No newline at end of file
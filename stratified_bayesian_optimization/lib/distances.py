@@ -1,11 +1,47 @@
 from __future__ import absolute_import
 
+import hashlib
+
 from scipy.spatial.distance import cdist
 import numpy as np
 
+from stratified_bayesian_optimization.lib.cache import LRUCache
+from stratified_bayesian_optimization.lib.constant import DISTANCES_CACHE_MAX_BYTES
+
 
 class Distances(object):
 
+    # Squared differences between the training points in each dimension.
+    _cache_differences = LRUCache(DISTANCES_CACHE_MAX_BYTES)
+
+    @classmethod
+    def squared_differences_training_points(cls, x):
+        """
+        Compute the squared difference between each pair of points of x in each dimension. The
+        training points don't change while the length scales are fitted or sampled, so the
+        differences are cached and the gradients of the distances respect to the length scales
+        are computed by a weighted product of them.
+
+        :param x: np.array(nxd)
+        :return: np.array(dxnxn), or None if it doesn't fit in the cache.
+        """
+
+        n, d = x.shape
+
+        if d * n * n * np.dtype(float).itemsize > cls._cache_differences.max_bytes:
+            return None
+
+        x = np.asarray(x, dtype=float)
+        key = (x.shape, hashlib.sha1(x.tobytes()).hexdigest())
+
+        differences = cls._cache_differences.get(key)
+
+        if differences is None:
+            differences = (x.T[:, :, np.newaxis] - x.T[:, np.newaxis, :]) ** 2
+            cls._cache_differences[key] = differences
+
+        return differences
+
     @staticmethod
     def dist_square_length_scale(ls, x1, x2=None):
         """
@@ -28,6 +64,25 @@ class Distances(object):
 
         return distance_2
 
+    @classmethod
+    def dist_square_length_scale_respect_point(cls, ls, point, x):
+        """
+        Compute the squared distance between point and each point of x, given the length scales
+        ls. If point has n rows, the distance between point[i] and x[i] is computed for each i.
+
+        :param ls: np.array(d)
+        :param point: np.array(1xd) or np.array(nxd)
+        :param x: np.array(nxd)
+        :return: np.array(1xn)
+        """
+
+        if point.shape[0] == 1:
+            return cls.dist_square_length_scale(ls, point, x)
+
+        differences = point / ls - x / ls
+
+        return np.sum(differences ** 2, axis=1).reshape((1, x.shape[0]))
+
     @classmethod
     def gradient_distance_length_scale_respect_ls(cls, ls, x1, x2=None):
         """
@@ -46,6 +101,18 @@ class Distances(object):
         r2 = np.abs(cls.dist_square_length_scale(ls, x1, x2))
         r = np.sqrt(r2)
 
+        differences = None
+        if x2 is None or x2 is x1:
+            differences = cls.squared_differences_training_points(x1)
+
+        if differences is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                derivative = differences * (1.0 / r)
+                derivative *= (-1.0 / (ls ** 3))[:, np.newaxis, np.newaxis]
+            derivative[:, np.arange(N), np.arange(N)] = 0
+
+            return dict((i, derivative[i]) for i in xrange(len(ls)))
+
         if x2 is None:
             x2 = x1
 
@@ -69,48 +136,30 @@ class Distances(object):
     @classmethod
     def gradient_distance_length_scale_respect_point(cls, ls, point, x, second=False):
         """
-        Compute gradient of r = dist(point, x) respect to x.
+        Compute gradient of r = dist(point, x) respect to x. If point has n rows, the gradient of
+        dist(point[i], x[i]) is computed for each i.
 
         :param ls: np.array(d)
-        :param point: np.array(1xd)
+        :param point: np.array(1xd) or np.array(nxd)
         :param x: np.array(nxd)
         :param second: (boolean) Hessian if it's True
         :return: np.array(nxd) or {'first': np.array(nxd), 'second': np.array(nxdxd)}
         """
 
-        r2 = np.abs(cls.dist_square_length_scale(ls, point, x))
-        r = np.sqrt(r2)
-
-        gradient = np.zeros((x.shape[0], len(ls)))
+        r2 = np.abs(cls.dist_square_length_scale_respect_point(ls, point, x))
+        r = np.sqrt(r2)[0, :][:, np.newaxis]
 
-        differences = {}
-
-        for i in range(len(ls)):
-            differences[i] = (point[0:1, i] - x[:, i]) / (ls[i] ** 2)
-            factor = differences[i] / r
-            gradient[:, i] = factor
+        differences = (point - x) / (ls ** 2)
+        gradient = differences / r
 
         if not second:
             return gradient
 
-        cross_partial = {}
-
         r3 = r ** 3
-        gradient_2 = np.zeros((x.shape[0], len(ls)))
-        for i in xrange(len(ls)):
-            factor_1 = (r * (ls[i] ** 2)) ** -1
-            factor_2 = differences[i] ** 2 / r3
-
-            factor = factor_1 - factor_2
-            gradient_2[:, i] = factor
-            for j in xrange(i + 1, len(ls)):
-                cross_partial[(i, j)] = -1.0 * differences[i] * differences[j] /r3
-
-        hessian = np.zeros((x.shape[0], len(ls), len(ls)))
-        for j in xrange(len(ls)):
-            hessian[:, j, j] = gradient_2[:, j]
-            for h in xrange(j + 1, len(ls)):
-                hessian[:, j, h] = cross_partial[(j, h)][0, :]
-                hessian[:, h, j] = hessian[:, j, h]
+        hessian = - differences[:, :, np.newaxis] * differences[:, np.newaxis, :] / \
+            r3[:, :, np.newaxis]
+
+        diagonal = np.arange(len(ls))
+        hessian[:, diagonal, diagonal] += 1.0 / (r * (ls ** 2))
 
         return {'first': gradient, 'second': hessian}
@@ -0,0 +1,201 @@
+from __future__ import absolute_import
+
+import time
+
+import multiprocessing as mp
+import numpy as np
+
+from stratified_bayesian_optimization.initializers.log import SBOLog
+from stratified_bayesian_optimization.lib.async_evaluations import AsyncEvaluations
+from stratified_bayesian_optimization.util.json_journal import JSONJournal
+
+logger = SBOLog(__name__)
+
+
+def _timed_evaluation(function, point, kwargs):
+    """
+    Evaluates function(point, **kwargs) and measures its running time.
+
+    :param function: function that can be pickled
+    :param point: [float]
+    :param kwargs: additional arguments of function
+    :return: (output of function, seconds)
+    """
+    start = time.time()
+    output = function(point, **kwargs)
+    return output, time.time() - start
+
+
+class EvaluationQueue(object):
+    """
+    Evaluates a function (e.g. the objective function) at several points, with at most n_jobs
+    evaluations running at once. Each result is appended to a journal (see JSONJournal) as soon
+    as it's available, so if the process is interrupted, the points already evaluated are read
+    from the journal instead of being evaluated again when it's restarted.
+
+    The journal has one record per evaluation: {"point": [float], "output": output of the
+    function, "time": seconds}.
+    """
+
+    def __init__(self, filename=None, n_jobs=None, parallel=True):
+        """
+        :param filename: (str) path of the file where the results are saved at the end, e.g. the
+            training data. The journal is filename + JOURNAL_SUFFIX. If it's None, the results
+            aren't saved.
+        :param n_jobs: (int) maximum number of evaluations running at once. If it's None, the
+            number of cpus is used.
+        :param parallel: (boolean) If False, the points are evaluated sequentially in this
+            process.
+        """
+        if n_jobs is None:
+            n_jobs = mp.cpu_count()
+
+        # Every evaluation is synced to disk, because they may be expensive.
+        self.journal = None
+        if filename is not None:
+            self.journal = JSONJournal(filename, fsync_interval=1)
+
+        self.n_jobs = n_jobs
+        self.parallel = parallel
+
+        self.n_points = 0
+        self.n_evaluated = 0
+        self.n_reused = 0
+        self.total_time = 0.0
+        self.latencies = []
+
+    def read_journal(self):
+        """
+        Reads the evaluations saved in the journal.
+
+        :return: {tuple(point): output of the function}
+        """
+        outputs = {}
+
+        if self.journal is None:
+            return outputs
+
+        for record in JSONJournal.read_records(self.journal.filename):
+            outputs[tuple(record['point'])] = record['output']
+
+        return outputs
+
+    def _write_journal(self, point, output, seconds):
+        """
+        Appends an evaluation to the journal.
+
+        :param point: [float]
+        :param output: output of the function
+        :param seconds: float
+        """
+        if self.journal is None:
+            return
+
+        self.journal.append({'point': list(point), 'output': output, 'time': seconds})
+
+    def remove_journal(self):
+        """
+        Removes the journal, e.g. once all the results were saved somewhere else.
+        """
+        if self.journal is None:
+            return
+
+        self.journal.remove()
+
+    def evaluate(self, function, points, **kwargs):
+        """
+        Evaluates function(point, **kwargs) for every point in points that isn't in the journal.
+
+        :param function: function that can be pickled (e.g. defined at the top of a module)
+        :param points: [[float]]
+        :param kwargs: additional arguments of function
+        :return: [output of the function], in the same order as points
+        """
+        start = time.time()
+
+        saved = self.read_journal()
+        outputs = [None] * len(points)
+        pending = []
+
+        for i, point in enumerate(points):
+            key = tuple(point)
+            if key in saved:
+                outputs[i] = saved[key]
+                self.n_reused += 1
+            else:
+                pending.append(i)
+
+        if len(points) > len(pending):
+            logger.info("Reusing %d evaluations of the journal" % (len(points) - len(pending)))
+
+        self.n_points += len(points)
+
+        if len(pending) > 0 and (not self.parallel or self.n_jobs == 1):
+            for i in pending:
+                output, seconds = _timed_evaluation(function, points[i], kwargs)
+                self._add_output(outputs, points, i, output, seconds)
+        elif len(pending) > 0:
+            n_jobs = min(self.n_jobs, len(pending))
+            with AsyncEvaluations(n_in_flight=n_jobs, deterministic=False) as evaluations:
+                for i in pending:
+                    evaluations.submit(i, _timed_evaluation, function, points[i], kwargs)
+
+                result = evaluations.next_result()
+                while result is not None:
+                    i, (output, seconds) = result
+                    self._add_output(outputs, points, i, output, seconds)
+                    result = evaluations.next_result()
+
+        if self.journal is not None:
+            self.journal.close()
+
+        self.total_time += time.time() - start
+
+        return outputs
+
+    def _add_output(self, outputs, points, index, output, seconds):
+        """
+        Saves the output of an evaluation.
+
+        :param outputs: [output of the function]
+        :param points: [[float]]
+        :param index: (int) index of the point
+        :param output: output of the function
+        :param seconds: (float) running time of the evaluation
+        """
+        outputs[index] = output
+        self._write_journal(points[index], output, seconds)
+        self.n_evaluated += 1
+        self.latencies.append(seconds)
+
+    def statistics(self):
+        """
+        :return: {
+            'points': int, number of points given to evaluate,
+            'evaluated': int, number of points evaluated,
+            'reused': int, number of points read from the journal,
+            'total_time': float, seconds spent in evaluate,
+            'throughput': float, evaluations per second,
+            'mean_latency': float, mean running time of an evaluation,
+            'max_latency': float, maximum running time of an evaluation,
+        }
+        """
+        throughput = 0.0
+        if self.total_time > 0:
+            throughput = self.n_evaluated / self.total_time
+
+        mean_latency = 0.0
+        max_latency = 0.0
+        if len(self.latencies) > 0:
+            mean_latency = float(np.mean(self.latencies))
+            max_latency = float(np.max(self.latencies))
+
+        return {
+            'points': self.n_points,
+            'evaluated': self.n_evaluated,
+            'reused': self.n_reused,
+            'total_time': self.total_time,
+            'throughput': throughput,
+            'mean_latency': mean_latency,
+            'max_latency': max_latency,
+        }
@@ -13,19 +13,28 @@ def uniform_finite(f, point, index_points, domain_random, index_random, weights=
         mean(f((point, x)): x in domain_random), where
     z[index_points[i]] = point[i].
 
+    If point has t > 1 rows, f is evaluated once in all the combinations (point[j], x), and the
+    expectation is computed for each row of point.
+
     If double is True, it computes the mean over all the points. Used for the variance.
 
     :param f: function
-    :param point: np.array(1xk)
+    :param point: np.array(1xk) or np.array(txk)
     :param index_points: [int]
     :param domain_random: np.array(n_tasksx1)
     :param index_random: [int]
     :param weights: np.array(l), weights to compute a weighted average
     :param double: boolean
-    :return: np.array
+    :return: np.array, or np.array(txm) if point has t > 1 rows.
     """
     domain_random = np.array(domain_random)
 
+    if point.shape[0] > 1 and not double:
+        new_points = _combine_points_random(point, index_points, domain_random, index_random)
+        values = f(new_points)
+        values = values.reshape((point.shape[0], domain_random.shape[0], values.shape[1]))
+        return np.einsum('l,tlm->tm', _weights_average(domain_random.shape[0], weights), values)
+
     dim_random = domain_random.shape[1]
 
     new_points = np.zeros((domain_random.shape[0], dim_random + point.shape[1]))
@@ -53,16 +62,20 @@ def gamma_expect(f, point, index_points, index_random, parameters_dist, n_sample
         mean(f((point, x)): x in domain_random), where
     z[index_points[i]] = point[i].
 
+    If point has t > 1 rows, n_samples samples of x are drawn for each row of point (in the
+    same order as if the expectations were computed one by one), and f is evaluated once in all
+    the combinations.
+
     If double is True, it computes the mean over all the points. Used for the variance.
 
     :param f: function
-    :param point: np.array(1xk)
+    :param point: np.array(1xk) or np.array(txk)
     :param index_points: [int]
     :param index_random: [int]
     :param parameters_dist: {'scale':[float], 'a': [int]}
     :param n_samples: int
     :param double: boolean
-    :return: np.array
+    :return: np.array, or np.array(txm) if point has t > 1 rows.
     """
 
     if double:
@@ -73,6 +86,14 @@ def gamma_expect(f, point, index_points, index_random, parameters_dist, n_sample
 
     dim_w = len(index_random)
 
+    if point.shape[0] > 1 and not double:
+        new_points = np.zeros((point.shape[0] * n_samples, dim_w + point.shape[1]))
+        new_points[:, index_points] = np.repeat(point, n_samples, axis=0)
+        new_points[:, index_random] = gamma.rvs(
+            a, scale=scale, size=(point.shape[0] * n_samples, dim_w))
+        values = f(new_points)
+        return np.mean(values.reshape((point.shape[0], n_samples, values.shape[1])), axis=1)
+
     new_points = np.zeros((n_samples, len(index_random) + point.shape[1]))
     new_points[:, index_points] = np.repeat(point, n_samples, axis=0)
     random = gamma.rvs(a, scale=scale, size=(n_samples, dim_w))
@@ -115,15 +136,9 @@ def gradient_uniform_finite(f, point, index_points, domain_random, index_random,
 
     new_points[:, index_random] = domain_random
 
-    gradients = np.zeros((new_points.shape[0], point.shape[1], points_2.shape[0]))
+    gradients = _evaluate_pairs(f, new_points, points_2, parameters_kernel)[:, :, index_points]
 
-    for i in xrange(new_points.shape[0]):
-        value = f(new_points[i:i+1, :], points_2, parameters_kernel)[:, index_points]
-        gradients[i, :, :] = value.transpose()
-
-    gradient = np.average(gradients, axis=0, weights=weights)
-
-    return gradient
+    return np.einsum('l,lmk->km', _weights_average(new_points.shape[0], weights), gradients)
 
 def gradient_gamma(f, point, index_points, index_random, points_2, parameters_kernel,
                    parameters_dist, n_samples=N_SAMPLES):
@@ -138,15 +153,9 @@ def gradient_gamma(f, point, index_points, index_random, points_2, parameters_ke
     random = gamma.rvs(a, scale=scale, size=(n_samples, dim_w))
     new_points[:, index_random] = random
 
-    gradients = np.zeros((new_points.shape[0], point.shape[1], points_2.shape[0]))
-
-    for i in xrange(new_points.shape[0]):
-        value = f(new_points[i:i+1, :], points_2, parameters_kernel)[:, index_points]
-        gradients[i, :, :] = value.transpose()
+    gradients = _evaluate_pairs(f, new_points, points_2, parameters_kernel)[:, :, index_points]
 
-    gradient = np.mean(gradients, axis=0)
-
-    return gradient
+    return np.einsum('lmk->km', gradients) / n_samples
 
 def hessian_uniform_finite(f, point, index_points, domain_random, index_random, points_2,
                             parameters_kernel, weights=None):
@@ -173,16 +182,10 @@ def hessian_uniform_finite(f, point, index_points, domain_random, index_random,
 
     new_points[:, index_random] = domain_random
 
-    hessian = np.zeros((new_points.shape[0], points_2.shape[0], point.shape[1], point.shape[1]))
-
-    for i in xrange(new_points.shape[0]):
-        value = f(new_points[i:i+1, :], points_2, parameters_kernel)[:, index_points]
-        value = value[:, :, index_points]
-        hessian[i, :, :, :] = value
-
-    hessian = np.average(hessian, axis=0, weights=weights)
+    hessians = _evaluate_pairs(f, new_points, points_2, parameters_kernel)
+    hessians = hessians[:, :, index_points, :][:, :, :, index_points]
 
-    return hessian
+    return np.einsum('l,lmij->mij', _weights_average(new_points.shape[0], weights), hessians)
 
 def hessian_gamma(f, point, index_points, index_random, points_2, parameters_kernel,
                   parameters_dist, n_samples=N_SAMPLES):
@@ -197,16 +200,10 @@ def hessian_gamma(f, point, index_points, index_random, points_2, parameters_ker
     random = gamma.rvs(a, scale=scale, size=(n_samples, dim_w))
     new_points[:, index_random] = random
 
-    hessian = np.zeros((new_points.shape[0], points_2.shape[0], point.shape[1], point.shape[1]))
+    hessians = _evaluate_pairs(f, new_points, points_2, parameters_kernel)
+    hessians = hessians[:, :, index_points, :][:, :, :, index_points]
 
-    for i in xrange(new_points.shape[0]):
-        value = f(new_points[i:i+1, :], points_2, parameters_kernel)[:, index_points]
-        value = value[:, :, index_points]
-        hessian[i, :, :, :] = value
-
-    hessian = np.mean(hessian, axis=0)
-
-    return hessian
+    return np.einsum('lmij->mij', hessians) / n_samples
 
 
 def gradient_uniform_finite_resp_candidate(f, candidate_point, index_points, domain_random,
@@ -226,20 +223,12 @@ def gradient_uniform_finite_resp_candidate(f, candidate_point, index_points, dom
     """
     domain_random = np.array(domain_random)
 
-    dim_random = domain_random.shape[1]
-
-    new_points = np.zeros((domain_random.shape[0], dim_random + points.shape[1]))
-
-    gradients = np.zeros((candidate_point.shape[1], points.shape[0]))
+    new_points = _combine_points_random(points, index_points, domain_random, index_random)
 
-    for i in xrange(points.shape[0]):
-        point = points[i : i+1, :]
-        new_points[:, index_points] = np.repeat(point, domain_random.shape[0], axis=0)
-        new_points[:, index_random] = domain_random
-        values = f(candidate_point, new_points, parameters_kernel)
-        gradients[:, i] = np.average(values, axis=0, weights=weights)
+    values = f(candidate_point, new_points, parameters_kernel)
+    values = values.reshape((points.shape[0], domain_random.shape[0], values.shape[1]))
 
-    return gradients
+    return np.einsum('l,mlk->km', _weights_average(domain_random.shape[0], weights), values)
 
 def gradient_gamma_resp_candidate(f, candidate_point, index_points, index_random, points,
                                   parameters_kernel, parameters_dist, n_samples=N_SAMPLES):
@@ -247,17 +236,74 @@ def gradient_gamma_resp_candidate(f, candidate_point, index_points, index_random
     scale = parameters_dist['scale'][0]
 
     dim_w = len(index_random)
+    n_points = points.shape[0]
 
-    new_points = np.zeros((n_samples, len(index_random) + points.shape[1]))
+    # The samples are drawn in the same order as if they were drawn point by point.
+    new_points = np.zeros((n_points * n_samples, dim_w + points.shape[1]))
+    new_points[:, index_points] = np.repeat(points, n_samples, axis=0)
+    new_points[:, index_random] = gamma.rvs(a, scale=scale, size=(n_points * n_samples, dim_w))
 
-    gradients = np.zeros((candidate_point.shape[1], points.shape[0]))
+    values = f(candidate_point, new_points, parameters_kernel)
+    values = values.reshape((n_points, n_samples, values.shape[1]))
 
-    for i in xrange(points.shape[0]):
-        point = points[i : i+1, :]
-        new_points[:, index_points] = np.repeat(point, n_samples, axis=0)
-        random = gamma.rvs(a, scale=scale, size=(n_samples, dim_w))
-        new_points[:, index_random] = random
-        values = f(candidate_point, new_points, parameters_kernel)
-        gradients[:, i] = np.mean(values, axis=0)
+    return np.einsum('mlk->km', values) / n_samples
+
+
+def _combine_points_random(points, index_points, domain_random, index_random):
+    """
+    Builds all the combinations z=(point, x) of the rows of points and domain_random.
+
+    :param points: np.array(txk)
+    :param index_points: [int]
+    :param domain_random: np.array(lxk')
+    :param index_random: [int]
+    :return: np.array((t * l)x(k + k')), the first l rows correspond to points[0], and so on.
+    """
+
+    n_points = points.shape[0]
+    n_random = domain_random.shape[0]
+
+    new_points = np.zeros((n_points * n_random, domain_random.shape[1] + points.shape[1]))
+    new_points[:, index_points] = np.repeat(points, n_random, axis=0)
+    new_points[:, index_random] = np.tile(domain_random, (n_points, 1))
+
+    return new_points
+
+
+def _evaluate_pairs(f, points, points_2, parameters_kernel):
+    """
+    Evaluates f(point, point_2) in all the pairs of points and points_2 with only one call of f.
+    f has to accept n points paired row by row with n points_2 (see
+    Matern52.grad_respect_point).
+
+    :param f: function
+    :param points: np.array(lxk)
+    :param points_2: np.array(mxk)
+    :param parameters_kernel: np.array(n)
+    :return: np.array(lxmx...)
+    """
+
+    n_points = points.shape[0]
+    n_points_2 = points_2.shape[0]
+
+    values = f(np.repeat(points, n_points_2, axis=0), np.tile(points_2, (n_points, 1)),
+               parameters_kernel)
+
+    return values.reshape((n_points, n_points_2) + values.shape[1:])
+
+
+def _weights_average(n, weights=None):
+    """
+    Normalized weights of a weighted average.
+
+    :param n: int
+    :param weights: np.array(n) or None. If it's None, all the weights are equal.
+    :return: np.array(n)
+    """
+
+    if weights is None:
+        return np.ones(n) / float(n)
+
+    weights = np.array(weights, dtype=float)
 
-    return gradients
+    return weights / np.sum(weights)
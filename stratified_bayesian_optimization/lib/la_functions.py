@@ -4,6 +4,8 @@ import numpy as np
 from scipy.linalg import lapack
 from scipy import linalg
 
+from stratified_bayesian_optimization.lib.constant import N_ROWS_TRIANGULAR_BATCH
+
 
 def cholesky(cov, max_tries=5):
     """
@@ -38,6 +40,65 @@ def cholesky(cov, max_tries=5):
     raise linalg.LinAlgError("not positive definite, even with jitter.")
 
 
+def cholesky_batch(covs, max_tries=5):
+    """
+    Computes the Cholesky decompositions of a stack of matrices with one call. If one of them
+    isn't numerically positive definite, they are computed one by one adding jitter when it's
+    needed (see cholesky).
+    :param covs: np.array(sxnxn)
+    :param max_tries: int
+    :return: np.array(sxnxn)
+    """
+
+    try:
+        return np.linalg.cholesky(covs)
+    except np.linalg.LinAlgError:
+        return np.array([cholesky(cov, max_tries=max_tries) for cov in covs])
+
+
+def solve_triangular_batch(chols, y, trans=False):
+    """
+    Solves the systems chols[s] * x[s] = y[s], or chols[s]^T * x[s] = y[s] if trans is True, for
+    all s. The substitution is done by blocks of N_ROWS_TRIANGULAR_BATCH rows, and each step is
+    done over the sample axis.
+    :param chols: np.array(sxnxn), lower triangular
+    :param y: np.array(sxn)
+    :param trans: boolean
+    :return: np.array(sxn)
+    """
+
+    n = chols.shape[1]
+    x = np.zeros(y.shape)
+
+    starts = range(0, n, N_ROWS_TRIANGULAR_BATCH)
+    if trans:
+        starts = reversed(starts)
+
+    for start in starts:
+        end = min(start + N_ROWS_TRIANGULAR_BATCH, n)
+        if trans:
+            rhs = y[:, start:end] - np.einsum('sji,sj->si', chols[:, end:, start:end], x[:, end:])
+            block = np.swapaxes(chols[:, start:end, start:end], 1, 2)
+        else:
+            rhs = y[:, start:end] - np.einsum('sij,sj->si', chols[:, start:end, 0:start],
+                                              x[:, 0:start])
+            block = chols[:, start:end, start:end]
+        x[:, start:end] = np.linalg.solve(block, rhs[:, :, None])[:, :, 0]
+
+    return x
+
+
+def cho_solve_batch(chols, y):
+    """
+    Solves the systems chols[s] * chols[s]^T * x[s] = y[s] for all s.
+    :param chols: np.array(sxnxn)
+    :param y: np.array(sxn)
+    :return: np.array(sxn)
+    """
+
+    return solve_triangular_batch(chols, solve_triangular_batch(chols, y), trans=True)
+
+
 def cho_solve(chol, y):
     """
     Solves the systems chol * chol^T * x = y
@@ -48,3 +109,63 @@ def cho_solve(chol, y):
 
     chol = np.asfortranarray(chol)
     return lapack.dpotrs(chol, y, lower=1)[0]
+
+
+def cho_quadratic_diagonal(chol, y):
+    """
+    Computes the diagonal of y^T * (chol * chol^T)^-1 * y, i.e. the column-wise sum of squares of
+    chol^-1 * y, without computing the other entries.
+    :param chol: np.array(nxn), lower triangular
+    :param y: np.array(nxk)
+    :return: np.array(k)
+    """
+
+    solve = linalg.solve_triangular(chol, y, lower=True, check_finite=False)
+    return np.sum(solve ** 2, axis=0)
+
+
+def cholesky_extend(chol, cross_cov, cov_new, max_tries=5):
+    """
+    Computes the Cholesky decomposition of the matrix [[cov, cross_cov], [cross_cov^T, cov_new]]
+    given the Cholesky decomposition L of cov. It costs O(n^2 * k) instead of O((n + k)^3).
+    See https://math.stackexchange.com/questions/955874/cholesky-factor-when-adding-a-row-and-
+    column-to-already-factorized-matrix
+
+    :param chol: np.array(nxn), L*L^T = cov
+    :param cross_cov: np.array(nxk)
+    :param cov_new: np.array(kxk)
+    :param max_tries: int
+    :return: np.array((n+k)x(n+k))
+    """
+
+    n = chol.shape[0]
+    k = cov_new.shape[0]
+
+    l_21 = linalg.solve_triangular(chol, cross_cov, lower=True).transpose()
+    l_22 = cholesky(cov_new - np.dot(l_21, l_21.transpose()), max_tries=max_tries)
+
+    extended_chol = np.zeros((n + k, n + k))
+    extended_chol[0:n, 0:n] = chol
+    extended_chol[n:, 0:n] = l_21
+    extended_chol[n:, n:] = l_22
+
+    return extended_chol
+
+
+def cho_inverse(chol):
+    """
+    Computes the inverse of the matrix chol * chol^T
+    :param chol: np.array(nxn)
+    :return: np.array(nxn)
+    """
+
+    chol = np.asfortranarray(chol)
+    inverse, info = lapack.dpotri(chol, lower=1)
+
+    if info != 0:
+        raise linalg.LinAlgError("the inverse couldn't be computed")
+
+    inverse = np.tril(inverse)
+    inverse += np.tril(inverse, -1).transpose()
+
+    return inverse
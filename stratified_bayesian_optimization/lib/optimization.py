@@ -22,7 +22,8 @@ class Optimization(object):
     _hessian_methods = [NEWTON_CG_NAME, TRUST_N_CG, DOGLEG]
 
     def __init__(self, optimizer_name, function, bounds, grad, hessian=None, minimize=True,
-                 full_gradient=None, debug=True, args=None, tol=None, **kwargs):
+                 full_gradient=None, debug=True, args=None, tol=None, value_and_grad=None,
+                 **kwargs):
         """
         Class used to minimize function.
 
@@ -36,6 +37,10 @@ class Optimization(object):
         :param debug: boolean
         :param args: () additional arguments for the full_gradient function
         :parma tol: float
+        :param value_and_grad: function that computes the function and its gradient at the same
+            time, i.e. it returns (float, np.array(n)). If it's not None, it's used instead of
+            function and grad by L-BFGS-B, which avoids computing twice the quantities shared by
+            both of them in each iteration.
         :param kwargs:
             -'factr': int
             -'maxiter': int
@@ -54,7 +59,7 @@ class Optimization(object):
         self.full_gradient = full_gradient
         self.hessian = hessian
         self.tol = tol
-
+        self.value_and_grad = value_and_grad
 
     @staticmethod
     def _get_optimizer(optimizer_name):
@@ -97,7 +102,17 @@ class Optimization(object):
         }
         """
 
-        if self.minimize:
+        if self.value_and_grad is not None and self.optimizer_name == LBFGS_NAME:
+            if self.minimize:
+                f_and_grad = self.value_and_grad
+            else:
+                def f_and_grad(x, *args):
+                    value, gradient = self.value_and_grad(x, *args)
+                    return -1.0 * value, -1.0 * gradient
+
+            opt = self.optimizer(f_and_grad, start, args=args, bounds=self.bounds,
+                                 **self.optimization_options)
+        elif self.minimize:
             if self.optimizer_name == NEWTON_CG_NAME:
                 opt = self.optimizer(self.function, start, fprime=self.gradient,
                                      hessian=self.hessian, args=args,
@@ -152,6 +167,130 @@ class Optimization(object):
             'funcalls': opt[2]['funcalls'],
         }
 
+    def optimize_batch(self, starts, points_args=(), args=()):
+        """
+        Optimizes the function from each one of the starting points simultaneously. The function
+        and the gradient have to be vectorized:
+            function(points, *args) returns np.array(t), and
+            gradient(points, *args) returns np.array(txn),
+        where points is np.array(txn), and args is formed by the rows of points_args of the points
+        followed by args.
+
+        Each point follows a projected gradient method with its own step size, which is doubled
+        when the Armijo condition holds and halved otherwise. Only the points that haven't
+        converged are evaluated in each iteration. The stopping criteria are the ones of L-BFGS-B:
+        the projected gradient is smaller than pgtol, or the relative reduction of the function
+        is smaller than factr * eps.
+
+        :param starts: (np.array(txn)) starting points of the optimization.
+        :param points_args: (np.array(t) or np.array(txk),) arguments to pass to function and
+            gradient that have one row for each starting point.
+        :param args: Arguments to pass to function and gradient.
+
+        :return: {
+            'solution': np.array(txn),
+            'optimal_value': np.array(t),
+            'gradient': np.array(txn),
+            'warnflag': int,
+            'task': str,
+            'nit': int,
+            'funcalls': int,
+        }
+        """
+
+        maxiter = self.optimization_options.get('maxiter', 15000)
+        factr = self.optimization_options.get('factr', 1e7)
+        pgtol = self.optimization_options.get('pgtol', 1e-5)
+
+        sign = 1.0
+        if not self.minimize:
+            sign = -1.0
+
+        lower = np.array([-np.inf if bound[0] is None else bound[0] for bound in self.bounds])
+        upper = np.array([np.inf if bound[1] is None else bound[1] for bound in self.bounds])
+
+        x = np.clip(np.array(starts, dtype=float), lower, upper)
+        n_points = x.shape[0]
+
+        def f(points, index):
+            return sign * self.function(points, *self._args_batch(index, points_args, args))
+
+        def grad(points, index):
+            return sign * self.gradient(points, *self._args_batch(index, points_args, args))
+
+        all_points = np.arange(n_points)
+        values = f(x, all_points)
+        gradient = grad(x, all_points)
+        funcalls = 1
+
+        width = upper - lower
+        width[~np.isfinite(width)] = 1.0
+        step = 0.1 * np.min(width) / np.maximum(np.max(np.abs(gradient), axis=1), 1e-300)
+
+        active = np.ones(n_points, dtype=bool)
+        nit = 0
+
+        while np.any(active) and nit < maxiter:
+            nit += 1
+            index = np.where(active)[0]
+
+            new_x = np.clip(x[index, :] - step[index, np.newaxis] * gradient[index, :],
+                            lower, upper)
+            new_values = f(new_x, index)
+            funcalls += 1
+
+            decrease = np.sum(gradient[index, :] * (x[index, :] - new_x), axis=1)
+            accepted = new_values <= values[index] - 1e-4 * decrease
+            moved = np.max(np.abs(new_x - x[index, :]), axis=1)
+
+            index_accepted = index[accepted]
+            if len(index_accepted) > 0:
+                reduction = values[index_accepted] - new_values[accepted]
+                scale = np.maximum(
+                    np.maximum(np.abs(values[index_accepted]), np.abs(new_values[accepted])),
+                    1.0)
+
+                x[index_accepted, :] = new_x[accepted, :]
+                values[index_accepted] = new_values[accepted]
+                gradient[index_accepted, :] = grad(new_x[accepted, :], index_accepted)
+                step[index_accepted] *= 2.0
+
+                active[index_accepted[reduction <= factr * np.finfo(float).eps * scale]] = False
+
+            step[index[~accepted]] *= 0.5
+            active[index[~accepted & (moved <= 1e-12 * (1.0 + np.max(np.abs(x[index, :]),
+                                                                      axis=1)))]] = False
+
+            projected = x - np.clip(x - gradient, lower, upper)
+            active[np.max(np.abs(projected), axis=1) <= pgtol] = False
+
+        warnflag = 0
+        task = 'CONVERGENCE'
+        if np.any(active):
+            warnflag = 1
+            task = 'STOP: TOTAL NO. of ITERATIONS REACHED LIMIT'
+
+        return {
+            'solution': x,
+            'optimal_value': sign * values,
+            'gradient': sign * gradient,
+            'warnflag': warnflag,
+            'task': task,
+            'nit': nit,
+            'funcalls': funcalls,
+        }
+
+    @staticmethod
+    def _args_batch(index, points_args, args):
+        """
+        Arguments of the function for the points with the given indexes (see optimize_batch).
+
+        :param index: np.array(int)
+        :param points_args: (np.array(t) or np.array(txk),)
+        :param args: ()
+        :return: ()
+        """
+        return tuple(point_arg[index] for point_arg in points_args) + tuple(args)
 
     def SGD(self, start, n, *args, **kwargs):
         if not self.minimize:
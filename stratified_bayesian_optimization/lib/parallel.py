@@ -1,16 +1,119 @@
 from __future__ import absolute_import
 
+import cPickle
+import math
+import os
+import shutil
+import tempfile
 import multiprocessing as mp
 import multiprocessing.pool
+from contextlib import contextmanager
+from cStringIO import StringIO
 from multiprocessing.pool import ThreadPool
 
+import numpy as np
 
 from stratified_bayesian_optimization.initializers.log import SBOLog
+from stratified_bayesian_optimization.lib.constant import (
+    MIN_BYTES_SHARED_MEMORY,
+    MAX_PARALLEL_STATE_DELTAS,
+)
+from stratified_bayesian_optimization.lib.cache import LRUCache
 
 logger = SBOLog(__name__)
 
+# Copies of the shared objects in a worker of the persistent pool:
+# {state_id: {'object': obj, 'version': int}}
+_worker_states = {}
+
+
+def _initialize_worker(states):
+    """
+    Initializes a worker of the persistent pool with the shared objects.
+
+    :param states: {state_id: (str, int)}, pickled object and its version
+    """
+    global _worker_states
+
+    Parallel._pool = None
+    Parallel._shared = {}
+    Parallel._arrays_dir = None
+
+    _worker_states = {}
+    for state_id, (pickled_object, version) in states.iteritems():
+        _worker_states[state_id] = {
+            'object': _loads(pickled_object),
+            'version': version,
+        }
+
+
+def _persistent_load(persistent_id):
+    """
+    Gets the object referenced by a pickle of the persistent pool: a shared object, or an array
+    stored in a memory-mapped file, which is attached read-only without copying it.
+
+    :param persistent_id: state_id or ('array', path)
+    :return: object
+    """
+    if isinstance(persistent_id, tuple):
+        return np.load(persistent_id[1], mmap_mode='r')
+    return _worker_states[persistent_id]['object']
+
+
+def _loads(payload):
+    """
+    Unpickles a payload generated by Parallel._dumps.
+
+    :param payload: str
+    :return: object
+    """
+    unpickler = cPickle.Unpickler(StringIO(payload))
+    unpickler.persistent_load = _persistent_load
+    return unpickler.load()
+
+
+def _run_chunk(payload, deltas):
+    """
+    Runs a chunk of tasks in a worker of the persistent pool. The deltas of the shared objects
+    that the worker hasn't applied yet are applied before running the tasks.
+
+    :param payload: (str) pickled (function, [(key, argument)], args, kwargs), where the shared
+        objects are replaced by their state_id, and the large arrays by their files.
+    :param deltas: {state_id: [(int, delta)]}, deltas and their versions
+    :return: {key: (boolean, output of function or exception)}, the boolean is True if the task
+        succeeded.
+    """
+
+    for state_id, state_deltas in deltas.iteritems():
+        state = _worker_states[state_id]
+        for version, delta in state_deltas:
+            if version > state['version']:
+                state['object'].apply_parallel_state_delta(delta)
+                state['version'] = version
+
+    function, chunk, args, kwargs = _loads(payload)
+
+    results = {}
+    for key, argument in chunk:
+        try:
+            results[key] = (True, function(argument, *args, **kwargs))
+        except Exception as e:
+            results[key] = (False, e)
+    return results
+
 
 class Parallel(object):
+    # Persistent pool of processes (see Parallel.pool), and objects shared with its workers
+    # (see Parallel.share_state).
+    _pool = None
+    _n_jobs = None
+    _shared = {}
+
+    # Directory of the memory-mapped files of the persistent pool. It's None if shared memory is
+    # disabled.
+    _arrays_dir = None
+    _min_bytes_shared_memory = MIN_BYTES_SHARED_MEMORY
+    _n_arrays = 0
 
     @classmethod
     def run_function_different_arguments_parallel(cls, function, arguments, all_success=False,
@@ -25,7 +128,8 @@ class Parallel(object):
         :param signal: (function) calls this function after generating the jobs. It's used to test
             KeyboardInterrupt, and the signal is a mock of KeyboardInterrupt.
         :param parallel: (boolean) The code is run in parallel only if it's True.
-        :param threads: (int) Uses threads instead of processes if threads > 0
+        :param threads: (int) Uses threads instead of processes if threads > 0. If threads = 0
+            and there is a persistent pool (see Parallel.pool), the persistent pool is used.
         :param args: additional arguments of function
         :param kwargs: additional arguments of function
         :return: {int: output of f(arguments[i])}
@@ -39,6 +143,10 @@ class Parallel(object):
             return cls.run_function_different_arguments_sequentially(function, arguments, *args,
                                                                      **kwargs)
 
+        if threads == 0 and cls._pool is not None:
+            return cls._run_persistent_pool(function, arguments, all_success, signal, *args,
+                                            **kwargs)
+
         n_jobs = min(len(arguments), mp.cpu_count())
 
         if threads > 0:
@@ -75,6 +183,280 @@ class Parallel(object):
                     logger.info(kwargs)
         return results
 
+    @classmethod
+    @contextmanager
+    def pool(cls, n_jobs=None, shared_memory=False,
+             min_bytes_shared_memory=MIN_BYTES_SHARED_MEMORY):
+        """
+        Keeps a pool of processes alive inside the with block. It's used by all the calls to
+        run_function_different_arguments_parallel that use processes, instead of creating a new
+        pool in each call. Nested blocks use the outer pool.
+
+        If shared_memory is True, the numpy arrays of the tasks and of the shared objects with at
+        least min_bytes_shared_memory bytes (e.g. the points of the GP, its Cholesky factors or
+        the discretization of the domain) are written once to memory-mapped files, and the
+        workers attach read-only views of them instead of receiving a copy in each task.
+
+        :param n_jobs: (int) Number of processes. By default, it's the number of cpus.
+        :param shared_memory: boolean
+        :param min_bytes_shared_memory: int
+        """
+
+        if cls._pool is not None:
+            yield cls._pool
+            return
+
+        if n_jobs is None:
+            n_jobs = mp.cpu_count()
+
+        cls._n_jobs = n_jobs
+        cls._shared = {}
+        cls._arrays_dir = None
+        if shared_memory:
+            cls._arrays_dir = tempfile.mkdtemp(prefix='sbo_arrays_')
+            cls._min_bytes_shared_memory = min_bytes_shared_memory
+        cls._restart_pool()
+
+        try:
+            yield cls._pool
+        finally:
+            cls._pool.terminate()
+            cls._pool.join()
+            cls._pool = None
+            cls._shared = {}
+            if cls._arrays_dir is not None:
+                shutil.rmtree(cls._arrays_dir, ignore_errors=True)
+                cls._arrays_dir = None
+
+    @classmethod
+    def share_state(cls, obj):
+        """
+        Ships obj once to the workers of the persistent pool. Afterwards, every reference to obj
+        in the arguments of the tasks is replaced by the copy of the worker, so obj isn't pickled
+        in each task.
+
+        obj has to define:
+            -parallel_state_token(): returns a token that changes when obj changes.
+            -parallel_state_delta(token): returns the delta between the state of obj when it had
+                the given token and its current state, or None if obj can't be updated by delta.
+            -apply_parallel_state_delta(delta): applies a delta to obj.
+        Before each call, the copies of the workers are updated with the deltas, or obj is shipped
+        again if there is no delta. obj is also shipped again when it has more than
+        MAX_PARALLEL_STATE_DELTAS deltas, so that they aren't sent forever.
+
+        It does nothing if there isn't a persistent pool.
+
+        :param obj: object
+        """
+
+        if cls._pool is None:
+            return
+
+        if id(obj) in cls._shared:
+            cls._remove_files(cls._shared[id(obj)]['files'])
+
+        files = []
+        cls._shared[id(obj)] = {
+            'object': obj,
+            'state_id': 'state_%d' % id(obj),
+            'token': obj.parallel_state_token(),
+            'pickled_object': cls._dumps(obj, files=files),
+            'files': files,
+            'version': 0,
+            'deltas': [],
+        }
+        cls._restart_pool()
+
+    @classmethod
+    def _restart_pool(cls):
+        """
+        Creates the persistent pool, whose workers are initialized with the shared objects.
+        """
+
+        if cls._pool is not None:
+            cls._pool.terminate()
+            cls._pool.join()
+
+        states = {}
+        for state in cls._shared.itervalues():
+            states[state['state_id']] = (state['pickled_object'], state['version'])
+
+        cls._pool = mp.Pool(processes=cls._n_jobs, initializer=_initialize_worker,
+                            initargs=(states, ))
+
+    @classmethod
+    def _update_shared_states(cls):
+        """
+        Computes the deltas of the shared objects that changed since the last call. The objects
+        that can't be updated by delta, or that have too many deltas, are shipped again as the new
+        base of the copies of the workers, restarting the pool.
+        """
+
+        restart = False
+
+        for state in cls._shared.itervalues():
+            obj = state['object']
+            token = obj.parallel_state_token()
+
+            if token == state['token']:
+                continue
+
+            delta = obj.parallel_state_delta(state['token'])
+            state['version'] += 1
+            state['token'] = token
+
+            if delta is not None:
+                state['deltas'].append((state['version'], delta))
+
+            if delta is None or len(state['deltas']) > MAX_PARALLEL_STATE_DELTAS:
+                cls._remove_files(state['files'])
+                state['files'] = []
+                state['pickled_object'] = cls._dumps(obj, files=state['files'])
+                state['deltas'] = []
+                restart = True
+
+        if restart:
+            cls._restart_pool()
+
+    @classmethod
+    def _run_persistent_pool(cls, function, arguments, all_success=False, signal=None, *args,
+                             **kwargs):
+        """
+        Runs the function in the persistent pool. The tasks are submitted in chunks, and the
+        shared objects are sent as references to the copies of the workers.
+        See run_function_different_arguments_parallel.
+        """
+
+        cls._update_shared_states()
+
+        shared_ids = {}
+        deltas = {}
+        for key, state in cls._shared.iteritems():
+            shared_ids[key] = state['state_id']
+            if len(state['deltas']) > 0:
+                deltas[state['state_id']] = state['deltas']
+
+        items = list(arguments.iteritems())
+        chunk_size = max(1, int(math.ceil(len(items) / (4.0 * cls._n_jobs))))
+
+        jobs = []
+        failed = {}
+        files = []
+        arrays = {}
+
+        try:
+            for i in xrange(0, len(items), chunk_size):
+                chunk = items[i: i + chunk_size]
+                try:
+                    payload = cls._dumps((function, chunk, args, kwargs), shared_ids=shared_ids,
+                                         arrays=arrays, files=files)
+                except Exception as e:
+                    for key, argument in chunk:
+                        failed[key] = e
+                    continue
+                jobs.append((chunk, cls._pool.apply_async(_run_chunk, args=(payload, deltas))))
+
+            for chunk, job in jobs:
+                job.wait()
+            if signal is not None:
+                signal(1)
+        except KeyboardInterrupt:
+            logger.info("Ctrl+c received, terminating and restarting pool.")
+            cls._restart_pool()
+            cls._remove_files(files)
+            return -1
+
+        results = {}
+        for chunk, job in jobs:
+            try:
+                output = job.get()
+            except Exception as e:
+                output = dict((key, (False, e)) for key, argument in chunk)
+
+            for key, (success, value) in output.iteritems():
+                if success:
+                    results[key] = value
+                else:
+                    failed[key] = value
+
+        cls._remove_files(files)
+
+        for key, e in failed.iteritems():
+            if all_success:
+                raise e
+            else:
+                logger.info("job failed")
+                logger.info(key)
+                logger.info(arguments[key])
+                logger.info(args)
+                logger.info(kwargs)
+
+        return results
+
+    @classmethod
+    def _dumps(cls, obj, shared_ids=None, arrays=None, files=None):
+        """
+        Pickles obj for the workers of the persistent pool. The shared objects are replaced by
+        their state_id, and if shared memory is enabled, the large arrays are written to
+        memory-mapped files and replaced by their paths. In that case the entries of the
+        LRUCaches (e.g. the Cholesky factors of the GP) are pickled too, since their arrays
+        aren't copied.
+
+        :param obj: object
+        :param shared_ids: {id(object): state_id}
+        :param arrays: {id(np.array): ('array', path)}, arrays already written to files. It's
+            updated with the new files.
+        :param files: [str], the paths of the new files are appended to it.
+        :return: str
+        """
+
+        if shared_ids is None:
+            shared_ids = {}
+        if arrays is None:
+            arrays = {}
+        if files is None:
+            files = []
+
+        def persistent_id(value):
+            if id(value) in shared_ids:
+                return shared_ids[id(value)]
+
+            if cls._arrays_dir is None or type(value) is not np.ndarray or \
+                    value.dtype.hasobject or value.nbytes < cls._min_bytes_shared_memory:
+                return None
+
+            if id(value) not in arrays:
+                cls._n_arrays += 1
+                path = os.path.join(cls._arrays_dir, 'array_%d.npy' % cls._n_arrays)
+                np.save(path, value)
+                files.append(path)
+                arrays[id(value)] = ('array', path)
+
+            return arrays[id(value)]
+
+        output = StringIO()
+        pickler = cPickle.Pickler(output, cPickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = persistent_id
+
+        LRUCache.pickle_entries = cls._arrays_dir is not None
+        try:
+            pickler.dump(obj)
+        finally:
+            LRUCache.pickle_entries = False
+
+        return output.getvalue()
+
+    @staticmethod
+    def _remove_files(files):
+        """
+        Removes the memory-mapped files. The workers that still use them keep their mappings.
+
+        :param files: [str]
+        """
+        for path in files:
+            if os.path.exists(path):
+                os.remove(path)
+
     @staticmethod
     def run_function_different_arguments_sequentially(function, arguments, *args, **kwargs):
         """
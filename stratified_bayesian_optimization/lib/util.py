@@ -2,6 +2,8 @@ from __future__ import absolute_import
 
 from collections import defaultdict
 
+import time
+
 import numpy as np
 
 from stratified_bayesian_optimization.lib.constant import(
@@ -116,6 +118,22 @@ def wrapper_evaluate_objective_function(point, cls_, name_module, n_samples):
     return cls_.evaluate_function(module, point, n_samples)
 
 
+def wrapper_evaluate_main_objective(point, cls_, name_module, n_samples):
+    """
+    Wrapper of evaluate_objective in Objective
+    :param point: [float]
+    :param cls_: Objective
+    :param name_module: (str) Name of the module of the problem
+    :param n_samples: int. If noise is true, we take n_samples of the function to estimate its
+        value.
+    :return: [float]
+    """
+
+    module = __import__(name_module, globals(), locals(), -1)
+
+    return cls_.evaluate_objective(module, point, n_samples=n_samples)
+
+
 def get_number_parameters_kernel(kernel_name, dim, **kernel_parameters):
     """
     Returns the number of parameters associated to the kernel.
@@ -393,6 +411,30 @@ def wrapper_gradient_voi(point, self, monte_carlo=False, n_samples=1, n_restarts
 
     return value
 
+def wrapper_objective_and_gradient_voi(point, self, monte_carlo=False, n_samples=1,
+                                       n_restarts=1, n_best_restarts=0, opt_params_mc=None,
+                                       n_threads=0, n_samples_parameters=0, method_opt_mc=None):
+    """
+    Wrapper of objective_voi_with_gradient. See wrapper_objective_voi for the description of the
+    parameters.
+
+    :return: (float, np.array(n))
+    """
+
+    if opt_params_mc is None:
+        opt_params_mc = {}
+
+    if n_samples_parameters == 0:
+        return self.objective_voi_with_gradient(
+            point, monte_carlo=monte_carlo, n_samples=n_samples, n_restarts=n_restarts,
+            n_best_restarts=n_best_restarts, n_threads=n_threads, method_opt=method_opt_mc,
+            **opt_params_mc)
+
+    args = (self, monte_carlo, n_samples, n_restarts, n_best_restarts, opt_params_mc, n_threads,
+            n_samples_parameters, method_opt_mc)
+
+    return wrapper_objective_voi(point, *args), wrapper_gradient_voi(point, *args)
+
 def wrapper_evaluate_quadrature_cross_cov(point, historical_points, parameters_kernel, self):
     """
     Wrapper of evaluate quadrature cross cov
@@ -411,18 +453,18 @@ def wrapper_evaluate_quadrature_cross_cov(point, historical_points, parameters_k
 def wrapper_compute_vector_b(point, compute_vec_covs, compute_b_new, historical_points,
                              parameters_kernel, candidate_point, self):
     """
-    Wrapper of the function that computes B(x, i) and B(new, i)
+    Wrapper of the function that computes B(x, i) and B(new, i) for each x in point.
 
-    :param point: np.array(1xn)
+    :param point: np.array(txn)
     :param compute_vec_covs: boolean
     :param compute_b_new: boolean
     :param historical_points: np.array(kxm)
     :param parameters_kernel: np.array(l)
-    :param candidate_point: np.array(1xm)
+    :param candidate_point: np.array(rxm)
     :param self: bq instance
     :return: {
-        'b_new': float,
-        'vec_covs': np.array(k),
+        'b_new': np.array(txr),
+        'vec_covs': np.array(txk),
     }
     """
     b_new = None
@@ -495,29 +537,7 @@ def wrapper_evaluate_sbo(candidate_points, task, self):
         self.discretization, candidate_points
     )
 
-    a = vectors['a']
-    b = vectors['b']
-
-    r = candidate_points.shape[0]
-
-    values = np.zeros(r)
-
-
-    b_vectors = {}
-    for i in xrange(r):
-        b_vectors[i] = b[:, i]
-
-    args = (False, None, True, 0, a, self,)
-    val = Parallel.run_function_different_arguments_parallel(
-        wrapper_hvoi, b_vectors, *args)
-
-    for i in xrange(r):
-        if val.get(i) is None:
-            logger.info("Computation of VOI failed for new_point %d" % i)
-            continue
-        values[i] = val[i]
-
-    return values
+    return self.hvoi_batch(vectors['a'], vectors['b'])
 
 
 def wrapper_hvoi(b, a, self):
@@ -625,6 +645,29 @@ def wrapper_evaluate_sbo_by_sample_no_sp(
         method_opt=method_opt, tol=None, **opt_params_mc)
 
 
+def wrapper_evaluate_sbo_by_samples_batch(candidate_samples_parameters, self, n_restarts,
+                                          **opt_params_mc):
+    """
+
+    :param candidate_samples_parameters: [np.array(1xm), np.array(s), np.array(l)], the candidate
+        point, the samples of the Gaussian r.v. and the parameters of the GP.
+    :param self: sbo-instance
+    :param n_restarts: int
+    :param opt_params_mc:
+        -'factr': int
+        -'maxiter': int
+    :return: {'max': np.array(s), 'optimum': np.array(sxn)}
+    """
+
+    candidate_point = candidate_samples_parameters[0]
+    samples = candidate_samples_parameters[1]
+    params = candidate_samples_parameters[2]
+
+    return self.evaluate_sbo_by_samples_batch(
+        candidate_point, samples, var_noise=params[0], mean=params[1],
+        parameters_kernel=params[2:], n_restarts=n_restarts, **opt_params_mc)
+
+
 def wrapper_evaluate_sbo_by_sample_bayesian(start_sample_parameters, self, candidate_point,
                                             n_threads, method_opt, **opt_params_mc):
     """
@@ -701,7 +744,7 @@ def wrapper_evaluate_sample_bayesian(point, self):
     params = point[3]
 
     val = self.evaluate_sample(point_, candidate_point, sample, params[0], params[1], params[2:],
-                               True, 0, False)
+                               True, 0)
     return val
 
 def wrapper_evaluate_gradient_sample(point, self, *args):
@@ -756,6 +799,46 @@ def wrapper_sgd(point_rs, self, *args, **kwargs):
 
     return self.SGD(point, *args, **kwargs)
 
+def wrapper_sample_chain(start_point_rs, self, n_samples):
+    """
+    Wrapper of sample_parameters that runs one of the chains of
+    GPFittingGaussian.sample_parameters_chains.
+
+    :param start_point_rs: [np.array(n_parameters), int], starting point and random seed of the
+        chain
+    :param self: gp-model instance
+    :param n_samples: int
+    :return: {
+        'samples': [np.array(n_parameters)],
+        'time': float, seconds used to sample the chain,
+        'statistics': {str: int}, counters of the slice samplers (see SliceSampling.statistics)
+    }
+    """
+    np.random.seed(start_point_rs[1])
+
+    for slice in self.slice_samplers:
+        slice.reset_statistics()
+
+    n_samples_parameters = len(self.samples_parameters)
+
+    start_time = time.time()
+    samples = self.sample_parameters(n_samples, start_point=start_point_rs[0])
+    time_chain = time.time() - start_time
+
+    # sample_parameters may append the samples to the model
+    del self.samples_parameters[n_samples_parameters:]
+
+    statistics = defaultdict(int)
+    for slice in self.slice_samplers:
+        for key, value in slice.statistics().iteritems():
+            statistics[key] += value
+
+    return {
+        'samples': samples,
+        'time': time_chain,
+        'statistics': dict(statistics),
+    }
+
 def wrapper_objective_posterior_mean_bq(point, self, var_noise=None, mean=None,
                                         parameters_kernel=None, n_samples_parameters=0):
     """
@@ -793,6 +876,25 @@ def wrapper_grad_posterior_mean_bq(point, self, var_noise=None, mean=None, param
 
     return val
 
+def wrapper_objective_and_gradient_posterior_mean_bq(
+        point, self, var_noise=None, mean=None, parameters_kernel=None, n_samples_parameters=0):
+    """
+    Wrapper of the posterior mean of a bq model and its gradient
+    :param point: np.array(k)
+    :param self: bayesian-quadrature instance
+    :param n_samples_parameters: int
+    :return: (float, np.array(k))
+    """
+
+    if n_samples_parameters == 0:
+        return self.objective_and_grad_posterior_mean(point, var_noise=var_noise, mean=mean,
+                                                      parameters_kernel=parameters_kernel)
+
+    args = (self, var_noise, mean, parameters_kernel, n_samples_parameters)
+
+    return wrapper_objective_posterior_mean_bq(point, *args), \
+        wrapper_grad_posterior_mean_bq(point, *args)
+
 def wrapper_hessian_posterior_mean_bq(
         point, self, var_noise=None, mean=None, parameters_kernel=None, n_samples_parameters=0):
     """
@@ -836,6 +938,25 @@ def wrapper_objective_acquisition_function(point, self, n_samples_parameters=0,
 
     return value
 
+def wrapper_objective_and_gradient_acquisition_function(point, self, n_samples_parameters=0,
+                                                        *params):
+    """
+    Wrapper of an acquisition function that's not SBO or KG, and its gradient.
+
+    :param point: np.array(n)
+    :param self: acquisition function instance
+    :param n_samples_parameters: int
+    :param params: additional parameters of the function
+    :return: (float, np.array(n))
+    """
+
+    if n_samples_parameters == 0:
+        point = point.reshape((1, len(point)))
+        return self.evaluate_with_gradient(point, *params)
+
+    return wrapper_objective_acquisition_function(point, self, n_samples_parameters, *params), \
+        wrapper_gradient_acquisition_function(point, self, n_samples_parameters, *params)
+
 def wrapper_posterior_mean_gp_model(point, self, n_samples_parameters=0, *params):
     point = point.reshape((1, len(point)))
 
@@ -886,14 +1007,6 @@ def wrapper_gradient_acquisition_function(point, self, n_samples_parameters=0, *
 
     return value
 
-def wrapper_get_parameters_for_samples(parameters, point, self, *args):
-    return self.bq.get_parameters_for_samples(True, point, parameters[0], parameters[1],
-                                              parameters[2], clear_cache=False)
-
-def wrapper_get_parameters_for_samples_2(parameters, self, *args):
-    return self.bq.get_parameters_for_samples(True, parameters[3], parameters[0], parameters[1],
-                                              parameters[2], clear_cache=False)
-
 def wrapper_grad_voi_sgd(point, self, *args, **opt_params_mc):
 
     return self.grad_voi_sgd(point, *args,  **opt_params_mc)
@@ -914,3 +1027,58 @@ def wrapper_evaluate_gradient_sample_params_bq(point, self):
 
 def wrapper_evaluate_gradient_sample_params_gp(point, self):
     return self.evaluate_gradient_sample_params(point)
+
+
+def optimize_batch_kriging_believer(acquisition_function, gp_model, q, **opt_params):
+    """
+    Chooses q points by optimizing the acquisition function q times. After each optimization, the
+    point is added to gp_model with its posterior mean as evaluation (kriging believer), so the
+    next point is chosen as if the evaluations of the previous ones were known. The Cholesky
+    decompositions cached by gp_model are extended with the new points instead of recomputed,
+    and the points are removed at the end.
+
+    :param acquisition_function: EI, SBO or MultiTasks
+    :param gp_model: GPFittingGaussian used by acquisition_function
+    :param q: (int) number of points
+    :param opt_params: arguments of acquisition_function.optimize. The random_seed and
+        start_new_chain are only used in the first optimization.
+    :return: {'solution': np.array(qxn), 'optimal_value': np.array(q)}
+    """
+
+    n_samples_parameters = opt_params.get('n_samples_parameters', 0)
+
+    solutions = []
+    optimal_values = []
+    n_added_points = 0
+
+    try:
+        for i in xrange(q):
+            solution = acquisition_function.optimize(**opt_params)
+            opt_params['random_seed'] = None
+            opt_params['start_new_chain'] = False
+
+            point = solution['solution'].reshape((1, len(solution['solution'])))
+            solutions.append(point[0, :])
+            optimal_values.append(solution['optimal_value'])
+
+            if i == q - 1:
+                break
+
+            believed_value = gp_model.posterior_mean_many(
+                point, n_samples_parameters=n_samples_parameters)
+
+            var_noise = None
+            if gp_model.data['var_noise'] is not None:
+                var_noise = np.array([np.mean(gp_model.data['var_noise'])])
+
+            gp_model.add_points_evaluations(point, believed_value, var_noise_eval=var_noise)
+            n_added_points += 1
+            acquisition_function.clean_cache(keep_factors=True)
+    finally:
+        gp_model.remove_points_evaluations(n_added_points)
+        acquisition_function.clean_cache(keep_factors=True)
+
+    return {
+        'solution': np.array(solutions),
+        'optimal_value': np.array(optimal_values),
+    }
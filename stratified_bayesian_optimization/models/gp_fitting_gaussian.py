@@ -26,8 +26,12 @@ from stratified_bayesian_optimization.lib.constant import (
     RESULTS_DIR,
     EI_METHOD,
     SGD_NAME,
+    MAX_CHANGES_DATA_LOGGED,
     DEBUGGING_DIR,
     DEFAULT_N_PARAMETERS,
+    N_POINTS_COV_DIAGONAL_BATCH,
+    MIN_EFFECTIVE_SAMPLE_SIZE_RATIO,
+    N_REJUVENATION_STEPS,
 )
 from stratified_bayesian_optimization.lib.util_gp_fitting import (
     get_kernel_default,
@@ -47,6 +51,7 @@ from stratified_bayesian_optimization.lib.util import (
     wrapper_objective_acquisition_function,
     wrapper_gradient_posterior_mean_gp_model,
     wrapper_posterior_mean_gp_model,
+    wrapper_sample_chain,
     wrapper_optimize,
     wrapper_sgd,
     wrapper_evaluate_gradient_sample_params_gp,
@@ -64,9 +69,16 @@ from stratified_bayesian_optimization.priors.gaussian import GaussianPrior
 from stratified_bayesian_optimization.priors.constant import Constant
 from stratified_bayesian_optimization.samplers.slice_sampling import SliceSampling
 from stratified_bayesian_optimization.util.json_file import JSONFile
+from stratified_bayesian_optimization.lib.cache import LRUCache
+from stratified_bayesian_optimization.bayesian.bayesian_evaluations import BayesianEvaluations
 from stratified_bayesian_optimization.lib.la_functions import (
     cholesky,
     cho_solve,
+    cholesky_extend,
+    cho_inverse,
+    cho_quadratic_diagonal,
+    cholesky_batch,
+    cho_solve_batch,
 )
 
 logger = SBOLog(__name__)
@@ -81,7 +93,7 @@ class GPFittingGaussian(object):
                  start_point_sampler=None, max_steps_out=1, data=None, random_seed=None,
                  type_bounds=None, training_name=None, problem_name=None,
                  name_model='gp_fitting_gaussian', samples_parameters=None, noise=False,
-                 **kernel_parameters):
+                 cache_max_bytes=None, n_chains=1, **kernel_parameters):
         """
         :param type_kernel: [str] Must be in possible_kernels. If it's a product of kernels it
             should be a list as: [PRODUCT_KERNELS_SEPARABLE, NAME_1_KERNEL, NAME_2_KERNEL].
@@ -116,6 +128,10 @@ class GPFittingGaussian(object):
         :param kernel_parameters: additional kernel parameters,
             - SAME_CORRELATION: (boolean) True or False. Parameter used only for task kernel.
         :param samples_parameters: [[float]]
+        :param cache_max_bytes: (int) maximum number of bytes of each cache of the model. If it's
+            None, DEFAULT_CACHE_MAX_BYTES is used.
+        :param n_chains: (int) Number of independent chains of the MCMC, which are run in parallel.
+            Each chain has its own starting point and burning (see start_new_chain).
 
         """
 
@@ -178,6 +194,7 @@ class GPFittingGaussian(object):
         self.thinning = thinning
         self.max_steps_out = max_steps_out
         self.n_burning = n_burning
+        self.n_chains = n_chains
         self.samples_parameters = []
 
         if samples_parameters is not None:
@@ -185,8 +202,26 @@ class GPFittingGaussian(object):
         self.slice_samplers = []
         self.start_point_sampler = start_point_sampler
 
-        self.cache_chol_cov = {}
-        self.cache_sol_chol_y_unbiased = {}
+        # If it's True, update_chain reweights and rejuvenates the previous samples of the
+        # parameters instead of starting a new chain.
+        self.warm_start_chain = False
+        # Number of points of the data used when the current chain was sampled.
+        self.chain_n_points = None
+        # Number of changes of the data other than adding points (see replace_evaluations and
+        # remove_points_evaluations). It's part of the parallel_state_token.
+        self.n_edits_data = 0
+        # Last changes of the data (adding, replacing and removing points) and total number of
+        # changes. They're the deltas of the copies of the model in the workers of the persistent
+        # pool (see parallel_state_delta).
+        self.changes_data = []
+        self.n_changes_data = 0
+        # Timing and counters of the samplers of each chain of the last call to
+        # sample_parameters_chains.
+        self.chains_statistics = []
+
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_chol_cov = LRUCache(cache_max_bytes)
+        self.cache_sol_chol_y_unbiased = LRUCache(cache_max_bytes)
 
         self.best_solution = {} # Historical best solution for EI.
         self.cache_cov_n = {} # Cache computations of the cov_n
@@ -234,23 +269,37 @@ class GPFittingGaussian(object):
         else:
             self.samples_parameters = []
             self.samples_parameters.append(self.get_value_parameters_model)
-            if self.n_burning > 0:
-                parameters = self.sample_parameters(float(self.n_burning) / (self.thinning + 1))
-                self.samples_parameters = []
-                self.samples_parameters.append(parameters[-1])
-                self.start_point_sampler = parameters[-1]
-            else:
-                self.start_point_sampler = self.get_value_parameters_model
+            self.start_new_chain()
 
     def start_new_chain(self, random_seed=None):
         """
-        Starts a new chain of sampled parameters.
+        Starts a new chain of sampled parameters. If n_chains > 1, n_chains chains are started:
+        the first one from the last sample, and the others from samples of the prior. Each chain
+        does its own burning, and the last samples of the parameters are the current states of the
+        chains (see sample_parameters_chains).
 
         :param random_seed: int
         """
         if random_seed is not None:
             np.random.seed(random_seed)
 
+        if self.n_chains > 1:
+            start_points = self.sample_parameters_prior(self.n_chains - 1)
+            if not self.noise or self.data.get('var_noise') is not None:
+                start_points[:, 0:2] = self.samples_parameters[-1][0:2]
+            start_points = [self.samples_parameters[-1]] + list(start_points)
+
+            if self.n_burning > 0:
+                self.samples_parameters = []
+                start_points = self.sample_parameters_chains(
+                    float(self.n_burning) / (self.thinning + 1), self.n_chains,
+                    start_points=start_points)[-self.n_chains:]
+
+            self.samples_parameters = list(start_points)
+            self.start_point_sampler = start_points[-1]
+            self.chain_n_points = self.data['evaluations'].shape[0]
+            return
+
         if self.n_burning > 0:
             parameters = self.sample_parameters(float(self.n_burning) / (self.thinning + 1))
         else:
@@ -259,6 +308,103 @@ class GPFittingGaussian(object):
         self.samples_parameters = []
         self.samples_parameters.append(parameters[-1])
         self.start_point_sampler = parameters[-1]
+        self.chain_n_points = self.data['evaluations'].shape[0]
+
+    def importance_weights_samples(self, n_samples):
+        """
+        Normalized importance weights of the last n_samples sampled parameters. The samples were
+        drawn from the posterior given the first chain_n_points points of the data, and they are
+        reweighted to target the posterior given all the data:
+            w_i ~ p(data | parameters_i) / p(first chain_n_points points | parameters_i).
+        The priors cancel out.
+
+        :param n_samples: int
+        :return: np.array(n_samples), or None if the weights can't be computed.
+        """
+
+        n_points = self.data['evaluations'].shape[0]
+        samples = self.samples_parameters[-n_samples:]
+
+        if self.chain_n_points is None or self.chain_n_points > n_points or \
+                len(samples) < n_samples:
+            return None
+
+        if self.chain_n_points == n_points:
+            return np.ones(n_samples) / float(n_samples)
+
+        log_weights = np.zeros(n_samples)
+        for i, sample in enumerate(samples):
+            log_weights[i] = \
+                self.log_likelihood(sample[0], sample[1], sample[2:]) - \
+                self.log_likelihood(sample[0], sample[1], sample[2:], self.chain_n_points)
+
+        if not np.all(np.isfinite(log_weights)):
+            return None
+
+        weights = np.exp(log_weights - np.max(log_weights))
+
+        return weights / np.sum(weights)
+
+    def effective_sample_size(self, n_samples=DEFAULT_N_PARAMETERS):
+        """
+        Effective sample size of the last n_samples sampled parameters, when they are reweighted
+        to target the posterior given all the data (see importance_weights_samples).
+
+        :param n_samples: int
+        :return: float
+        """
+        weights = self.importance_weights_samples(n_samples)
+
+        if weights is None:
+            return 0.0
+
+        return 1.0 / np.sum(weights ** 2)
+
+    def update_chain(self, n_samples, random_seed=None):
+        """
+        Gets n_samples samples of the parameters from the posterior given the current data.
+
+        If warm_start_chain is False, a new chain is started (including the burning) and
+        n_samples parameters are sampled. Otherwise, the previous samples are reweighted with
+        their importance weights, resampled, and each one is moved N_REJUVENATION_STEPS steps of
+        the slice sampler. The new chain is only started if the effective sample size is smaller
+        than MIN_EFFECTIVE_SAMPLE_SIZE_RATIO * n_samples.
+
+        :param n_samples: int
+        :param random_seed: int
+        """
+
+        if random_seed is not None:
+            np.random.seed(random_seed)
+
+        weights = None
+        if self.warm_start_chain:
+            weights = self.importance_weights_samples(n_samples)
+
+        if weights is None or 1.0 / np.sum(weights ** 2) < \
+                MIN_EFFECTIVE_SAMPLE_SIZE_RATIO * n_samples:
+            self.start_new_chain()
+            self.sample_parameters_current_chains(n_samples)
+            return
+
+        if self.chain_n_points == self.data['evaluations'].shape[0]:
+            return
+
+        logger.info('Effective sample size of the parameters: %f' % (1.0 / np.sum(weights ** 2)))
+
+        # Systematic resampling
+        samples = self.samples_parameters[-n_samples:]
+        positions = (np.random.uniform() + np.arange(n_samples)) / float(n_samples)
+        indexes = np.minimum(np.searchsorted(np.cumsum(weights), positions), n_samples - 1)
+
+        new_samples = []
+        for index in indexes:
+            new_samples.append(
+                self.sample_parameters(N_REJUVENATION_STEPS, start_point=samples[index])[-1])
+
+        self.samples_parameters = new_samples
+        self.start_point_sampler = new_samples[-1]
+        self.chain_n_points = self.data['evaluations'].shape[0]
 
     def sample_parameters(self, n_samples, start_point=None, random_seed=None):
         """
@@ -324,6 +470,85 @@ class GPFittingGaussian(object):
 
         return samples_return
 
+    def sample_parameters_current_chains(self, n_samples):
+        """
+        Sample at least n_samples parameters of the model from the posterior, continuing the
+        n_chains chains of the model.
+
+        :param n_samples: int
+        :return: [np.array(float)]
+        """
+
+        if self.n_chains > 1:
+            return self.sample_parameters_chains(
+                int(np.ceil(float(n_samples) / self.n_chains)), self.n_chains)
+
+        return self.sample_parameters(n_samples)
+
+    def sample_parameters_chains(self, n_samples, n_chains, start_points=None, random_seed=None,
+                                 parallel=True):
+        """
+        Sample parameters of the model from the posterior with n_chains independent chains, which
+        are run in parallel. The samples of the chains are interleaved and appended to
+        samples_parameters, so the last samples come from all the chains. The time and the
+        counters of the slice samplers of each chain are saved in chains_statistics.
+
+        :param n_samples: (int) number of samples of each chain
+        :param n_chains: (int)
+        :param start_points: [np.array(n_parameters)], starting point of each chain. If it's None,
+            the chains start from the last n_chains samples.
+        :param random_seed: int
+        :param parallel: (boolean)
+
+        :return: (n_samples * n_chains) * [np.array(float)]
+        """
+
+        if random_seed is not None:
+            np.random.seed(random_seed)
+
+        if start_points is None:
+            start_points = self.samples_parameters[-n_chains:]
+            start_points = [start_points[i % len(start_points)] for i in xrange(n_chains)]
+
+        random_seeds = np.random.randint(0, 4294967295, n_chains)
+
+        arguments = {}
+        for i in xrange(n_chains):
+            arguments[i] = [start_points[i], random_seeds[i]]
+
+        chains = Parallel.run_function_different_arguments_parallel(
+            wrapper_sample_chain, arguments, False, None, parallel, 0, self, n_samples)
+
+        samples_chains = []
+        self.chains_statistics = []
+        for i in xrange(n_chains):
+            if chains.get(i) is None:
+                logger.info("Error sampling the chain %d of the parameters" % i)
+                continue
+            samples_chains.append(chains[i]['samples'])
+
+            statistics = chains[i]['statistics']
+            statistics['time'] = chains[i]['time']
+            self.chains_statistics.append(statistics)
+
+        logger.info("Statistics of the chains of the parameters: ")
+        logger.info(self.chains_statistics)
+
+        if len(samples_chains) == 0:
+            logger.info('program failed to compute a sample of the parameters')
+            sys.exit(1)
+
+        samples = []
+        for j in xrange(max([len(chain) for chain in samples_chains])):
+            for chain in samples_chains:
+                if j < len(chain):
+                    samples.append(chain[j])
+
+        self.samples_parameters += samples
+        self.start_point_sampler = samples[-1]
+
+        return samples
+
     def set_parameters_kernel(self):
         """
         Defines the mean and var_noise parameters. It also defines the kernel.
@@ -469,18 +694,231 @@ class GPFittingGaussian(object):
         :param var_noise_eval: np.array(k)
         """
 
+        historical_points = self.data['points']
+
         self.data['points'] = np.append(self.data['points'], point, axis=0)
         self.data['evaluations'] = np.append(self.data['evaluations'], evaluation)
 
         if var_noise_eval is not None:
             self.data['var_noise'] = np.append(self.data['var_noise'], var_noise_eval)
 
-        # TODO: updated cache in a smart way
-        # https://math.stackexchange.com/questions/955874/cholesky-factor-when-adding-a-row-and-
-        # column-to-already-factorized-matrix
+        self._extend_cached_data(historical_points, point, var_noise_eval)
+        self.cache_cov_n = {}
+        self._log_change_data(('add', point, evaluation, var_noise_eval))
+
+    def replace_evaluations(self, indexes, evaluations, var_noise_eval=None):
+        """
+        Replaces the evaluations of the points of the data with the given indexes, e.g. the
+        values believed for points whose evaluation was still running. The cached Cholesky
+        decompositions are kept, unless the variances of the noise change.
+
+        :param indexes: np.array(k)
+        :param evaluations: np.array(k)
+        :param var_noise_eval: np.array(k)
+        """
+
+        # The arrays are copied because they may be read-only memory-mapped arrays in the workers
+        # of the persistent pool.
+        self.data['evaluations'] = np.array(self.data['evaluations'])
+        self.data['evaluations'][indexes] = evaluations
+
+        if var_noise_eval is not None:
+            self.data['var_noise'] = np.array(self.data['var_noise'])
+            self.data['var_noise'][indexes] = var_noise_eval
+            self.cache_chol_cov.clear()
+
+        self.cache_sol_chol_y_unbiased.clear()
+        self.best_solution = {}
+        self.n_edits_data += 1
+        self._log_change_data(('replace', np.array(indexes), np.array(evaluations),
+                               var_noise_eval))
+
+    def remove_points_evaluations(self, n_points):
+        """
+        Removes the last n_points points of the data, e.g. points added with believed evaluations
+        to choose a batch of points. The cached Cholesky decompositions are truncated instead of
+        recomputed, because the Cholesky decomposition of the leading block of a matrix is the
+        leading block of its decomposition.
+
+        :param n_points: int
+        """
+
+        if n_points == 0:
+            return
+
+        n_total = self.data['points'].shape[0]
+        n = n_total - n_points
+
+        self.data['points'] = self.data['points'][0: n, :]
+        self.data['evaluations'] = self.data['evaluations'][0: n]
+
+        if self.data['var_noise'] is not None:
+            self.data['var_noise'] = self.data['var_noise'][0: n]
+
+        cache_chol_cov = {}
+        for index, (chol, cov) in self.cache_chol_cov.iteritems():
+            if chol.shape[0] == n_total:
+                cache_chol_cov[index] = (chol[0: n, 0: n].copy(), cov[0: n, 0: n].copy())
+
+        self._set_cached_factors(cache_chol_cov)
+        self.cache_cov_n = {}
+        self.best_solution = {}
+        self.n_edits_data += 1
+        self._log_change_data(('remove', n_points))
+
+    def _log_change_data(self, change):
+        """
+        Keeps a change of the data to update the copies of the model in the workers of the
+        persistent pool (see parallel_state_delta).
+
+        :param change: ('add', points, evaluations, var_noise), ('replace', indexes, evaluations,
+            var_noise) or ('remove', n_points)
+        """
+        self.changes_data.append(change)
+        self.n_changes_data += 1
+
+        if len(self.changes_data) > MAX_CHANGES_DATA_LOGGED:
+            self.changes_data = self.changes_data[-MAX_CHANGES_DATA_LOGGED:]
+
+    def _extend_cached_data(self, historical_points, point, var_noise_eval=None):
+        """
+        Extends the cached Cholesky decompositions with the rows of the new points, and
+        recomputes the cached solutions cov^-1 (y-mean) using the extended decompositions.
+        This costs O(n^2) per cached entry instead of refactorizing the whole covariance matrix.
+
+        :param historical_points: np.array(nxm), points before adding the new points
+        :param point: np.array(kxm), new points
+        :param var_noise_eval: np.array(k)
+        """
+
+        k = point.shape[0]
+        cache_chol_cov = {}
+
+        for index, (chol, cov) in self.cache_chol_cov.iteritems():
+            if chol.shape[0] != historical_points.shape[0]:
+                continue
+
+            var_noise, parameters_kernel = index[0], np.array(index[1])
+
+            cross_cov = self.evaluate_cross_cov(historical_points, point, parameters_kernel)
+            cov_new = self.evaluate_cov(point, parameters_kernel)
+
+            if var_noise_eval is not None:
+                cov_new += np.diag(var_noise_eval)
+            cov_new += np.diag(var_noise * np.ones(k))
+
+            try:
+                extended_chol = cholesky_extend(chol, cross_cov, cov_new, max_tries=7)
+            except (LinAlgError, ValueError):
+                # ValueError is raised if the cached decomposition isn't finite
+                continue
+
+            extended_cov = np.concatenate(
+                (np.concatenate((cov, cross_cov), axis=1),
+                 np.concatenate((cross_cov.transpose(), cov_new), axis=1)), axis=0)
+
+            cache_chol_cov[index] = (extended_chol, extended_cov)
+
+        self._set_cached_factors(cache_chol_cov)
+
+    def _set_cached_factors(self, cache_chol_cov):
+        """
+        Replaces the cached Cholesky decompositions, and recomputes the cached solutions
+        cov^-1 (y-mean) whose decomposition is still cached.
+
+        :param cache_chol_cov: {(var_noise, parameters_kernel): (chol, cov)}
+        """
+
+        cache_sol_chol_y_unbiased = {}
+        for index in self.cache_sol_chol_y_unbiased:
+            index_chol = (index[0], index[1])
+            if index_chol not in cache_chol_cov:
+                continue
+            y_unbiased = self.data['evaluations'] - index[2]
+            cache_sol_chol_y_unbiased[index] = cho_solve(cache_chol_cov[index_chol][0], y_unbiased)
+
+        self.cache_chol_cov.clear()
+        for index, value in cache_chol_cov.iteritems():
+            self.cache_chol_cov[index] = value
+
+        self.cache_sol_chol_y_unbiased.clear()
+        for index, value in cache_sol_chol_y_unbiased.iteritems():
+            self.cache_sol_chol_y_unbiased[index] = value
+
+    def parallel_state_token(self):
+        """
+        Token that changes when the data or the parameters of the model change. It's used to
+        update the copies of the model in the workers of the persistent pool (see
+        Parallel.share_state).
+
+        :return: tuple
+        """
+
+        last_sample = None
+        if len(self.samples_parameters) > 0:
+            last_sample = tuple(self.samples_parameters[-1])
+
+        return (self.n_changes_data, len(self.samples_parameters), last_sample,
+                tuple(self.kernel.hypers_values_as_array), self.var_noise.value[0],
+                self.mean.value[0])
+
+    def parallel_state_delta(self, token):
+        """
+        Computes the changes of the data since the model had the given token, and the current
+        parameters and samples of the parameters.
+
+        :param token: tuple, see parallel_state_token
+        :return: {
+            'changes_data': [tuple], see _log_change_data,
+            'parameters': np.array(l),
+            'samples_parameters': [np.array(l)], or None if they didn't change,
+            'start_point_sampler': np.array(l),
+            'chain_n_points': int,
+        }, or None if the changes of the data aren't kept anymore.
+        """
+
+        n_changes = token[0]
+        first_change = self.n_changes_data - len(self.changes_data)
+
+        if n_changes < first_change or n_changes > self.n_changes_data:
+            return None
+
+        samples_parameters = None
+        if token[1:3] != self.parallel_state_token()[1:3]:
+            samples_parameters = list(self.samples_parameters)
+
+        return {
+            'changes_data': self.changes_data[n_changes - first_change:],
+            'parameters': self.get_value_parameters_model,
+            'samples_parameters': samples_parameters,
+            'start_point_sampler': self.start_point_sampler,
+            'chain_n_points': self.chain_n_points,
+        }
+
+    def apply_parallel_state_delta(self, delta):
+        """
+        Applies the changes of the data of the delta, and sets its parameters and samples of the
+        parameters (see parallel_state_delta).
 
-        self.cache_chol_cov = {}
-        self.cache_sol_chol_y_unbiased = {}
+        :param delta: output of parallel_state_delta
+        """
+
+        for change in delta['changes_data']:
+            if change[0] == 'add':
+                self.add_points_evaluations(change[1], change[2], var_noise_eval=change[3])
+            elif change[0] == 'replace':
+                self.replace_evaluations(change[1], change[2], var_noise_eval=change[3])
+            else:
+                self.remove_points_evaluations(change[1])
+
+        self.update_value_parameters(delta['parameters'])
+
+        if delta['samples_parameters'] is not None:
+            self.samples_parameters = list(delta['samples_parameters'])
+
+        self.start_point_sampler = delta['start_point_sampler']
+        self.chain_n_points = delta['chain_n_points']
+        self.best_solution = {}
 
     @staticmethod
     def convert_from_list_to_numpy(data_as_list):
@@ -496,22 +934,12 @@ class GPFittingGaussian(object):
         n_points = len(data_as_list['points'])
         dim_point = len(data_as_list['points'][0])
 
-        points = np.zeros((n_points, dim_point))
-        evaluations = np.zeros(n_points)
+        points = np.array(data_as_list['points'], dtype=float).reshape((n_points, dim_point))
+        evaluations = np.array(data_as_list['evaluations'], dtype=float)
         var_noise = None
 
-        if len(data_as_list['var_noise']) > 0:
-            var_noise = np.zeros(n_points)
-            iterate = zip(data_as_list['points'], data_as_list['evaluations'],
-                          data_as_list['var_noise'])
-        else:
-            iterate = zip(data_as_list['points'], data_as_list['evaluations'])
-
-        for index, point in enumerate(iterate):
-            points[index, :] = point[0]
-            evaluations[index] = point[1]
-            if len(data_as_list['var_noise']) > 0:
-                var_noise[index] = point[2]
+        if data_as_list['var_noise'] is not None and len(data_as_list['var_noise']) > 0:
+            var_noise = np.array(data_as_list['var_noise'], dtype=float)
 
         data['points'] = points
         data['evaluations'] = evaluations
@@ -573,6 +1001,7 @@ class GPFittingGaussian(object):
             'thinning': self.thinning,
             'n_burning': self.n_burning,
             'max_steps_out': self.max_steps_out,
+            'n_chains': self.n_chains,
             'data': self.convert_from_numpy_to_list(self.data),
             'bounds_domain': bounds,
             'type_bounds': self.type_bounds,
@@ -600,6 +1029,115 @@ class GPFittingGaussian(object):
             model.data = model.convert_from_list_to_numpy(model.training_data)
         return model
 
+    def serialize_arrays(self, cached_factors=False):
+        """
+        Serializes the model as in serialize, but the data, the samples of the parameters and,
+        optionally, the cached Cholesky decompositions are kept as numpy arrays (see NPYFile).
+
+        :param cached_factors: (boolean) If True, the cached decompositions of the covariance
+            matrix and the cached solutions cov^-1 (y-mean) are included, so the model doesn't
+            have to factorize the matrix again after it's read.
+        :return: (dict, {str: np.array})
+        """
+        content = self.serialize()
+        del content['data']
+        del content['samples_parameters']
+
+        arrays = {
+            'points': self.data['points'],
+            'evaluations': self.data['evaluations'],
+        }
+
+        if self.data['var_noise'] is not None:
+            arrays['var_noise'] = self.data['var_noise']
+
+        if len(self.samples_parameters) > 0:
+            arrays['samples_parameters'] = np.array(self.samples_parameters)
+
+        content['cache_chol_cov'] = []
+        content['cache_sol_chol_y_unbiased'] = []
+
+        if cached_factors:
+            for i, (index, (chol, cov)) in enumerate(self.cache_chol_cov.iteritems()):
+                content['cache_chol_cov'].append([index[0], list(index[1])])
+                arrays['chol_%d' % i] = chol
+                arrays['cov_%d' % i] = cov
+
+            for i, (index, solve) in enumerate(self.cache_sol_chol_y_unbiased.iteritems()):
+                content['cache_sol_chol_y_unbiased'].append([index[0], list(index[1]), index[2]])
+                arrays['sol_chol_y_unbiased_%d' % i] = solve
+
+        return content, arrays
+
+    @classmethod
+    def deserialize_arrays(cls, content, arrays, use_only_training_points=True):
+        """
+        Builds the model from the output of serialize_arrays. The arrays are used as they are
+        (e.g. memory-mapped), without converting them to lists.
+
+        :param content: dict
+        :param arrays: {str: np.array}
+        :param use_only_training_points (boolean) If true, it uses only the training points in
+            data. Otherwise, it also includes new points previously computed.
+        :return: gp-model instance
+        """
+        content = dict(content)
+        cache_chol_cov = content.pop('cache_chol_cov', [])
+        cache_sol_chol_y_unbiased = content.pop('cache_sol_chol_y_unbiased', [])
+
+        samples_parameters = arrays.get('samples_parameters')
+        if samples_parameters is not None:
+            content['samples_parameters'] = list(samples_parameters)
+
+        model = cls(**content)
+
+        if use_only_training_points:
+            return model
+
+        content['cache_chol_cov'] = cache_chol_cov
+        content['cache_sol_chol_y_unbiased'] = cache_sol_chol_y_unbiased
+        model.load_arrays(content, arrays)
+
+        return model
+
+    def load_arrays(self, content, arrays):
+        """
+        Replaces the data, the parameters, the samples of the parameters and the cached
+        decompositions of the model by the ones in the output of serialize_arrays. The model is
+        modified in place, so the objects that refer to it (e.g. the acquisition functions) use
+        the new state.
+
+        :param content: dict
+        :param arrays: {str: np.array}
+        """
+        self.data = {
+            'points': arrays['points'],
+            'evaluations': arrays['evaluations'],
+            'var_noise': arrays.get('var_noise'),
+        }
+
+        self.samples_parameters = []
+        if 'samples_parameters' in arrays:
+            self.samples_parameters = list(arrays['samples_parameters'])
+
+        self.start_point_sampler = content['start_point_sampler']
+        self.update_value_parameters(np.concatenate(
+            [content['var_noise_value'], content['mean_value'], content['kernel_values']]))
+
+        self.clean_cache()
+
+        for i, index in enumerate(content.get('cache_chol_cov', [])):
+            self.cache_chol_cov[(index[0], tuple(index[1]))] = \
+                (arrays['chol_%d' % i], arrays['cov_%d' % i])
+
+        for i, index in enumerate(content.get('cache_sol_chol_y_unbiased', [])):
+            self.cache_sol_chol_y_unbiased[(index[0], tuple(index[1]), index[2])] = \
+                arrays['sol_chol_y_unbiased_%d' % i]
+
+        self.n_edits_data += 1
+        self.changes_data = []
+        self.n_changes_data += 1
+
     @property
     def get_parameters_model(self):
         """
@@ -637,15 +1175,15 @@ class GPFittingGaussian(object):
             return False
 
         if name == CHOL_COV:
-            if index in self.cache_chol_cov:
-                return self.cache_chol_cov[index]
+            return self.cache_chol_cov.get(index, False)
         if name == SOL_CHOL_Y_UNBIASED:
-            if index in self.cache_sol_chol_y_unbiased:
-                return self.cache_sol_chol_y_unbiased[index]
+            return self.cache_sol_chol_y_unbiased.get(index, False)
         return False
 
-    def _updated_cached_data(self, index, value, name, clear_cache=True):
+    def _updated_cached_data(self, index, value, name):
         """
+        Caches value. The least recently used entries are evicted when the memory budget of the
+        cache is exceeded.
 
         :param index: tuple associated to the type.
             -(var_noise, parameters_kernel) if CHOL_COV
@@ -655,15 +1193,22 @@ class GPFittingGaussian(object):
 
         """
         if name == CHOL_COV:
-            if clear_cache:
-                self.cache_chol_cov = {}
-                self.cache_sol_chol_y_unbiased = {}
             self.cache_chol_cov[index] = value
         if name == SOL_CHOL_Y_UNBIASED:
-            if clear_cache:
-                self.cache_sol_chol_y_unbiased = {}
             self.cache_sol_chol_y_unbiased[index] = value
 
+    def cache_statistics(self):
+        """
+        Returns the counters of the caches of the model.
+
+        :return: {CHOL_COV: {'hits': int, 'misses': int, 'evictions': int, 'entries': int,
+            'n_bytes': int, 'max_bytes': int}, SOL_CHOL_Y_UNBIASED: {...}}
+        """
+        return {
+            CHOL_COV: self.cache_chol_cov.statistics(),
+            SOL_CHOL_Y_UNBIASED: self.cache_sol_chol_y_unbiased.statistics(),
+        }
+
     def evaluate_cov(self, points, parameters_kernel):
         """
         Evaluate the covariance of the kernel of the model on the points.
@@ -680,24 +1225,45 @@ class GPFittingGaussian(object):
             for index, input in enumerate(inputs):
                 inputs_dict[self.type_kernel[index + 1]] = input
 
-            cov = self.class_kernel.evaluate_cov_defined_by_params(
+            cov = self.class_kernel.cov_from_params(
                 separate_numpy_arrays_in_lists(parameters_kernel, self.number_parameters[1]),
                 inputs_dict,
                 self.dimensions[1:], self.type_kernel[1:], **self.additional_kernel_parameters)
         elif self.type_kernel[0] == SCALED_KERNEL:
-            cov = self.class_kernel.evaluate_cov_defined_by_params(
+            cov = self.class_kernel.cov_from_params(
                 parameters_kernel, points, self.dimensions[0],
                 *([self.type_kernel[1]],)
             )
         else:
-            cov = self.class_kernel.evaluate_cov_defined_by_params(
+            cov = self.class_kernel.cov_from_params(
                 parameters_kernel, points, self.dimensions[0], **self.additional_kernel_parameters
             )
 
         return cov
 
+    def evaluate_cov_diagonal(self, points, parameters_kernel):
+        """
+        Evaluate the variance of the kernel of the model on each point. Only the covariance
+        matrices of blocks of N_POINTS_COV_DIAGONAL_BATCH points are computed.
+
+        :param points: np.array(nxk)
+        :param parameters_kernel: np.array(l)
+
+        :return: np.array(n)
+        """
+
+        n_points = points.shape[0]
+        diagonal = np.zeros(n_points)
+
+        for start in xrange(0, n_points, N_POINTS_COV_DIAGONAL_BATCH):
+            end = min(start + N_POINTS_COV_DIAGONAL_BATCH, n_points)
+            diagonal[start:end] = np.diag(self.evaluate_cov(points[start:end, :],
+                                                            parameters_kernel))
+
+        return diagonal
+
     def _chol_cov_including_noise(self, var_noise, parameters_kernel, historical_points=None,
-                                  cache=True, clear_cache=True):
+                                  cache=True):
         """
         Compute the Cholesky decomposition of
         covariance = cov_kernel + np.diag(var_noise_observations) + np.diag(var_noise), and the
@@ -728,12 +1294,11 @@ class GPFittingGaussian(object):
         chol = cholesky(cov,  max_tries=7)
 
         if cache:
-            self._updated_cached_data((var_noise, tuple(parameters_kernel)), (chol, cov), CHOL_COV,
-                                      clear_cache=clear_cache)
+            self._updated_cached_data((var_noise, tuple(parameters_kernel)), (chol, cov), CHOL_COV)
 
         return chol, cov
 
-    def log_likelihood(self, var_noise, mean, parameters_kernel):
+    def log_likelihood(self, var_noise, mean, parameters_kernel, n_points=None):
         """
         GP log likelihood: y(x) ~ f(x) + epsilon, where epsilon(x) are iid N(0,var_noise), and
         f(x) ~ GP(mean, cov)
@@ -742,11 +1307,20 @@ class GPFittingGaussian(object):
         :param mean: (float)
         :param parameters_kernel: np.array(k), The order of the parameters is given in the
             definition of the class kernel.
+        :param n_points: (int) If it's not None, the likelihood of only the first n_points of the
+            data is computed. The Cholesky decomposition of their covariance matrix is the leading
+            block of the decomposition of the whole matrix.
         :return: float
 
         """
         chol, cov = self._chol_cov_including_noise(var_noise, parameters_kernel)
 
+        if n_points is not None and n_points < chol.shape[0]:
+            chol = chol[0: n_points, 0: n_points]
+            y_unbiased = self.data['evaluations'][0: n_points] - mean
+            solve = cho_solve(chol, y_unbiased)
+            return -np.sum(np.log(np.diag(chol))) - 0.5 * np.dot(y_unbiased, solve)
+
         y_unbiased = self.data['evaluations'] - mean
 
         cached_solve = self._get_cached_data((var_noise, tuple(parameters_kernel), mean),
@@ -819,22 +1393,20 @@ class GPFittingGaussian(object):
         else:
             solve = cached_solve
 
+        # The O(n^3) work is done only once: every derivative is then an elementwise trace.
+        product = GradientGPFittingGaussian.compute_product_gradient_llh(chol, solve)
+
         gradient_kernel_params = np.zeros(len(parameters_kernel))
         for i in xrange(len(parameters_kernel)):
             gradient_kernel_params[i] = GradientGPFittingGaussian.\
-                compute_gradient_llh_given_grad_cov(grad_cov[i], chol, solve)
-
-        n_training_points = self.data['points'].shape[0]
+                compute_gradient_llh_given_product(grad_cov[i], product)
 
         gradient = {}
         gradient['kernel_params'] = gradient_kernel_params
-        gradient['mean'] = GradientGPFittingGaussian.compute_gradient_mean(
-            chol, y_unbiased, n_training_points)
+        gradient['mean'] = np.sum(solve)
 
-        grad_var_noise = GradientGPFittingGaussian.compute_gradient_kernel_respect_to_noise(
-            n_training_points)
-        gradient['var_noise'] = GradientGPFittingGaussian.compute_gradient_llh_given_grad_cov(
-            grad_var_noise, chol, solve)
+        # The gradient of the covariance respect to the variance of the noise is the identity.
+        gradient['var_noise'] = 0.5 * np.trace(product)
 
         return gradient
 
@@ -1017,7 +1589,7 @@ class GPFittingGaussian(object):
     def train(cls, type_kernel, dimensions, mle, training_data, bounds_domain, thinning=0,
               n_burning=0, max_steps_out=1, random_seed=None, type_bounds=None, training_name=None,
               problem_name=None, kernel_values=None, mean_value=None, var_noise_value=None,
-              same_correlation=False):
+              same_correlation=False, n_chains=1):
         """
         :param type_kernel: [(str)] Must be in possible_kernels. If it's a product of kernels it
             should be a list as: [PRODUCT_KERNELS_SEPARABLE, NAME_1_KERNEL, NAME_2_KERNEL]
@@ -1042,6 +1614,7 @@ class GPFittingGaussian(object):
         :param var_noise_value: [float], It contains the variance of the noise of the model
         :param same_correlation: (boolean) If true, it uses the same correlations for the task
             kernel.
+        :param n_chains: (int) Number of chains of the MCMC.
 
         :return: GPFittingGaussian
         """
@@ -1054,7 +1627,8 @@ class GPFittingGaussian(object):
                      thinning=thinning, n_burning=n_burning, max_steps_out=max_steps_out,
                      type_bounds=type_bounds, random_seed=random_seed, training_name=training_name,
                      problem_name=problem_name, kernel_values=kernel_values, mean_value=mean_value,
-                     var_noise_value=var_noise_value, **{SAME_CORRELATION: same_correlation})
+                     var_noise_value=var_noise_value, n_chains=n_chains,
+                     **{SAME_CORRELATION: same_correlation})
 
             return gp.fit_gp_regression()
 
@@ -1062,7 +1636,8 @@ class GPFittingGaussian(object):
                    thinning=thinning, n_burning=n_burning, max_steps_out=max_steps_out,
                    type_bounds=type_bounds, random_seed=random_seed, training_name=training_name,
                    problem_name=problem_name, kernel_values=kernel_values, mean_value=mean_value,
-                   var_noise_value=var_noise_value, **{SAME_CORRELATION: same_correlation})
+                   var_noise_value=var_noise_value, n_chains=n_chains,
+                   **{SAME_CORRELATION: same_correlation})
 
     def evaluate_cross_cov(self, points_1, points_2, parameters_kernel):
         """
@@ -1085,17 +1660,17 @@ class GPFittingGaussian(object):
             for index, input in enumerate(inputs_2):
                 inputs_dict_2[self.type_kernel[index + 1]] = input
 
-            cov = self.class_kernel.evaluate_cross_cov_defined_by_params(
+            cov = self.class_kernel.cross_cov_from_params(
                 separate_numpy_arrays_in_lists(parameters_kernel, self.number_parameters[1]),
                 inputs_dict_1, inputs_dict_2,
                 self.dimensions[1:], self.type_kernel[1:], **self.additional_kernel_parameters)
         elif self.type_kernel[0] == SCALED_KERNEL:
-            cov = self.class_kernel.evaluate_cross_cov_defined_by_params(
+            cov = self.class_kernel.cross_cov_from_params(
                 parameters_kernel, points_1, points_2, self.dimensions[0],
                 *([self.type_kernel[1]],)
             )
         else:
-            cov = self.class_kernel.evaluate_cross_cov_defined_by_params(
+            cov = self.class_kernel.cross_cov_from_params(
                 parameters_kernel, points_1, points_2, self.dimensions[0],
                 **self.additional_kernel_parameters
             )
@@ -1161,7 +1736,7 @@ class GPFittingGaussian(object):
 
     def _cholesky_solve_vectors_for_posterior(self, var_noise, mean, parameters_kernel,
                                               historical_points=None, historical_evaluations=None,
-                                              cache=True, clear_cache=True):
+                                              cache=True):
         """
         Solves the system cov(historical_points) * x = historical_evaluations - mean, and returns
         the Cholesky decomposition of cov(historical_points) too.
@@ -1186,8 +1761,7 @@ class GPFittingGaussian(object):
             historical_evaluations = self.data['evaluations']
 
         chol, cov = self._chol_cov_including_noise(
-            var_noise, parameters_kernel, historical_points=historical_points, cache=cache,
-            clear_cache=clear_cache)
+            var_noise, parameters_kernel, historical_points=historical_points, cache=cache)
 
 
         if cache:
@@ -1201,7 +1775,7 @@ class GPFittingGaussian(object):
             solve = cho_solve(chol, y_unbiased)
             if cache:
                 self._updated_cached_data((var_noise, tuple(parameters_kernel), mean), solve,
-                                          SOL_CHOL_Y_UNBIASED, clear_cache=clear_cache)
+                                          SOL_CHOL_Y_UNBIASED)
         else:
             solve = cached_solve
 
@@ -1210,8 +1784,83 @@ class GPFittingGaussian(object):
             'solve': solve,
         }
 
+    def _cholesky_solve_vectors_for_posterior_batch(self, var_noise, mean, parameters_kernel,
+                                                    cache=True):
+        """
+        Computes _cholesky_solve_vectors_for_posterior for several samples of the hyperparameters
+        at once. The Cholesky decompositions that aren't cached are computed with one stacked
+        factorization, and the systems are solved over the sample axis.
+
+        :param var_noise: np.array(s)
+        :param mean: np.array(s)
+        :param parameters_kernel: np.array(sxk)
+        :param cache: (boolean) get cached data only if cache is True
+
+        :return: {
+            'chol': np.array(sxnxn),
+            'solve': np.array(sxn)
+        }
+        """
+
+        historical_points = self.data['points']
+        n_samples = len(var_noise)
+        n = historical_points.shape[0]
+
+        chol = np.zeros((n_samples, n, n))
+        solve = np.zeros((n_samples, n))
+        missing_chol = []
+        missing_solve = []
+
+        for s in xrange(n_samples):
+            index = (var_noise[s], tuple(parameters_kernel[s, :]))
+
+            cached = self._get_cached_data(index, CHOL_COV, cache=cache)
+            if cached is False:
+                missing_chol.append(s)
+            else:
+                chol[s, :, :] = cached[0]
+
+            cached_solve = self._get_cached_data(index + (mean[s], ), SOL_CHOL_Y_UNBIASED,
+                                                 cache=cache)
+            if cached_solve is False:
+                missing_solve.append(s)
+            else:
+                solve[s, :] = cached_solve
+
+        if len(missing_chol) > 0:
+            covs = np.zeros((len(missing_chol), n, n))
+            for i, s in enumerate(missing_chol):
+                covs[i, :, :] = self.evaluate_cov(historical_points, parameters_kernel[s, :])
+
+            if self.data.get('var_noise') is not None:
+                covs += np.diag(self.data['var_noise'])[None, :, :]
+
+            covs[:, np.arange(n), np.arange(n)] += var_noise[missing_chol][:, None]
+
+            chol[missing_chol, :, :] = cholesky_batch(covs, max_tries=7)
+
+            if cache:
+                for i, s in enumerate(missing_chol):
+                    self._updated_cached_data((var_noise[s], tuple(parameters_kernel[s, :])),
+                                              (chol[s, :, :].copy(), covs[i, :, :]), CHOL_COV)
+
+        if len(missing_solve) > 0:
+            y_unbiased = self.data['evaluations'][None, :] - mean[missing_solve][:, None]
+            solve[missing_solve, :] = cho_solve_batch(chol[missing_solve, :, :], y_unbiased)
+
+            if cache:
+                for s in missing_solve:
+                    self._updated_cached_data(
+                        (var_noise[s], tuple(parameters_kernel[s, :]), mean[s]),
+                        solve[s, :].copy(), SOL_CHOL_Y_UNBIASED)
+
+        return {
+            'chol': chol,
+            'solve': solve,
+        }
+
     def compute_posterior_parameters(self, points, var_noise=None, mean=None,
-                                     parameters_kernel=None, only_mean=False):
+                                     parameters_kernel=None, only_mean=False, diag_only=False):
         """
         Compute the posterior mean and cov of the GP at points:
             f(points) ~ GP(mu_n(points), cov_n(points, points))
@@ -1221,9 +1870,12 @@ class GPFittingGaussian(object):
         :param mean: float
         :param parameters_kernel: np.array(k)
         :param only_mean: boolean
+        :param diag_only: (boolean) computes only the posterior variances of the points if it's
+            True, which costs O(n * m^2) instead of O(n^2 * m), where m is the number of training
+            points.
         :return: {
             'mean': np.array(n),
-            'cov': np.array(nxn)
+            'cov': np.array(nxn), or np.array(n) if diag_only is True
         }
         """
         # TODO: cache solve, and np.dot(vec_cov, solve_2). We can just save it here with some
@@ -1252,6 +1904,14 @@ class GPFittingGaussian(object):
                 'cov': None,
             }
 
+        if diag_only:
+            var_n = self.evaluate_cov_diagonal(points, parameters_kernel) - \
+                cho_quadratic_diagonal(chol, vec_cov.transpose())
+            return {
+                'mean': mu_n,
+                'cov': var_n,
+            }
+
         if points.shape[0] == 1:
             index = (tuple(points[0, :]), tuple(parameters_kernel))
 
@@ -1270,6 +1930,29 @@ class GPFittingGaussian(object):
             'cov': cov_n,
         }
 
+    def posterior_mean_many(self, points, var_noise=None, mean=None, parameters_kernel=None,
+                            n_samples_parameters=0):
+        """
+        Computes the posterior mean at all the points with one evaluation of the cross covariance.
+        If n_samples_parameters > 0, the posterior mean is averaged over the last
+        n_samples_parameters samples of the parameters of the model.
+
+        :param points: np.array(nxm)
+        :param var_noise: float
+        :param mean: float
+        :param parameters_kernel: np.array(k)
+        :param n_samples_parameters: int
+        :return: np.array(n)
+        """
+
+        if n_samples_parameters > 0:
+            return BayesianEvaluations.evaluate(self.posterior_mean_many, points, self,
+                                                n_samples_parameters, None)[0]
+
+        return self.compute_posterior_parameters(points, var_noise=var_noise, mean=mean,
+                                                 parameters_kernel=parameters_kernel,
+                                                 only_mean=True)['mean']
+
     def gradient_posterior_parameters(self, point, var_noise=None, mean=None,
                                       parameters_kernel=None, parallel=True, only_mean=False):
         """
@@ -1366,8 +2049,7 @@ class GPFittingGaussian(object):
             method_opt = SGD_NAME
 
         if start_new_chain and n_samples_parameters > 0:
-            self.start_new_chain()
-            self.sample_parameters(DEFAULT_N_PARAMETERS)
+            self.update_chain(DEFAULT_N_PARAMETERS)
 
         bounds = self.bounds
 
@@ -1393,19 +2075,11 @@ class GPFittingGaussian(object):
             n_restart_ = start.shape[0]
 
             if n_restart_ > n_best_restarts and n_best_restarts > 0:
-                point_dict = {}
-                for j in xrange(start.shape[0]):
-                    point_dict[j] = start[j, :]
-                args = (False, None, True, 0, self, DEFAULT_N_PARAMETERS)
-                ei_values = Parallel.run_function_different_arguments_parallel(
-                    wrapper_posterior_mean_gp_model, point_dict, *args)
-                values = [ei_values[i] for i in ei_values]
+                values = self.posterior_mean_many(
+                    start, n_samples_parameters=DEFAULT_N_PARAMETERS)
                 values_index = sorted(range(len(values)), key=lambda k: values[k])
                 values_index = values_index[-n_best_restarts:]
-                start = []
-                for j in values_index:
-                    start.append(point_dict[j])
-                start = np.array(start)
+                start = start[values_index, :]
                 n_restart_ = start.shape[0]
         else:
             n_restart_ = 1
@@ -1472,23 +2146,14 @@ class GPFittingGaussian(object):
 
         if candidate_solutions is not None:
             n = len(candidate_values)
-            candidate_solutions_2 = candidate_solutions
-            values = []
-            point_dict = {}
-
-            args = (False, None, parallel, 0, self, DEFAULT_N_PARAMETERS)
-            for j in range(n):
-                point_dict[j] = np.array(candidate_solutions_2[j])
-            values = Parallel.run_function_different_arguments_parallel(
-                wrapper_posterior_mean_gp_model, point_dict, *args)
+            candidate_solutions_2 = np.array(candidate_solutions[0: n], dtype=float)
 
-            values_candidates = []
-            for j in range(n):
-                values_candidates.append(values[j])
+            values_candidates = self.posterior_mean_many(
+                candidate_solutions_2, n_samples_parameters=DEFAULT_N_PARAMETERS)
             ind_max_2 = np.argmax(values_candidates)
 
             if np.max(values_candidates) > max_:
-                solution = point_dict[ind_max_2]
+                solution = candidate_solutions_2[ind_max_2, :]
                 value = np.max(values_candidates)
                 optimal_solutions = {}
                 optimal_solutions[ind_max] = {'solution': solution, 'optimal_value': [value]}
@@ -1582,12 +2247,17 @@ class GPFittingGaussian(object):
 
         return best
 
-    def clean_cache(self):
+    def clean_cache(self, keep_factors=False):
         """
         Cleans the cache
+
+        :param keep_factors: (boolean) If True, the cached Cholesky decompositions and solutions
+            cov^-1 (y-mean) are kept. They're kept up to date by add_points_evaluations and
+            remove_points_evaluations.
         """
-        self.cache_chol_cov = {}
-        self.cache_sol_chol_y_unbiased = {}
+        if not keep_factors:
+            self.cache_chol_cov.clear()
+            self.cache_sol_chol_y_unbiased.clear()
         self.best_solution = {}
         self.cache_cov_n = {}
 
@@ -1629,6 +2299,32 @@ class GradientGPFittingGaussian(object):
 
         return sol
 
+    @staticmethod
+    def compute_product_gradient_llh(chol, solve):
+        """
+        Computes solve * solve^T - cov^-1, which is shared by the derivatives of the llh respect
+        to all the parameters of the kernel.
+
+        :param chol: (np.array(nxn)) cholesky decomposition of cov
+        :param solve: (np.array(n)) cov^-1 (y-mean), where cov = chol * chol^T
+        :return: np.array(nxn)
+        """
+
+        return np.outer(solve, solve) - cho_inverse(chol)
+
+    @staticmethod
+    def compute_gradient_llh_given_product(grad_cov, product):
+        """
+        Computes 0.5 * trace(product * grad_cov) in O(n^2), using that grad_cov is symmetric.
+
+        :param grad_cov: np.array(nxn)
+        :param product: (np.array(nxn)) solve * solve^T - cov^-1 (see
+            compute_product_gradient_llh)
+        :return: float
+        """
+
+        return 0.5 * np.einsum('ij,ij->', product, grad_cov)
+
     @staticmethod
     def compute_gradient_kernel_respect_to_noise(n):
         """
@@ -3,6 +3,7 @@ from __future__ import absolute_import
 import numpy as np
 
 import itertools
+import multiprocessing as mp
 
 from os import path
 import os
@@ -20,6 +21,9 @@ from stratified_bayesian_optimization.lib.constant import (
     QUADRATURES,
     POSTERIOR_MEAN,
     TASKS_KERNEL_NAME,
+    MATERN52_NAME,
+    PRODUCT_KERNELS_SEPARABLE,
+    SAME_CORRELATION,
     LBFGS_NAME,
     DEBUGGING_DIR,
     B_NEW,
@@ -30,9 +34,17 @@ from stratified_bayesian_optimization.lib.constant import (
     WEIGHTS,
     DEFAULT_N_SAMPLES,
     DEFAULT_N_PARAMETERS,
+    SAMPLES,
+    N_POINTS_QUADRATURE_BATCH,
 )
+from stratified_bayesian_optimization.lib.cache import LRUCache
+from stratified_bayesian_optimization.bayesian.bayesian_evaluations import BayesianEvaluations
+from stratified_bayesian_optimization.kernels.matern52 import Matern52
+from stratified_bayesian_optimization.kernels.tasks_kernel import TasksKernel
 from stratified_bayesian_optimization.lib.la_functions import (
     cho_solve,
+    cho_quadratic_diagonal,
+    cho_solve_batch,
 )
 from stratified_bayesian_optimization.services.domain import (
     DomainService,
@@ -55,10 +67,12 @@ from stratified_bayesian_optimization.lib.util import (
     wrapper_compute_vector_b,
     wrapper_objective_posterior_mean_bq,
     wrapper_grad_posterior_mean_bq,
+    wrapper_objective_and_gradient_posterior_mean_bq,
     wrapper_optimize,
     wrapper_hessian_posterior_mean_bq,
     wrapper_sgd,
     wrapper_evaluate_gradient_sample_params_bq,
+    separate_numpy_arrays_in_lists,
 )
 
 logger = SBOLog(__name__)
@@ -103,7 +117,7 @@ class BayesianQuadrature(object):
     }
 
     def __init__(self, gp_model, x_domain, distribution, parameters_distribution=None,
-                 model_only_x=False):
+                 model_only_x=False, cache_max_bytes=None):
         """
 
         :param gp_model: gp_fitting_gaussian instance
@@ -114,6 +128,8 @@ class BayesianQuadrature(object):
             -UNIFORM_FINITE: dict{TASKS: int}
         :param model_only_x (boolean) If True, we keep only the type bounds and bounds of x. So,
             we can use BQ with other methods like EI.
+        :param cache_max_bytes: (int) maximum number of bytes of each cache of the quadrature. If
+            it's None, DEFAULT_CACHE_MAX_BYTES is used.
         """
         self.gp = gp_model
         self.name_model = BAYESIAN_QUADRATURE
@@ -160,13 +176,26 @@ class BayesianQuadrature(object):
         elif self.parameters_distribution is not None:
             self.arguments_expectation['parameters_dist'] = self.parameters_distribution
 
-        self.cache_quadratures = {}
-        self.cache_posterior_mean = {}
-        self.cache_quadrature_with_candidate = {}
+        # If the kernel is the product of a Matern52 kernel on x and a tasks kernel on w, the
+        # quadratures factorize as E_w[k((x, w), (x', w'))] = k_x(x, x') * E_w[k_t(w, w')].
+        self.factorized_quadrature = False
+        if self.expectation['parameter'] == TASKS and \
+                self.gp.type_kernel == [PRODUCT_KERNELS_SEPARABLE, MATERN52_NAME,
+                                        TASKS_KERNEL_NAME] and \
+                list(self.x_domain) == range(self.gp.dimension_domain - 1):
+            self.factorized_quadrature = True
+
+        # Derivatives of the Matern52 kernel at the last point where they were computed (see
+        # _matern52_derivatives_respect_point).
+        self.matern52_derivatives_point = None
+
+        self.cache_quadratures = LRUCache(cache_max_bytes)
+        self.cache_posterior_mean = LRUCache(cache_max_bytes)
+        self.cache_quadrature_with_candidate = LRUCache(cache_max_bytes)
         self.optimal_solutions = {} # The optimal solutions are written here
 
         # Cached data for the MC estimation of the SBO.
-        self.cache_sample = {}
+        self.cache_sample = LRUCache(cache_max_bytes)
         self.max_mean = {}
 
 
@@ -225,39 +254,98 @@ class BayesianQuadrature(object):
         """
 
         if name == QUADRATURES:
-            if index in self.cache_quadratures:
-                return self.cache_quadratures[index]
+            return self.cache_quadratures.get(index)
         if name == POSTERIOR_MEAN:
-            if index in self.cache_posterior_mean:
-                return self.cache_posterior_mean[index]
+            return self.cache_posterior_mean.get(index)
         if name == B_NEW:
-            if index in self.cache_quadrature_with_candidate:
-                return self.cache_quadrature_with_candidate[index]
+            return self.cache_quadrature_with_candidate.get(index)
         return None
 
-    def _updated_cached_data(self, index, value, name, thread=False, clear_cache=True):
+    def _updated_cached_data(self, index, value, name):
         """
+        Caches value. The least recently used entries are evicted when the memory budget of the
+        cache is exceeded.
 
         :param index: tuple. (parameters_kernel, )
         :param value: value to be cached
         :param name: (str) QUADRATURES or POSTERIOR_MEAN or B_NEW
-        :param thread: (boolean) True if memory is shared between threads.
 
         """
 
         if name == QUADRATURES:
-            if not thread and clear_cache:
-                 self.cache_quadratures = {}
             self.cache_quadratures[index] = value
         if name == POSTERIOR_MEAN:
-            if not thread and clear_cache:
-                 self.cache_posterior_mean = {}
             self.cache_posterior_mean[index] = value
         if name == B_NEW:
-            if not thread and clear_cache:
-                 self.cache_quadrature_with_candidate = {}
             self.cache_quadrature_with_candidate[index] = value
 
+    def cache_statistics(self):
+        """
+        Returns the counters of the caches of the quadrature and of its GP model.
+
+        :return: {name: {'hits': int, 'misses': int, 'evictions': int, 'entries': int,
+            'n_bytes': int, 'max_bytes': int}}
+        """
+        statistics = self.gp.cache_statistics()
+        statistics[QUADRATURES] = self.cache_quadratures.statistics()
+        statistics[POSTERIOR_MEAN] = self.cache_posterior_mean.statistics()
+        statistics[B_NEW] = self.cache_quadrature_with_candidate.statistics()
+        statistics[SAMPLES] = self.cache_sample.statistics()
+        return statistics
+
+    def _factorized_kernel_parameters(self, parameters_kernel):
+        """
+        Splits the parameters of the product kernel, and computes the quadrature of the tasks
+        kernel, i.e. E_w[k_t(w, j)] for each task j. Only used if factorized_quadrature is True.
+
+        :param parameters_kernel: np.array(l)
+        :return: (np.array(d), np.array(n_tasks)) parameters of the Matern52 kernel, and the
+            quadrature of the tasks kernel.
+        """
+        parameters = separate_numpy_arrays_in_lists(
+            parameters_kernel, self.gp.number_parameters[1])
+
+        same_correlation = self.gp.additional_kernel_parameters.get(SAME_CORRELATION, False)
+        cov_tasks = TasksKernel.base_cov_matrix_from_params(
+            parameters[1], self.gp.dimensions[2], same_correlation)[1]
+
+        tasks = self.arguments_expectation['domain_random'][:, 0].astype(int)
+
+        return parameters[0], np.mean(cov_tasks[tasks, :], axis=0)
+
+    def _matern52_derivatives_respect_point(self, point, points_2, parameters_x, hessian=False):
+        """
+        Computes the Matern52 kernel of the factorized quadratures between point and points_2,
+        and its gradient (and Hessian if hessian is True) respect to point. The result is kept
+        until the next call with different arguments, so that the covariance, gradient and Hessian
+        at the same iterate are computed only once.
+
+        :param point: np.array(1xk)
+        :param points_2: np.array(mxk)
+        :param parameters_x: np.array(k)
+        :param hessian: boolean
+        :return: {'cov': np.array(m), 'gradient': np.array(mxk), 'hessian': np.array(mxkxk)}
+        """
+        memo = self.matern52_derivatives_point
+
+        if memo is not None and (not hessian or 'hessian' in memo['derivatives']) and \
+                np.array_equal(memo['point'], point) and \
+                np.array_equal(memo['parameters'], parameters_x) and \
+                np.array_equal(memo['points_2'], points_2):
+            return memo['derivatives']
+
+        derivatives = Matern52.derivatives_respect_point_from_params(
+            parameters_x, point, points_2, self.gp.dimensions[1], hessian=hessian)
+
+        self.matern52_derivatives_point = {
+            'point': np.array(point),
+            'parameters': np.array(parameters_x),
+            'points_2': np.array(points_2),
+            'derivatives': derivatives,
+        }
+
+        return derivatives
+
     def evaluate_quadrate_cov(self, point, parameters_kernel):
         """
         Evaluate the quadrature cov, i.e.
@@ -268,6 +356,13 @@ class BayesianQuadrature(object):
         :return: np.array(m)
         """
 
+        if self.factorized_quadrature:
+            parameters_x, quadrature_tasks = self._factorized_kernel_parameters(parameters_kernel)
+            tasks = self.arguments_expectation['domain_random'][:, 0].astype(int)
+            cov_x = Matern52.cross_cov_from_params(
+                parameters_x, point, point, self.gp.dimensions[1])[0, 0]
+            return cov_x * np.mean(quadrature_tasks[tasks])
+
         n = self.dimension_domain
         f = lambda x: self.gp.evaluate_cross_cov(x[:, 0:n], x[:, n:], parameters_kernel)
 
@@ -283,6 +378,28 @@ class BayesianQuadrature(object):
 
         return self.expectation['expectation'](**parameters)
 
+    def evaluate_quadrate_cov_diagonal(self, points, parameters_kernel):
+        """
+        Evaluate the quadrature cov of each point, i.e.
+            Expectation(cov((point, W))) respect to W for each point in points.
+
+        :param points: np.array(txk)
+        :param parameters_kernel: np.array(l)
+        :return: np.array(t)
+        """
+
+        if self.factorized_quadrature:
+            parameters_x, quadrature_tasks = self._factorized_kernel_parameters(parameters_kernel)
+            tasks = self.arguments_expectation['domain_random'][:, 0].astype(int)
+            # The Matern52 kernel is stationary, so k_x(x, x) is the same for every point.
+            cov_x = Matern52.cross_cov_from_params(
+                parameters_x, points[0:1, :], points[0:1, :], self.gp.dimensions[1])[0, 0]
+            return np.repeat(cov_x * np.mean(quadrature_tasks[tasks]), points.shape[0])
+
+        return np.array(
+            [np.ravel(self.evaluate_quadrate_cov(points[i:i + 1, :], parameters_kernel))[0]
+             for i in xrange(points.shape[0])])
+
     def evaluate_quadrature_cross_cov(self, point, points_2, parameters_kernel):
         """
         Evaluate the quadrature cross cov respect to point, i.e.
@@ -296,6 +413,17 @@ class BayesianQuadrature(object):
         :return: np.array(txm)
         """
 
+        if self.factorized_quadrature:
+            parameters_x, quadrature_tasks = self._factorized_kernel_parameters(parameters_kernel)
+            quadrature_tasks = quadrature_tasks[points_2[:, self.w_domain[0]].astype(int)]
+            if point.shape[0] == 1:
+                cov_x = self._matern52_derivatives_respect_point(
+                    point, points_2[:, self.x_domain], parameters_x)['cov']
+                return cov_x * quadrature_tasks
+            cov_x = Matern52.cross_cov_from_params(
+                parameters_x, point, points_2[:, self.x_domain], self.gp.dimensions[1])
+            return cov_x * quadrature_tasks
+
         f = lambda x: self.gp.evaluate_cross_cov(x, points_2, parameters_kernel)
 
         parameters = {
@@ -324,6 +452,13 @@ class BayesianQuadrature(object):
         :return: np.array(kxm)
         """
 
+        if self.factorized_quadrature:
+            parameters_x, quadrature_tasks = self._factorized_kernel_parameters(parameters_kernel)
+            gradient_x = self._matern52_derivatives_respect_point(
+                point, points_2[:, self.x_domain], parameters_x)['gradient']
+            quadrature_tasks = quadrature_tasks[points_2[:, self.w_domain[0]].astype(int)]
+            return (gradient_x * quadrature_tasks[:, np.newaxis]).transpose()
+
         parameters = {
             'f': self.gp.evaluate_grad_cross_cov_respect_point,
             'point': point,
@@ -348,6 +483,14 @@ class BayesianQuadrature(object):
         :param parameters_kernel: np.array(l)
         :return: np.array(mxkxk)
         """
+
+        if self.factorized_quadrature:
+            parameters_x, quadrature_tasks = self._factorized_kernel_parameters(parameters_kernel)
+            hessian_x = self._matern52_derivatives_respect_point(
+                point, points_2[:, self.x_domain], parameters_x, hessian=True)['hessian']
+            quadrature_tasks = quadrature_tasks[points_2[:, self.w_domain[0]].astype(int)]
+            return hessian_x * quadrature_tasks[:, np.newaxis, np.newaxis]
+
         parameters = {
             'f': self.gp.evaluate_hessian_cross_cov_respect_point,
             'point': point,
@@ -377,6 +520,17 @@ class BayesianQuadrature(object):
         :return: np.array(kxm)
         """
 
+        if self.factorized_quadrature:
+            # The tasks kernel doesn't depend continuously on the task of candidate_point, so
+            # the gradient respect to it is zero.
+            parameters_x, quadrature_tasks = self._factorized_kernel_parameters(parameters_kernel)
+            gradient_x = Matern52.evaluate_grad_respect_point(
+                parameters_x, candidate_point[:, self.x_domain], points, self.gp.dimensions[1])
+            gradient = np.zeros((candidate_point.shape[1], points.shape[0]))
+            gradient[self.x_domain, :] = \
+                gradient_x.transpose() * quadrature_tasks[int(candidate_point[0, self.w_domain[0]])]
+            return gradient
+
         parameters = {
             'f': self.gp.evaluate_grad_cross_cov_respect_point,
             'candidate_point': candidate_point,
@@ -427,12 +581,12 @@ class BayesianQuadrature(object):
     def compute_posterior_parameters(self, points, var_noise=None, mean=None,
                                      parameters_kernel=None, historical_points=None,
                                      historical_evaluations=None, only_mean=False, cache=True,
-                                     parallel=False):
+                                     parallel=False, diag_only=False):
         """
         Compute posterior mean and covariance of the GP on G(x) = E[F(x, w)] evaluated at each point
         of points.
 
-        :param points: np.array(txk) More than one point only if only_mean is True!
+        :param points: np.array(txk) More than one point only if only_mean or diag_only is True!
         :param var_noise: float
         :param mean: float
         :param parameters_kernel: np.array(l)
@@ -442,10 +596,11 @@ class BayesianQuadrature(object):
         :param only_mean: (boolean) computes only the mean if it's True.
         :param parallel: (boolean) computes the vector B(x, i) in parallel for every point in
             points
+        :param diag_only: (boolean) computes only the posterior variance of each point.
 
         :return: {
             'mean': np.array(t),
-            'cov': float,
+            'cov': float, or np.array(t) if diag_only is True
         }
         """
 
@@ -477,8 +632,9 @@ class BayesianQuadrature(object):
 
         compute_vec_covs = False
         if cache and points.shape[0] == 1:
-            vec_covs = self._get_cached_data(
-                (tuple(parameters_kernel), tuple(points[0, :])), QUADRATURES)
+            vec_covs = self._get_cached_vec_covs(
+                (tuple(parameters_kernel), tuple(points[0, :])), points, historical_points,
+                parameters_kernel, parallel)
         else:
             vec_covs = None
 
@@ -494,8 +650,8 @@ class BayesianQuadrature(object):
             vec_covs = computations['vec_covs']
 
         if cache and compute_vec_covs and points.shape[0] == 1:
-            self._updated_cached_data(
-                (tuple(parameters_kernel), tuple(points[0, :])), vec_covs, QUADRATURES)
+            self._update_cached_vec_covs(
+                (tuple(parameters_kernel), tuple(points[0, :])), vec_covs, historical_points)
 
         mu_n = mean + np.dot(vec_covs, solve)
 
@@ -505,6 +661,13 @@ class BayesianQuadrature(object):
             'cov': None,
         }
 
+        if diag_only:
+            quadrature_cov = self.evaluate_quadrate_cov_diagonal(points, parameters_kernel)
+            return {
+                'mean': mu_n,
+                'cov': quadrature_cov - cho_quadratic_diagonal(chol, vec_covs.transpose()),
+            }
+
         solve_2 = cho_solve(chol, vec_covs.transpose())
 
         cov_n = self.evaluate_quadrate_cov(points, parameters_kernel) - np.dot(vec_covs, solve_2)
@@ -591,8 +754,9 @@ class BayesianQuadrature(object):
 
         compute_vec_covs = False
         if cache:
-            vec_covs = self._get_cached_data(
-                (tuple(parameters_kernel), tuple(point[0, :])), QUADRATURES)
+            vec_covs = self._get_cached_vec_covs(
+                (tuple(parameters_kernel), tuple(point[0, :])), point, self.gp.data['points'],
+                parameters_kernel, parallel)
         else:
             vec_covs = None
 
@@ -608,8 +772,8 @@ class BayesianQuadrature(object):
                 vec_covs = computations['vec_covs']
 
         if cache and compute_vec_covs:
-            self._updated_cached_data(
-                (tuple(parameters_kernel), tuple(point[0, :])), vec_covs, QUADRATURES)
+            self._update_cached_vec_covs(
+                (tuple(parameters_kernel), tuple(point[0, :])), vec_covs, self.gp.data['points'])
 
         solve = chol_solve['solve']
         chol = chol_solve['chol']
@@ -637,6 +801,30 @@ class BayesianQuadrature(object):
                                                  parameters_kernel=parameters_kernel,
                                                  only_mean=True)['mean']
 
+    def posterior_mean_many(self, points, var_noise=None, mean=None, parameters_kernel=None,
+                            n_samples_parameters=0):
+        """
+        Computes the posterior mean at all the points. The quadratures of the points are computed
+        in blocks, and the means with one matrix product. If n_samples_parameters > 0, the
+        posterior mean is averaged over the last n_samples_parameters samples of the parameters
+        of the model.
+
+        :param points: np.array(nxk)
+        :param var_noise: float
+        :param mean: float
+        :param parameters_kernel: np.array(l)
+        :param n_samples_parameters: int
+        :return: np.array(n)
+        """
+
+        if n_samples_parameters > 0:
+            return BayesianEvaluations.evaluate(self.posterior_mean_many, points, self.gp,
+                                                n_samples_parameters, None)[0]
+
+        return self.compute_posterior_parameters(points, var_noise=var_noise, mean=mean,
+                                                 parameters_kernel=parameters_kernel,
+                                                 only_mean=True)['mean']
+
     def evaluate_gradient_sample_params(self, point, random_seed=None):
         """
         Computes the gradient of EI taking a random sample of the parameters of the model.
@@ -668,6 +856,47 @@ class BayesianQuadrature(object):
         return self.gradient_posterior_mean(point, var_noise=var_noise, mean=mean,
                                             parameters_kernel=parameters_kernel)
 
+    def objective_and_grad_posterior_mean(self, point, var_noise=None, mean=None,
+                                          parameters_kernel=None):
+        """
+        Computes the posterior mean and its gradient evaluated on point. The Cholesky solve of the
+        historical data is computed only once.
+
+        :param point: np.array(k)
+        :param var_noise: float
+        :param mean: float
+        :param parameters_kernel: np.array(l)
+        :return: (float, np.array(k))
+        """
+
+        if var_noise is None:
+            var_noise = self.gp.var_noise.value[0]
+
+        if parameters_kernel is None:
+            parameters_kernel = self.gp.kernel.hypers_values_as_array
+
+        if mean is None:
+            mean = self.gp.mean.value[0]
+
+        point = point.reshape((1, len(point)))
+        historical_points = self.gp.data['points']
+
+        solve = self.gp._cholesky_solve_vectors_for_posterior(
+            var_noise, mean, parameters_kernel, historical_points=historical_points,
+            historical_evaluations=self.gp.data['evaluations'], cache=True)['solve']
+
+        index = (tuple(parameters_kernel), tuple(point[0, :]))
+        vec_covs = self._get_cached_vec_covs(index, point, historical_points, parameters_kernel)
+        if vec_covs is None:
+            vec_covs = self.compute_vectors_b(point, None, historical_points, parameters_kernel,
+                                              True, False, False)['vec_covs']
+            self._update_cached_vec_covs(index, vec_covs, historical_points)
+
+        gradient = self.evaluate_grad_quadrature_cross_cov(point, historical_points,
+                                                           parameters_kernel)
+
+        return mean + np.dot(vec_covs, solve), np.dot(gradient, solve)
+
     def optimize_posterior_mean(self, start=None, random_seed=None, minimize=False, n_restarts=1000,
                                 n_best_restarts=100, parallel=True, n_treads=0, var_noise=None,
                                 mean=None, parameters_kernel=None, n_samples_parameters=0,
@@ -711,8 +940,7 @@ class BayesianQuadrature(object):
             method_opt = SGD_NAME
 
         if start_new_chain and n_samples_parameters > 0:
-            self.gp.start_new_chain()
-            self.gp.sample_parameters(DEFAULT_N_PARAMETERS)
+            self.gp.update_chain(DEFAULT_N_PARAMETERS)
 
         bounds_x = [self.gp.bounds[i] for i in xrange(len(self.gp.bounds)) if i in
                     self.x_domain]
@@ -752,20 +980,11 @@ class BayesianQuadrature(object):
             n_restart_ = start.shape[0]
 
             if n_restart_ > n_best_restarts and n_best_restarts > 0:
-                values = []
-                point_dict = {}
-                args = (False, None, True, 0, self, var_noise, mean, parameters_kernel,
-                        DEFAULT_N_PARAMETERS)
-                for j in xrange(n_restart_):
-                    point_dict[j] = start[j, :]
-                values = Parallel.run_function_different_arguments_parallel(
-                    wrapper_objective_posterior_mean_bq, point_dict, *args)
+                values = self.posterior_mean_many(
+                    start, n_samples_parameters=DEFAULT_N_PARAMETERS)
                 values_index = sorted(range(len(values)), key=lambda k: values[k])
                 values_index = values_index[-n_best_restarts:]
-                start_ = []
-                for i in values_index:
-                    start_.append(start[i, :])
-                start = np.array(start_)
+                start = start[values_index, :]
                 n_restart_ = start.shape[0]
             if candidate_point is not None:
                 candidate_point = np.array(candidate_point)
@@ -788,7 +1007,8 @@ class BayesianQuadrature(object):
                 objective_function,
                 bounds,
                 grad_function, hessian=hessian_function,
-                minimize=minimize)
+                minimize=minimize,
+                value_and_grad=wrapper_objective_and_gradient_posterior_mean_bq)
 
             args = (False, None, parallel, n_treads, optimization, self, var_noise, mean,
                     parameters_kernel, n_samples_parameters)
@@ -855,23 +1075,16 @@ class BayesianQuadrature(object):
                 candidate_values = []
 
             n = len(candidate_values) + len(vertex)
-            candidate_solutions_2 = candidate_solutions + vertex
-            values = []
-            point_dict = {}
-            args = (False, None, parallel, 0, self, var_noise, mean, parameters_kernel,
-                    DEFAULT_N_PARAMETERS)
-            for j in range(n):
-                point_dict[j] = np.array(candidate_solutions_2[j])
-            values = Parallel.run_function_different_arguments_parallel(
-                wrapper_objective_posterior_mean_bq, point_dict, *args)
-
-            values_candidates = []
-            for j in range(n):
-                values_candidates.append(values[j])
+            candidate_solutions_2 = np.array(
+                [np.ravel(point) for point in list(candidate_solutions) + vertex][0: n],
+                dtype=float)
+
+            values_candidates = self.posterior_mean_many(
+                candidate_solutions_2, n_samples_parameters=DEFAULT_N_PARAMETERS)
             ind_max_2 = np.argmax(values_candidates)
 
             if np.max(values_candidates) > max_:
-                solution = point_dict[ind_max_2]
+                solution = candidate_solutions_2[ind_max_2, :]
                 value = np.max(values_candidates)
                 optimal_solutions = {}
                 optimal_solutions[ind_max] = {'solution': solution, 'optimal_value': [value]}
@@ -886,6 +1099,66 @@ class BayesianQuadrature(object):
         self.max_mean[index_cache] = max_
         return optimal_solutions.get(ind_max)
 
+    def _get_cached_vec_covs(self, index, points, historical_points, parameters_kernel,
+                             parallel=False, n_threads=0):
+        """
+        Get the quadratures B(x, i) for every x in points and every historical point i from the
+        cache. The cache is append-aware: if the historical points start with the historical
+        points of the cached matrix (e.g. the GP gained points since it was cached), only the
+        columns of the new historical points are computed, and the extended matrix is cached.
+        If the historical points are a prefix of the cached ones (e.g. points added to choose a
+        batch of points were removed), the leading columns are returned.
+
+        :param index: tuple
+        :param points: np.array(nxk), points of the rows of the matrix. They are only used if the
+            matrix has to be extended.
+        :param historical_points: np.array(mxk')
+        :param parameters_kernel: np.array(l)
+        :param parallel: boolean
+        :param n_threads: (int)
+        :return: np.array(rxm), or None if it's not cached or it can't be extended.
+        """
+
+        cached_data = self._get_cached_data(index, QUADRATURES)
+
+        if cached_data is None:
+            return None
+
+        vec_covs, cached_points = cached_data
+        n_cached = cached_points.shape[0]
+
+        n_points = historical_points.shape[0]
+        n_common = min(n_cached, n_points)
+
+        if not np.array_equal(cached_points[0: n_common, :], historical_points[0: n_common, :]):
+            return None
+
+        if n_cached >= n_points:
+            return vec_covs[:, 0: n_points]
+
+        if vec_covs.shape[0] != points.shape[0]:
+            return None
+
+        new_vec_covs = self.compute_vectors_b(
+            points, None, historical_points[n_cached:, :], parameters_kernel, True, False,
+            parallel, n_threads=n_threads)['vec_covs']
+        vec_covs = np.concatenate((vec_covs, new_vec_covs), axis=1)
+
+        self._update_cached_vec_covs(index, vec_covs, historical_points)
+
+        return vec_covs
+
+    def _update_cached_vec_covs(self, index, vec_covs, historical_points):
+        """
+        Caches the quadratures B(x, i) together with the historical points i (see
+        _get_cached_vec_covs).
+
+        :param index: tuple
+        :param vec_covs: np.array(nxm)
+        :param historical_points: np.array(mxk')
+        """
+        self._updated_cached_data(index, (vec_covs, np.array(historical_points)), QUADRATURES)
+
     def compute_vectors_b(self, points, candidate_points, historical_points, parameters_kernel,
                           compute_vec_covs, compute_b_new, parallel, n_threads=0):
         """
@@ -910,7 +1183,6 @@ class BayesianQuadrature(object):
         n = points.shape[0]
         m = historical_points.shape[0]
 
-
         vec_covs = None
         b_new = None
 
@@ -921,33 +1193,38 @@ class BayesianQuadrature(object):
             n_candidate_points = candidate_points.shape[0]
             b_new = np.zeros((n, n_candidate_points))
 
+        # The points are processed in blocks, and the quadratures of each block are computed with
+        # one evaluation of the kernel.
         if parallel:
-            point_dict = {}
-            for i in xrange(n):
-                point_dict[i] = points[i:i + 1, :]
+            n_blocks = min(n, mp.cpu_count())
+        else:
+            n_blocks = int(np.ceil(float(n) / N_POINTS_QUADRATURE_BATCH))
+        limits = np.linspace(0, n, n_blocks + 1).astype(int)
 
+        blocks = {}
+        for i in xrange(n_blocks):
+            blocks[i] = points[limits[i]:limits[i + 1], :]
+
+        if parallel:
             args = (False, None, True, n_threads, compute_vec_covs, compute_b_new,
                     historical_points, parameters_kernel, candidate_points, self,)
 
             b_vectors = Parallel.run_function_different_arguments_parallel(
-                wrapper_compute_vector_b, point_dict, *args)
-
-            for i in xrange(n):
-                if b_vectors.get(i) is None:
-                    logger.info("Error in computing b vectors at point %d" % i)
-                    continue
-                if compute_vec_covs:
-                    vec_covs[i, :] = b_vectors[i]['vec_covs']
-                if compute_b_new:
-                    b_new[i, :] = b_vectors[i]['b_new']
+                wrapper_compute_vector_b, blocks, *args)
         else:
-            for i in xrange(n):
-                if compute_vec_covs:
-                    vec_covs[i, :] = self.evaluate_quadrature_cross_cov(
-                        points[i:i + 1, :], historical_points, parameters_kernel)
-                if compute_b_new:
-                    b_new[i, :] = self.evaluate_quadrature_cross_cov(
-                        points[i:i + 1, :], candidate_points, parameters_kernel)
+            b_vectors = Parallel.run_function_different_arguments_sequentially(
+                wrapper_compute_vector_b, blocks, compute_vec_covs, compute_b_new,
+                historical_points, parameters_kernel, candidate_points, self)
+
+        for i in xrange(n_blocks):
+            if b_vectors.get(i) is None:
+                logger.info("Error in computing b vectors at points %d to %d" %
+                            (limits[i], limits[i + 1] - 1))
+                continue
+            if compute_vec_covs:
+                vec_covs[limits[i]:limits[i + 1], :] = b_vectors[i]['vec_covs']
+            if compute_b_new:
+                b_new[limits[i]:limits[i + 1], :] = b_vectors[i]['b_new']
 
         return {'b_new': b_new, 'vec_covs': vec_covs}
 
@@ -990,7 +1267,9 @@ class BayesianQuadrature(object):
 
         compute_vec_covs = False
         if cache:
-            vec_covs = self._get_cached_data((tuple(parameters_kernel, )), QUADRATURES)
+            vec_covs = self._get_cached_vec_covs(
+                (tuple(parameters_kernel), ), points, self.gp.data['points'], parameters_kernel,
+                parallel)
         else:
             vec_covs = None
 
@@ -1011,17 +1290,18 @@ class BayesianQuadrature(object):
 
         if cache:
             if compute_vec_covs:
-                self._updated_cached_data((tuple(parameters_kernel), ), vec_covs, QUADRATURES)
+                self._update_cached_vec_covs(
+                    (tuple(parameters_kernel), ), vec_covs, self.gp.data['points'])
 
         if cache:
-            mu_n = self._get_cached_data((tuple(parameters_kernel),), POSTERIOR_MEAN)
+            mu_n = self._get_cached_data((tuple(parameters_kernel), m), POSTERIOR_MEAN)
         else:
             mu_n = None
 
         if mu_n is None:
             mu_n = mean + np.dot(vec_covs, solve)
             if cache:
-                self._updated_cached_data((tuple(parameters_kernel),), mu_n, POSTERIOR_MEAN)
+                self._updated_cached_data((tuple(parameters_kernel), m), mu_n, POSTERIOR_MEAN)
 
         # TODO: CACHE SO WE DON'T COMPUTE MU_N ALL THE TIME
         cross_cov = self.gp.evaluate_cross_cov(self.gp.data['points'], candidate_points,
@@ -1049,7 +1329,7 @@ class BayesianQuadrature(object):
         }
 
     def get_parameters_for_samples(self, cache, candidate_point, parameters_kernel,
-                                           var_noise, mean, clear_cache=True):
+                                           var_noise, mean):
         """
         Computes additional parameters needed for sample of SBO.
 
@@ -1078,15 +1358,19 @@ class BayesianQuadrature(object):
             mean = self.gp.mean.value[0]
 
         chol_solve = self.gp._cholesky_solve_vectors_for_posterior(
-            var_noise, mean, parameters_kernel, cache=cache, clear_cache=clear_cache)
+            var_noise, mean, parameters_kernel, cache=cache)
         chol = chol_solve['chol']
         solve = chol_solve['solve']
 
         index_cache = (tuple(candidate_point[0, :]), tuple(parameters_kernel))
-        if cache and index_cache in self.cache_sample:
-            solve_2 = self.cache_sample[index_cache]['solve_2']
-            denominator = self.cache_sample[index_cache]['denominator']
-            cross_cov = self.cache_sample[index_cache]['gamma']
+        cached_sample = None
+        if cache:
+            cached_sample = self.cache_sample.get(index_cache)
+
+        if cached_sample is not None:
+            solve_2 = cached_sample['solve_2']
+            denominator = cached_sample['denominator']
+            cross_cov = cached_sample['gamma']
         else:
 
             cross_cov = self.gp.evaluate_cross_cov(self.gp.data['points'], candidate_point,
@@ -1103,12 +1387,11 @@ class BayesianQuadrature(object):
             denominator = np.clip(denominator, 0, None)
             denominator = np.sqrt(denominator)
             if cache:
-                if clear_cache:
-                    self.cache_sample = {}
-                self.cache_sample[index_cache] = {}
-                self.cache_sample[index_cache]['denominator'] = denominator
-                self.cache_sample[index_cache]['solve_2'] = solve_2
-                self.cache_sample[index_cache]['gamma'] = cross_cov
+                self.cache_sample[index_cache] = {
+                    'denominator': denominator,
+                    'solve_2': solve_2,
+                    'gamma': cross_cov,
+                }
 
         return {
             'gamma': cross_cov,
@@ -1124,7 +1407,7 @@ class BayesianQuadrature(object):
 
     def compute_parameters_for_sample(
             self, point, candidate_point, var_noise=None, mean=None,
-            parameters_kernel=None, cache=True, n_threads=0, clear_cache=True):
+            parameters_kernel=None, cache=True, n_threads=0):
         """
         Compute posterior parameters of a_n+1(point) given the candidate_point. Caching is different
         than in the other functions.
@@ -1150,8 +1433,7 @@ class BayesianQuadrature(object):
         var_noise = additional_parameters.get('var_noise')
 
         vec_covs, b_new = self.get_vec_covs(cache, point, parameters_kernel, candidate_point,
-                                            False, monte_carlo=True, n_threads=n_threads,
-                                            clear_cache=clear_cache)
+                                            False, monte_carlo=True, n_threads=n_threads)
 
         mu_n = mean + np.dot(vec_covs, solve)
 
@@ -1167,6 +1449,184 @@ class BayesianQuadrature(object):
 
         return {'a': mu_n, 'b': b_value}
 
+    def get_parameters_for_samples_batch(self, candidate_point, parameters, cache=True):
+        """
+        Computes the parameters of get_parameters_for_samples for several samples of the
+        hyperparameters of the GP at once. The Cholesky decompositions and the solves are done
+        over the stacked samples, and only the evaluations of the kernel are done by sample. The
+        results are cached by sample as in get_parameters_for_samples.
+
+        :param candidate_point: np.array(1xm)
+        :param parameters: [np.array(l)], each element is [var_noise, mean, parameters_kernel]
+        :param cache: (boolean)
+        :return: {
+            'gamma': np.array(sxn), cov(historical_points, candidate_point) by sample,
+            'solve_2': np.array(sxn), cov(historical_points)^-1 * gamma by sample,
+            'denominator': np.array(s),
+            'chol': np.array(sxnxn),
+            'solve': np.array(sxn), cov(historical_points)^-1 * (y_historical) by sample,
+            'mean': np.array(s),
+            'var_noise': np.array(s),
+            'parameters_kernel': np.array(sxl),
+        }
+        """
+
+        n_samples = len(parameters)
+        n = self.gp.data['points'].shape[0]
+
+        parameters = np.array(parameters)
+        var_noise = parameters[:, 0]
+        mean = parameters[:, 1]
+        parameters_kernel = parameters[:, 2:]
+
+        chol_solve = self.gp._cholesky_solve_vectors_for_posterior_batch(
+            var_noise, mean, parameters_kernel, cache=cache)
+        chol = chol_solve['chol']
+        solve = chol_solve['solve']
+
+        gamma = np.zeros((n_samples, n))
+        solve_2 = np.zeros((n_samples, n))
+        new_cross_cov = np.zeros(n_samples)
+        cached_denominator = np.zeros(n_samples)
+        cached = np.zeros(n_samples, dtype=bool)
+        index_cache = []
+
+        for s in xrange(n_samples):
+            index_cache.append((tuple(candidate_point[0, :]), tuple(parameters_kernel[s, :])))
+            cached_sample = None
+            if cache:
+                cached_sample = self.cache_sample.get(index_cache[s])
+
+            if cached_sample is not None:
+                cached[s] = True
+                gamma[s, :] = cached_sample['gamma'][:, 0]
+                solve_2[s, :] = cached_sample['solve_2'][:, 0]
+                cached_denominator[s] = cached_sample['denominator'][0]
+                continue
+
+            gamma[s, :] = self.gp.evaluate_cross_cov(
+                self.gp.data['points'], candidate_point, parameters_kernel[s, :])[:, 0]
+            new_cross_cov[s] = self.gp.evaluate_cross_cov(
+                candidate_point, candidate_point, parameters_kernel[s, :])[0, 0]
+
+        not_cached = np.where(~cached)[0]
+        if len(not_cached) > 0:
+            solve_2[not_cached, :] = cho_solve_batch(chol[not_cached, :, :],
+                                                     gamma[not_cached, :])
+
+        add_noise = self.var_noise
+        if add_noise is None:
+            add_noise = var_noise
+
+        denominator = new_cross_cov - np.einsum('ij,ij->i', gamma, solve_2) + add_noise
+        denominator = np.sqrt(np.clip(denominator, 0, None))
+        denominator[cached] = cached_denominator[cached]
+
+        if cache:
+            for s in not_cached:
+                self.cache_sample[index_cache[s]] = {
+                    'denominator': denominator[s: s + 1].copy(),
+                    'solve_2': solve_2[s, :].reshape((n, 1)).copy(),
+                    'gamma': gamma[s, :].reshape((n, 1)).copy(),
+                }
+
+        return {
+            'gamma': gamma,
+            'solve_2': solve_2,
+            'denominator': denominator,
+            'chol': chol,
+            'solve': solve,
+            'mean': mean,
+            'var_noise': var_noise,
+            'parameters_kernel': parameters_kernel,
+        }
+
+    def compute_parameters_for_points(self, points, candidate_point, var_noise=None, mean=None,
+                                      parameters_kernel=None, cache=True):
+        """
+        Compute the posterior parameters of a_n+1(x) given the candidate_point, for each x in
+        points (see compute_parameters_for_sample). The quadratures of the points are not cached.
+
+        :param points: np.array(txn)
+        :param candidate_point: np.array(1xm)
+        :param var_noise: float
+        :param mean: float
+        :param parameters_kernel: np.array(l)
+        :param cache: (boolean) Use cached data and cache data of the sample if cache is True
+        :return: {'a': np.array(t), 'b': np.array(t)}
+        """
+
+        additional_parameters = self.get_parameters_for_samples(
+            cache, candidate_point, parameters_kernel, var_noise, mean)
+
+        parameters_kernel = additional_parameters['parameters_kernel']
+        historical_points = self.gp.data['points']
+        m = historical_points.shape[0]
+
+        points_2 = np.concatenate((historical_points, candidate_point), axis=0)
+
+        quadratures = np.zeros((points.shape[0], m + 1))
+        for i in xrange(points.shape[0]):
+            quadratures[i, :] = self.evaluate_quadrature_cross_cov(
+                points[i:i + 1, :], points_2, parameters_kernel)
+
+        vec_covs = quadratures[:, 0: m]
+
+        a = additional_parameters['mean'] + np.dot(vec_covs, additional_parameters['solve'])
+
+        denominator = additional_parameters['denominator'][0]
+        if denominator != 0:
+            b = quadratures[:, m] - np.dot(vec_covs, additional_parameters['solve_2'][:, 0])
+            b /= denominator
+        else:
+            b = np.zeros(points.shape[0])
+
+        return {'a': a, 'b': b}
+
+    def compute_gradient_parameters_for_points(
+            self, points, candidate_point, var_noise=None, mean=None, parameters_kernel=None,
+            cache=True):
+        """
+        Compute the gradient of the posterior parameters of a_n+1(x) respect to x given the
+        candidate_point, for each x in points (see compute_gradient_parameters_for_sample).
+
+        :param points: np.array(txn)
+        :param candidate_point: np.array(1xm)
+        :param var_noise: float
+        :param mean: float
+        :param parameters_kernel: np.array(l)
+        :param cache: (boolean) Use cached data and cache data of the sample if cache is True
+        :return: {'a': np.array(txn), 'b': np.array(txn)}
+        """
+
+        additional_parameters = self.get_parameters_for_samples(
+            cache, candidate_point, parameters_kernel, var_noise, mean)
+
+        parameters_kernel = additional_parameters['parameters_kernel']
+        historical_points = self.gp.data['points']
+        m = historical_points.shape[0]
+
+        points_2 = np.concatenate((historical_points, candidate_point), axis=0)
+
+        gradients = np.zeros((points.shape[0], points.shape[1], m + 1))
+        for i in xrange(points.shape[0]):
+            gradients[i, :, :] = self.evaluate_grad_quadrature_cross_cov(
+                points[i:i + 1, :], points_2, parameters_kernel)
+
+        gradient = gradients[:, :, 0: m]
+
+        gradient_a = np.einsum('ijk,k->ij', gradient, additional_parameters['solve'])
+
+        denominator = additional_parameters['denominator'][0]
+        if denominator != 0:
+            gradient_b = gradients[:, :, m] - \
+                np.einsum('ijk,k->ij', gradient, additional_parameters['solve_2'][:, 0])
+            gradient_b /= denominator
+        else:
+            gradient_b = np.zeros(gradient_a.shape)
+
+        return {'a': gradient_a, 'b': gradient_b}
+
     def compute_gradient_parameters_for_sample(
             self, point, candidate_point, var_noise=None, mean=None,
             parameters_kernel=None, cache=True):
@@ -1263,7 +1723,7 @@ class BayesianQuadrature(object):
         return {'a': hessian_a, 'b': hessian_b}
 
     def get_vec_covs(self, cache, points, parameters_kernel, candidate_point, parallel,
-                     keep_indexes=None, monte_carlo=False, n_threads=0, clear_cache=True):
+                     keep_indexes=None, monte_carlo=False, n_threads=0):
         """
         Get vectors b from cache if possible.
 
@@ -1312,7 +1772,9 @@ class BayesianQuadrature(object):
             else:
                 index_vec_covs = (tuple(parameters_kernel), tuple(points[0, :]))
 
-            vec_covs = self._get_cached_data(index_vec_covs, QUADRATURES)
+            vec_covs = self._get_cached_vec_covs(
+                index_vec_covs, points, self.gp.data['points'], parameters_kernel, parallel,
+                n_threads=n_threads)
         else:
             vec_covs = None
 
@@ -1334,18 +1796,11 @@ class BayesianQuadrature(object):
                 b_new = computations['b_new']
 
         if cache:
-            if n_threads > 0 and monte_carlo:
-                thread = True
-            else:
-                thread = False
-
             if compute_vec_covs:
-                self._updated_cached_data(index_vec_covs, vec_covs, QUADRATURES, thread=thread,
-                                          clear_cache=clear_cache)
+                self._update_cached_vec_covs(index_vec_covs, vec_covs, self.gp.data['points'])
 
             if compute_b_new:
-                self._updated_cached_data(index_b_new, b_new, B_NEW, thread=thread,
-                                          clear_cache=clear_cache)
+                self._updated_cached_data(index_b_new, b_new, B_NEW)
 
         return vec_covs, b_new
 
@@ -1389,15 +1844,17 @@ class BayesianQuadrature(object):
         vec_covs, b_new = self.get_vec_covs(cache, points, parameters_kernel, candidate_point,
                                             parallel, n_threads=n_threads)
 
+        m = self.gp.data['points'].shape[0]
         if cache:
-            mu_n = self._get_cached_data((tuple(parameters_kernel), mean), POSTERIOR_MEAN)
+            mu_n = self._get_cached_data((tuple(parameters_kernel), mean, m), POSTERIOR_MEAN)
         else:
             mu_n = None
 
         if mu_n is None:
             mu_n = mean + np.dot(vec_covs, solve)
             if cache:
-                self._updated_cached_data((tuple(parameters_kernel), mean), mu_n, POSTERIOR_MEAN)
+                self._updated_cached_data(
+                    (tuple(parameters_kernel), mean, m), mu_n, POSTERIOR_MEAN)
 
         # TODO: CACHE SO WE DON'T COMPUTE MU_N ALL THE TIME
         cross_cov = self.gp.evaluate_cross_cov(candidate_point, self.gp.data['points'],
@@ -1593,18 +2050,21 @@ class BayesianQuadrature(object):
 
         JSONFile.write(self.optimal_solutions, debug_path)
 
-    def clean_cache(self):
+    def clean_cache(self, keep_factors=False):
         """
-        Cleans the cache
+        Cleans the cache. The quadratures are kept because they're extended when the GP gains
+        points (see _get_cached_vec_covs).
+
+        :param keep_factors: (boolean) If True, the Cholesky decompositions cached by the GP are
+            kept (see GPFittingGaussian.clean_cache).
         """
-        self.cache_quadratures = {}
-        self.cache_posterior_mean = {}
-        self.cache_quadrature_with_candidate = {}
-        self.gp.clean_cache()
+        self.cache_posterior_mean.clear()
+        self.cache_quadrature_with_candidate.clear()
+        self.gp.clean_cache(keep_factors=keep_factors)
         self.max_mean = {}  # max_{x} a_{n} (x)
         # (a solution for every set of parameters of the model)
         self.best_solution = {}
-        self.cache_sample = {}
+        self.cache_sample.clear()
 
         self.var_noise = None
         if self.gp.noise and self.gp.data.get('var_noise') is not None:
@@ -46,6 +46,31 @@ class SliceSampling(object):
         self.component_wise = slice_sampling_params.get('component_wise', True)
         self.doubling_step = slice_sampling_params.get('doubling_step', True)
 
+        # Counters of the sampler (see statistics)
+        self.n_samples = 0
+        self.n_rejected_proposals = 0
+        self.n_log_prob_evaluations = 0
+
+    def statistics(self):
+        """
+        :return: {
+            'n_samples': int, number of calls to slice_sample,
+            'n_rejected_proposals': int, number of proposals that were out of the slice, and
+                shrank the x-interval,
+            'n_log_prob_evaluations': int,
+        }
+        """
+        return {
+            'n_samples': self.n_samples,
+            'n_rejected_proposals': self.n_rejected_proposals,
+            'n_log_prob_evaluations': self.n_log_prob_evaluations,
+        }
+
+    def reset_statistics(self):
+        self.n_samples = 0
+        self.n_rejected_proposals = 0
+        self.n_log_prob_evaluations = 0
+
     def slice_sample(self, point, fixed_parameters, *args_log_prob):
         """
         Same a point from self.log_prob using slice sampling.
@@ -58,6 +83,7 @@ class SliceSampling(object):
         """
 
         dimensions = len(point)
+        self.n_samples += 1
 
         if self.component_wise:
             dims = range(dimensions)
@@ -90,6 +116,7 @@ class SliceSampling(object):
         :return: float
         """
         new_point = point + x * direction
+        self.n_log_prob_evaluations += 1
 
         if fixed_parameters is not None:
             new_point = combine_vectors(new_point, fixed_parameters, self.indexes)
@@ -237,7 +264,9 @@ class SliceSampling(object):
             if new_llh > llh and self.acceptable(new_z, llh, start_lower, start_upper, direction,
                                                  point, fixed_parameters, *args_log_prob):
                 break
-            elif new_z < 0:
+
+            self.n_rejected_proposals += 1
+            if new_z < 0:
                 lower = new_z
             elif new_z > 0:
                 upper = new_z
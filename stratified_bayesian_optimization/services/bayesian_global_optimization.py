@@ -1,5 +1,7 @@
 from __future__ import absolute_import
 
+from os import path
+
 import numpy as np
 
 from collections import Counter
@@ -19,8 +21,17 @@ from stratified_bayesian_optimization.lib.constant import (
     SGD_NAME,
     EI_METHOD,
     SDE_METHOD,
+    CHECKPOINT_SUFFIX,
 )
 from stratified_bayesian_optimization.lib.distances import Distances
+from stratified_bayesian_optimization.lib.parallel import Parallel
+from stratified_bayesian_optimization.lib.async_evaluations import AsyncEvaluations
+from stratified_bayesian_optimization.lib.util import (
+    wrapper_evaluate_objective_function,
+    wrapper_evaluate_main_objective,
+    convert_list_to_dictionary,
+    convert_dictionary_to_list,
+)
 from stratified_bayesian_optimization.entities.objective import Objective
 from stratified_bayesian_optimization.acquisition_functions.sbo import SBO
 from stratified_bayesian_optimization.acquisition_functions.ei import EI
@@ -28,6 +39,7 @@ from stratified_bayesian_optimization.acquisition_functions.multi_task import Mu
 from stratified_bayesian_optimization.services.training_data import TrainingDataService
 from stratified_bayesian_optimization.acquisition_functions.sde import SDE
 from stratified_bayesian_optimization.util.json_file import JSONFile
+from stratified_bayesian_optimization.util.npy_file import NPYFile
 
 logger = SBOLog(__name__)
 
@@ -53,7 +65,12 @@ class BGO(object):
         logger.info("Algorithm used is:")
         logger.info(method_optimization)
 
-        gp_model = GPFittingService.from_dict(spec)
+        gp_model = None
+        if spec.get('resume', False):
+            gp_model = cls._read_checkpoint_gp_model(spec)
+
+        if gp_model is None:
+            gp_model = GPFittingService.from_dict(spec)
         noise = spec.get('noise')
         quadrature = None
         acquisition_function = None
@@ -145,6 +162,10 @@ class BGO(object):
         self.method_optimization = method_optimization
         self.quadrature = quadrature
 
+        # Background evaluations of the objective (see optimize)
+        self.evaluations_queue = None
+        self.solutions_queue = None
+
         if quadrature is not None:
             self.quadrature.args_handler = (True, name_model, problem_name, kernel_name,
                                             training_name, n_training, random_seed,
@@ -159,6 +180,9 @@ class BGO(object):
         if not use_only_training_points:
             self.objective.set_data_from_file()
 
+        # State of the run after each iteration (see optimize)
+        self.checkpoint_path = self._get_checkpoint_path(self.objective.file_path)
+
         self.n_iterations = n_iterations
         self.minimize = minimize
         self.parallel = parallel
@@ -173,8 +197,101 @@ class BGO(object):
                  n_best_restarts_mean=100, method_opt_mc=None, maxepoch=10,
                  n_samples_parameters_mean=0, maxepoch_mean=20, threshold_sbo=None,
                  optimize_only_posterior_mean=False, start_optimize_posterior_mean=0,
+                 warm_start_chain=False, n_in_flight=0, deterministic_order=True,
+                 batch_size=1, checkpoint=False, resume=False, shared_memory=False,
                  **opt_params_mc):
         """
+        Optimize objective over the domain. The parallel computations of the whole run share a
+        persistent pool of processes, whose workers keep a copy of the GP model that is updated
+        with the new points (see Parallel.pool and Parallel.share_state). If shared_memory is
+        True, the large arrays (e.g. discretizations and Cholesky factors) are sent to the workers
+        through memory-mapped files.
+
+        If n_in_flight > 0, the evaluations of the objective run in the background while the
+        next points are chosen: the model uses the posterior mean as the value of the points whose
+        evaluation is still running, and it's replaced by the true value when the evaluation
+        finishes.
+
+        See _optimize for the description of the other parameters.
+
+        :param n_in_flight: (int) maximum number of evaluations of the objective running in the
+            background. If it's 0, the objective is evaluated sequentially.
+        :param deterministic_order: (boolean) If True, the evaluations are added to the model in
+            the order in which they were submitted, so the run doesn't depend on their durations.
+            Otherwise, they're added as soon as they finish.
+        :param checkpoint: (boolean) If True, the state of the run is written to
+            self.checkpoint_path after each iteration: the data, parameters, samples of the
+            parameters and cached decompositions of the GP model, the position of the chain, the
+            results of the objective, the last solutions of the posterior mean and the state of
+            the random number generator.
+        :param resume: (boolean) If True and there is a checkpoint, the run continues from the
+            iteration where the checkpoint was written, without fitting the model again.
+        :param shared_memory: (boolean) If True, the large arrays are sent to the workers of the
+            pool through memory-mapped files instead of being pickled.
+
+        :return: Objective
+        """
+
+        if n_in_flight > 0 and batch_size > 1:
+            raise ValueError("Evaluations in the background (n_in_flight > 0) can't be combined "
+                             "with batches of points (batch_size > 1)")
+
+        if n_in_flight > 0 and (checkpoint or resume):
+            raise ValueError("Evaluations in the background (n_in_flight > 0) can't be combined "
+                             "with checkpoints")
+
+        if n_in_flight > 0:
+            self.evaluations_queue = AsyncEvaluations(n_in_flight, deterministic_order)
+            self.solutions_queue = AsyncEvaluations(1)
+
+        try:
+            return self._optimize_with_pool(
+                shared_memory=shared_memory, random_seed=random_seed, start=start, debug=debug, monte_carlo_sbo=monte_carlo_sbo,
+                n_samples_mc=n_samples_mc, n_restarts_mc=n_restarts_mc,
+                n_best_restarts_mc=n_best_restarts_mc, n_restarts=n_restarts,
+                n_best_restarts=n_best_restarts, n_samples_parameters=n_samples_parameters,
+                n_restarts_mean=n_restarts_mean, n_best_restarts_mean=n_best_restarts_mean,
+                method_opt_mc=method_opt_mc, maxepoch=maxepoch,
+                n_samples_parameters_mean=n_samples_parameters_mean, maxepoch_mean=maxepoch_mean,
+                threshold_sbo=threshold_sbo,
+                optimize_only_posterior_mean=optimize_only_posterior_mean,
+                start_optimize_posterior_mean=start_optimize_posterior_mean,
+                warm_start_chain=warm_start_chain, batch_size=batch_size, checkpoint=checkpoint,
+                resume=resume, **opt_params_mc)
+        finally:
+            for queue in [self.evaluations_queue, self.solutions_queue]:
+                if queue is not None:
+                    queue.close(terminate=True)
+            self.evaluations_queue = None
+            self.solutions_queue = None
+            GPFittingService.close_journals()
+
+    def _optimize_with_pool(self, shared_memory=False, **kwargs):
+        """
+        Runs _optimize in the persistent pool of processes if self.parallel is True.
+
+        :param shared_memory: (boolean) If True, the large arrays are sent to the workers through
+            memory-mapped files (see Parallel.pool).
+        :param kwargs: arguments of _optimize
+        :return: Objective
+        """
+
+        if not self.parallel:
+            return self._optimize(**kwargs)
+
+        with Parallel.pool(shared_memory=shared_memory):
+            Parallel.share_state(self.gp_model)
+            return self._optimize(**kwargs)
+
+    def _optimize(self, random_seed=None, start=None, debug=False, monte_carlo_sbo=False,
+                  n_samples_mc=1, n_restarts_mc=1, n_best_restarts_mc=0,
+                  n_restarts=10, n_best_restarts=0, n_samples_parameters=0, n_restarts_mean=1000,
+                  n_best_restarts_mean=100, method_opt_mc=None, maxepoch=10,
+                  n_samples_parameters_mean=0, maxepoch_mean=20, threshold_sbo=None,
+                  optimize_only_posterior_mean=False, start_optimize_posterior_mean=0,
+                  warm_start_chain=False, batch_size=1, checkpoint=False, resume=False,
+                  **opt_params_mc):
+        """
         Optimize objective over the domain.
         :param random_seed: int
         :param start: (np.array(n)) starting point for the optimization of VOI
@@ -197,6 +314,15 @@ class BGO(object):
         :param maxepoch_mean: (int)
         :param threshold_sbo: (float) If VOI < threshold_sbo, then we choose randomly a point
             instead.
+        :param warm_start_chain: (boolean) If True, the samples of the parameters of the model
+            are reweighted and rejuvenated after each new point instead of starting a new chain,
+            which is only started when their effective sample size collapses (see
+            GPFittingGaussian.update_chain).
+        :param batch_size: (int) Number of points chosen at each iteration (see
+            optimize_batch of the acquisition functions). Their evaluations run in parallel if
+            self.parallel is True, and they're added to the model together.
+        :param checkpoint: (boolean) See optimize.
+        :param resume: (boolean) See optimize.
         :param opt_params_mc:
             -'factr': int
             -'maxiter': int
@@ -204,6 +330,8 @@ class BGO(object):
         :return: Objective
         """
 
+        self.gp_model.warm_start_chain = warm_start_chain
+
         if optimize_only_posterior_mean:
             # only for noisless problems
             chosen_points = self.gp_model.data.copy()
@@ -254,36 +382,56 @@ class BGO(object):
         else:
             method_opt_mu = DOGLEG
 
-        if self.method_optimization == SDE_METHOD:
-            optimize_mean = self.acquisition_function.optimize_mean(
-                n_restarts=n_restarts_mean,
-                candidate_solutions=self.objective.evaluated_points,
-                candidate_values=self.objective.objective_values)
+        state = None
+        if resume:
+            state = self._restore_checkpoint()
+
+        if state is not None:
+            start_iteration = state['iteration']
+            optimize_mean = state['optimize_mean']
+            optimal_value = state['optimal_value']
         else:
-            optimize_mean = model.optimize_posterior_mean(
-                minimize=self.minimize, n_restarts=n_restarts_mean,
-                n_best_restarts=n_best_restarts_mean,
-                n_samples_parameters=n_samples_parameters_mean,
-                start_new_chain=True, method_opt=method_opt_mu, maxepoch=maxepoch_mean,
-                candidate_solutions=self.objective.evaluated_points,
-                candidate_values=self.objective.objective_values)
-
-        optimal_value = \
-            self.objective.add_point(optimize_mean['solution'], optimize_mean['optimal_value'][0])
-
-        model.write_debug_data(self.problem_name, self.name_model, self.training_name,
-                               self.n_training, self.random_seed, self.method_optimization,
-                               n_samples_parameters)
-
-        if debug:
-            model.generate_evaluations(
-                self.problem_name, self.name_model, self.training_name, self.n_training,
-                self.random_seed, 0, n_points_by_dimension=self.number_points_each_dimension_debug)
-
-        for iteration in xrange(self.n_iterations):
+            start_iteration = 0
+
+            if self.method_optimization == SDE_METHOD:
+                optimize_mean = self.acquisition_function.optimize_mean(
+                    n_restarts=n_restarts_mean,
+                    candidate_solutions=self.objective.evaluated_points,
+                    candidate_values=self.objective.objective_values)
+            else:
+                optimize_mean = model.optimize_posterior_mean(
+                    minimize=self.minimize, n_restarts=n_restarts_mean,
+                    n_best_restarts=n_best_restarts_mean,
+                    n_samples_parameters=n_samples_parameters_mean,
+                    start_new_chain=True, method_opt=method_opt_mu, maxepoch=maxepoch_mean,
+                    candidate_solutions=self.objective.evaluated_points,
+                    candidate_values=self.objective.objective_values)
+
+            optimal_value = self._add_solution(optimize_mean)
+
+            model.write_debug_data(self.problem_name, self.name_model, self.training_name,
+                                   self.n_training, self.random_seed, self.method_optimization,
+                                   n_samples_parameters)
+
+            if debug:
+                model.generate_evaluations(
+                    self.problem_name, self.name_model, self.training_name, self.n_training,
+                    self.random_seed, 0,
+                    n_points_by_dimension=self.number_points_each_dimension_debug)
+
+            if checkpoint:
+                self._write_checkpoint(0, optimize_mean, optimal_value)
+
+        if batch_size > 1:
+            optimize_acquisition = \
+                lambda **kwargs: self.acquisition_function.optimize_batch(batch_size, **kwargs)
+        else:
+            optimize_acquisition = self.acquisition_function.optimize
+
+        for iteration in xrange(start_iteration, self.n_iterations):
             evaluation = None
             if not optimize_only_posterior_mean or iteration >= total_points:
-                new_point_sol = self.acquisition_function.optimize(
+                new_point_sol = optimize_acquisition(
                     parallel=self.parallel, start=start, monte_carlo=monte_carlo_sbo,
                     n_samples=n_samples_mc, n_restarts_mc=n_restarts_mc,
                     n_best_restarts_mc=n_best_restarts_mc, n_restarts=n_restarts,
@@ -318,19 +466,27 @@ class BGO(object):
 
             self.acquisition_function.clean_cache()
 
-            if evaluation is None:
-                evaluation = TrainingDataService.evaluate_function(self.objective.module, new_point,
-                                                                   self.n_samples)
+            if evaluation is None and batch_size > 1:
+                self._evaluate_batch(new_point)
+            elif evaluation is None and self.evaluations_queue is not None:
+                self._submit_evaluation(new_point)
+                if iteration == self.n_iterations - 1:
+                    self._collect_evaluations(block=True)
+            else:
+                if evaluation is None:
+                    evaluation = TrainingDataService.evaluate_function(self.objective.module,
+                                                                       new_point, self.n_samples)
 
-            if self.objective.noise:
-                noise = np.array([evaluation[1]])
+                if self.objective.noise:
+                    noise = np.array([evaluation[1]])
 
-            self.gp_model.add_points_evaluations(new_point.reshape((1, len(new_point))),
-                                                 np.array([evaluation[0]]),
-                                                 var_noise_eval=noise)
+                self.gp_model.add_points_evaluations(new_point.reshape((1, len(new_point))),
+                                                     np.array([evaluation[0]]),
+                                                     var_noise_eval=noise)
 
-            GPFittingService.write_gp_model(self.gp_model, method=self.method_optimization,
-                                            n_samples_parameters=n_samples_parameters)
+            if self.evaluations_queue is None or self.evaluations_queue.n_pending == 0:
+                GPFittingService.write_gp_model(self.gp_model, method=self.method_optimization,
+                                                n_samples_parameters=n_samples_parameters)
 
             if self.method_optimization == SDE_METHOD:
                 optimize_mean = self.acquisition_function.optimize_mean(
@@ -347,9 +503,7 @@ class BGO(object):
                     candidate_values=self.objective.objective_values
                 )
 
-            optimal_value = \
-                self.objective.add_point(optimize_mean['solution'],
-                                         optimize_mean['optimal_value'][0])
+            optimal_value = self._add_solution(optimize_mean, optimal_value)
 
             model.write_debug_data(self.problem_name, self.name_model, self.training_name,
                                    self.n_training, self.random_seed, self.method_optimization,
@@ -361,12 +515,316 @@ class BGO(object):
                     self.random_seed, iteration + 1,
                     n_points_by_dimension=self.number_points_each_dimension_debug)
 
+            if checkpoint:
+                self._write_checkpoint(iteration + 1, optimize_mean, optimal_value)
+
+        if self.solutions_queue is not None:
+            optimal_value = self._collect_solutions(optimal_value, block=True)
+
+        self.objective.compact()
+
         return {
             'optimal_solution': optimize_mean['solution'],
             'optimal_value': optimal_value,
 
         }
 
+    def _write_checkpoint(self, iteration, optimize_mean, optimal_value):
+        """
+        Writes the state of the run after the given number of iterations to
+        self.checkpoint_path (see optimize).
+
+        :param iteration: (int) number of iterations done
+        :param optimize_mean: {'solution': np.array(n), 'optimal_value': [float]}, last solution
+            of the posterior mean
+        :param optimal_value: (float) value of the last solution added to the objective
+        """
+
+        content_gp, arrays_gp = self.gp_model.serialize_arrays(cached_factors=True)
+        arrays = dict(('gp_' + name, value) for name, value in arrays_gp.iteritems())
+
+        random_state = np.random.get_state()
+        arrays['random_state'] = random_state[1]
+
+        quadrature = None
+        if self.quadrature is not None:
+            quadrature = {
+                'optimal_solutions': [
+                    [self._key_to_list(key),
+                     [[list(solution['solution']), list(solution['optimal_value'])]
+                      for solution in solutions]]
+                    for key, solutions in self.quadrature.optimal_solutions.iteritems()],
+                'max_mean': [[self._key_to_list(key), value] for key, value in
+                             self.quadrature.max_mean.iteritems()],
+            }
+
+        content = {
+            'iteration': iteration,
+            'gp_model': content_gp,
+            'chain_n_points': self.gp_model.chain_n_points,
+            'objective': self.objective.serialize(),
+            'optimize_mean': {
+                'solution': list(optimize_mean['solution']),
+                'optimal_value': list(optimize_mean['optimal_value']),
+            },
+            'optimal_value': optimal_value,
+            'random_state': [random_state[0], random_state[2], random_state[3], random_state[4]],
+            'quadrature': quadrature,
+        }
+
+        NPYFile.write(content, arrays, self.checkpoint_path)
+
+    @staticmethod
+    def _get_checkpoint_path(file_path):
+        """
+        Path of the checkpoint of a run (see _write_checkpoint).
+
+        :param file_path: (str) path of the results of the objective
+        :return: str
+        """
+        return path.splitext(file_path)[0] + CHECKPOINT_SUFFIX
+
+    @classmethod
+    def _read_checkpoint_gp_model(cls, spec):
+        """
+        Builds the GP model of the checkpoint of the run defined by the spec, so the model isn't
+        trained again when the run is resumed. The rest of the state is restored by
+        _restore_checkpoint.
+
+        :param spec: RunSpecEntity
+        :return: GP model instance, or None if there is no checkpoint
+        """
+        file_path = Objective.get_file_path(
+            spec.get('problem_name'), spec.get('training_name'), spec.get('random_seed'),
+            spec.get('n_training'), spec.get('method_optimization'),
+            spec.get('n_samples_parameters', 0))
+
+        data = NPYFile.read(cls._get_checkpoint_path(file_path))
+
+        if data is None:
+            return None
+
+        content, arrays = data
+
+        logger.info("Reading GP model from the checkpoint")
+
+        arrays_gp = dict((name[len('gp_'):], value) for name, value in arrays.iteritems()
+                         if name.startswith('gp_'))
+        model_type = GPFittingService._model_map[spec.get('name_model')]
+        gp_model = model_type.deserialize_arrays(content['gp_model'], arrays_gp,
+                                                 use_only_training_points=False)
+        gp_model.chain_n_points = content['chain_n_points']
+
+        return gp_model
+
+    def _restore_checkpoint(self):
+        """
+        Restores the state written by _write_checkpoint. The GP model is modified in place,
+        because the acquisition function, the quadrature and the workers of the pool of
+        processes refer to it.
+
+        :return: {'iteration': int, 'optimize_mean': {'solution': np.array(n),
+            'optimal_value': [float]}, 'optimal_value': float}, or None if there is no checkpoint
+        """
+
+        data = NPYFile.read(self.checkpoint_path)
+
+        if data is None:
+            return None
+
+        content, arrays = data
+
+        arrays_gp = dict((name[len('gp_'):], value) for name, value in arrays.iteritems()
+                         if name.startswith('gp_'))
+        self.gp_model.load_arrays(content['gp_model'], arrays_gp)
+        self.gp_model.chain_n_points = content['chain_n_points']
+
+        self.acquisition_function.clean_cache(keep_factors=True)
+
+        if content['quadrature'] is not None:
+            self.quadrature.optimal_solutions = dict(
+                (self._list_to_key(key),
+                 [{'solution': np.array(solution), 'optimal_value': value}
+                  for solution, value in solutions])
+                for key, solutions in content['quadrature']['optimal_solutions'])
+            self.quadrature.max_mean = dict(
+                (self._list_to_key(key), value) for key, value in
+                content['quadrature']['max_mean'])
+
+        objective = content['objective']
+        self.objective.evaluated_points = objective['evaluated_points']
+        self.objective.objective_values = objective['objective_values']
+        self.objective.model_objective_values = objective['model_objective_values']
+        self.objective.standard_deviation_evaluations = \
+            objective['standard_deviation_evaluations']
+        self.objective.compact()
+
+        random_state = content['random_state']
+        np.random.set_state((str(random_state[0]), np.array(arrays['random_state']),
+                             random_state[1], random_state[2], random_state[3]))
+
+        logger.info("Resuming from iteration %d" % content['iteration'])
+
+        return {
+            'iteration': content['iteration'],
+            'optimize_mean': {
+                'solution': np.array(content['optimize_mean']['solution']),
+                'optimal_value': content['optimize_mean']['optimal_value'],
+            },
+            'optimal_value': content['optimal_value'],
+        }
+
+    @staticmethod
+    def _key_to_list(key):
+        """
+        Converts a key of the caches of the quadrature, (var_noise, mean, parameters_kernel) or
+        a string, so it can be written as JSON.
+
+        :param key: tuple or str
+        :return: list or str
+        """
+        if isinstance(key, tuple):
+            return [key[0], key[1], list(key[2])]
+        return key
+
+    @staticmethod
+    def _list_to_key(key):
+        """
+        Inverse of _key_to_list.
+
+        :param key: list or str
+        :return: tuple or str
+        """
+        if isinstance(key, list):
+            return (key[0], key[1], tuple(key[2]))
+        return key
+
+    def _evaluate_batch(self, points):
+        """
+        Evaluates the objective at a batch of points, in parallel if self.parallel is True, and
+        adds them to the model.
+
+        :param points: np.array(qxn)
+        """
+
+        arguments = convert_list_to_dictionary([list(point) for point in points])
+
+        evaluations = Parallel.run_function_different_arguments_parallel(
+            wrapper_evaluate_objective_function, arguments, all_success=True,
+            parallel=self.parallel, cls_=TrainingDataService,
+            name_module=self.objective.name_module, n_samples=self.n_samples)
+        evaluations = convert_dictionary_to_list(evaluations)
+
+        noise = None
+        if self.objective.noise:
+            noise = np.array([evaluation[1] for evaluation in evaluations])
+
+        self.gp_model.add_points_evaluations(
+            points, np.array([evaluation[0] for evaluation in evaluations]), var_noise_eval=noise)
+
+    def _submit_evaluation(self, new_point):
+        """
+        Starts the evaluation of the objective at new_point in the background, and adds the point
+        to the model with the posterior mean as its value (kriging believer). Adding this value
+        doesn't change the posterior mean, but it reduces the variance around new_point, so the
+        next points chosen are different. If there are already n_in_flight running evaluations,
+        it waits until one of them finishes.
+
+        :param new_point: np.array(n)
+        """
+
+        self._collect_evaluations(block=False)
+        if self.evaluations_queue.n_pending >= self.evaluations_queue.n_in_flight:
+            self._add_evaluation(self.evaluations_queue.next_result())
+
+        point = new_point.reshape((1, len(new_point)))
+        believed_value = self.gp_model.compute_posterior_parameters(point, only_mean=True)['mean']
+
+        noise = None
+        if self.objective.noise:
+            noise = np.array([np.mean(self.gp_model.data['var_noise'])])
+
+        index = self.gp_model.data['points'].shape[0]
+        self.gp_model.add_points_evaluations(point, believed_value, var_noise_eval=noise)
+
+        self.evaluations_queue.submit(
+            index, wrapper_evaluate_objective_function, list(new_point), TrainingDataService,
+            self.objective.name_module, self.n_samples)
+
+    def _collect_evaluations(self, block=False):
+        """
+        Replaces the believed values of the points whose evaluation finished by their true
+        values.
+
+        :param block: (boolean) If True, waits for all the running evaluations.
+        """
+
+        result = self.evaluations_queue.next_result(block=block)
+        while result is not None:
+            self._add_evaluation(result)
+            result = self.evaluations_queue.next_result(block=block)
+
+    def _add_evaluation(self, result):
+        """
+        Replaces the believed value of a point by its true value.
+
+        :param result: (int, [float]) index of the point in the data of the model, and output of
+            TrainingDataService.evaluate_function
+        """
+
+        index, evaluation = result
+
+        noise = None
+        if self.objective.noise:
+            noise = np.array([evaluation[1]])
+
+        self.gp_model.replace_evaluations(np.array([index]), np.array([evaluation[0]]),
+                                          var_noise_eval=noise)
+        self.acquisition_function.clean_cache()
+
+    def _add_solution(self, optimize_mean, optimal_value=None):
+        """
+        Adds the solution of the optimization of the posterior mean to the objective. If
+        self.solutions_queue is not None, the objective is evaluated at the solution in the
+        background, and only the solutions whose evaluation already finished are added.
+
+        :param optimize_mean: {'solution': np.array(n), 'optimal_value': [float]}
+        :param optimal_value: (float) value of the last solution added to the objective
+        :return: (float) value of the last solution added to the objective
+        """
+
+        if self.solutions_queue is None:
+            return self.objective.add_point(optimize_mean['solution'],
+                                            optimize_mean['optimal_value'][0])
+
+        solution = optimize_mean['solution']
+        key = (self.solutions_queue.n_submitted, tuple(solution),
+               float(optimize_mean['optimal_value'][0]))
+        self.solutions_queue.submit(
+            key, wrapper_evaluate_main_objective, list(solution), Objective,
+            self.objective.name_module, self.objective.n_samples)
+
+        return self._collect_solutions(optimal_value, block=False)
+
+    def _collect_solutions(self, optimal_value, block=False):
+        """
+        Adds to the objective the solutions whose evaluation finished, in the order in which they
+        were found.
+
+        :param optimal_value: (float) value of the last solution added to the objective
+        :param block: (boolean) If True, waits for all the running evaluations.
+        :return: (float) value of the last solution added to the objective
+        """
+
+        result = self.solutions_queue.next_result(block=block)
+        while result is not None:
+            (_, solution, model_value), evaluation = result
+            optimal_value = self.objective.add_point(np.array(solution), model_value,
+                                                     evaluation=evaluation)
+            result = self.solutions_queue.next_result(block=block)
+
+        return optimal_value
+
     @classmethod
     def run_spec(cls, spec):
         """
@@ -411,6 +869,13 @@ class BGO(object):
 
         optimize_only_posterior_mean = spec.get('optimize_only_posterior_mean', False)
         start_optimize_posterior_mean = spec.get('start_optimize_posterior_mean', 0)
+        warm_start_chain = spec.get('warm_start_chain', False)
+        n_in_flight = spec.get('n_in_flight', 0)
+        deterministic_order = spec.get('deterministic_order', True)
+        batch_size = spec.get('batch_size', 1)
+        checkpoint = spec.get('checkpoint', False)
+        resume = spec.get('resume', False)
+        shared_memory = spec.get('shared_memory', False)
 
         # WE CAN STILL ADD THE DOMAIN IF NEEDED FOR THE KG
         result = bgo.optimize(debug=debug, n_samples_mc=n_samples_mc, n_restarts_mc=n_restarts_mc,
@@ -426,5 +891,9 @@ class BGO(object):
                               maxepoch=maxepoch, threshold_sbo=threshold_sbo,
                               optimize_only_posterior_mean=optimize_only_posterior_mean,
                               start_optimize_posterior_mean=start_optimize_posterior_mean,
+                              warm_start_chain=warm_start_chain, n_in_flight=n_in_flight,
+                              deterministic_order=deterministic_order,
+                              batch_size=batch_size, checkpoint=checkpoint, resume=resume,
+                              shared_memory=shared_memory,
                               **opt_params_mc)
         return result
@@ -2,10 +2,18 @@ from __future__ import absolute_import
 
 from os import path
 import os
+from collections import OrderedDict
 
 from stratified_bayesian_optimization.initializers.log import SBOLog
-from stratified_bayesian_optimization.lib.constant import GP_DIR
+from stratified_bayesian_optimization.lib.constant import (
+    GP_DIR,
+    JOURNAL_COMPACTION_INTERVAL,
+    NPY_MODEL_SUFFIX,
+    MAX_OPEN_JOURNALS,
+)
 from stratified_bayesian_optimization.util.json_file import JSONFile
+from stratified_bayesian_optimization.util.json_journal import JSONJournal
+from stratified_bayesian_optimization.util.npy_file import NPYFile
 from stratified_bayesian_optimization.models.gp_fitting_gaussian import GPFittingGaussian
 from stratified_bayesian_optimization.services.training_data import TrainingDataService
 from stratified_bayesian_optimization.lib.constant import DEFAULT_RANDOM_SEED, SBO_METHOD
@@ -22,6 +30,11 @@ class GPFittingService(object):
         'gp_fitting_gaussian': GPFittingGaussian,
     }
 
+    # Journals of the models written by write_gp_model, and the state of each model when it was
+    # last written: {gp_path: (JSONJournal, state)}, from the least to the most recently written.
+    # See _journal_state.
+    _journals = OrderedDict()
+
     @classmethod
     def from_dict(cls, spec):
         """
@@ -58,6 +71,7 @@ class GPFittingService(object):
             'optimization_method': spec.get('method_optimization'),
             'n_samples_parameters': spec.get('n_samples_parameters', 0),
             'parallel_training': spec.get('parallel_training', True),
+            'n_chains': spec.get('n_chains', 1),
         }
 
         return cls.get_gp(**entry)
@@ -122,7 +136,7 @@ class GPFittingService(object):
                n_samples=None, random_seed=DEFAULT_RANDOM_SEED, kernel_values=None, mean_value=None,
                var_noise_value=None, cache=True, same_correlation=False,
                use_only_training_points=True, optimization_method=None, n_samples_parameters=0,
-               parallel_training=True):
+               parallel_training=True, n_chains=1):
         """
         Fetch a GP model from file if it exists, otherwise train a new model and save it locally.
 
@@ -155,7 +169,7 @@ class GPFittingService(object):
         :param kernel_values: [float], contains the default values of the parameters of the kernel
         :param mean_value: [float], It contains the value of the mean parameter.
         :param var_noise_value: [float], It contains the variance of the noise of the model
-        :param cache: (boolean) Try to get model from cache
+        :param cache: (boolean) Try to get the training data from cache
         :param same_correlation: (boolean) If true, it uses the same correlations for the task
             kernel.
         :param use_only_training_points (boolean) If the model is read, and the param is true,
@@ -164,6 +178,7 @@ class GPFittingService(object):
         :param optimization_method: (str)
         :param n_samples_parameters: (int)
         :param parallel_training: (boolean)
+        :param n_chains: (int) Number of chains of the MCMC.
 
         :return: (GPFittingGaussian) - An instance of GPFittingGaussian
         """
@@ -192,14 +207,7 @@ class GPFittingService(object):
 
         gp_path_cache = path.join(gp_dir, f_name_cache)
 
-        if cache:
-            data = JSONFile.read(gp_path)
-            data = None
-        else:
-            data = None
-
-        if data is not None:
-            return model_type.deserialize(data, use_only_training_points=use_only_training_points)
+        # The saved model isn't used: the model is always trained again, so it isn't read.
 
         if training_data is None or training_data == {}:
             training_data = TrainingDataService.get_training_data(problem_name, training_name,
@@ -222,9 +230,11 @@ class GPFittingService(object):
                                     type_bounds=type_bounds, training_name=training_name,
                                     problem_name=problem_name, kernel_values=kernel_values,
                                     mean_value=mean_value, var_noise_value=var_noise_value,
-                                    same_correlation=same_correlation)
+                                    same_correlation=same_correlation, n_chains=n_chains)
 
         JSONFile.write(gp_model.serialize(), gp_path)
+        journal, _ = cls._journals.pop(gp_path, (JSONJournal(gp_path), None))
+        journal.remove()
 
         return gp_model
 
@@ -232,7 +242,12 @@ class GPFittingService(object):
     def write_gp_model(cls, gp_model, method=SBO_METHOD, n_samples_parameters=0,
                        name_model='gp_fitting_gaussian'):
         """
-        Write the gp_model after new points are added.
+        Write the gp_model after new points are added. If the model was written before and it only
+        gained points and samples of its parameters since then, only those are appended to the
+        journal of the file. The whole model is written when the journal is compacted, every
+        JOURNAL_COMPACTION_INTERVAL writes. See read_gp_model.
+
+        At most MAX_OPEN_JOURNALS journals are kept open; see close_journals.
 
         :param gp_model: gp model instance
         :param method: (str)
@@ -252,4 +267,195 @@ class GPFittingService(object):
 
         gp_path = path.join(gp_dir, f_name)
 
-        JSONFile.write(gp_model.serialize(), gp_path)
+        journal, state = cls._journals.pop(gp_path, (None, None))
+        if journal is None:
+            journal = JSONJournal(gp_path)
+
+        record = None
+        if state is not None and journal.n_records < JOURNAL_COMPACTION_INTERVAL:
+            record = cls._journal_record(gp_model, state)
+
+        if record is None:
+            journal.compact(gp_model.serialize())
+        else:
+            journal.append(record)
+
+        cls._journals[gp_path] = (journal, cls._journal_state(gp_model))
+
+        while len(cls._journals) > MAX_OPEN_JOURNALS:
+            journal, state = cls._journals.popitem(last=False)[1]
+            journal.close()
+
+    @classmethod
+    def close_journals(cls):
+        """
+        Closes the journals of the models written by write_gp_model. The next write of each model
+        compacts its journal.
+        """
+        for journal, state in cls._journals.itervalues():
+            journal.close()
+        cls._journals = OrderedDict()
+
+    @staticmethod
+    def _journal_state(gp_model):
+        """
+        State of the model used to compute the records of its journal.
+
+        :param gp_model: GPFittingGaussian
+        :return: (id of the model, number of points, number of samples of the parameters, last
+            sample of the parameters, number of edits of the data)
+        """
+        last_sample = None
+        if len(gp_model.samples_parameters) > 0:
+            last_sample = list(gp_model.samples_parameters[-1])
+
+        return (id(gp_model), gp_model.data['points'].shape[0],
+                len(gp_model.samples_parameters), last_sample, gp_model.n_edits_data)
+
+    @classmethod
+    def _journal_record(cls, gp_model, state):
+        """
+        Computes the changes of the model since it had the given state.
+
+        :param gp_model: GPFittingGaussian
+        :param state: output of _journal_state
+        :return: dict, or None if the model changed in another way than gaining points and
+            samples of its parameters.
+        """
+        model_id, n_points, n_samples, last_sample, n_edits_data = state
+
+        if model_id != id(gp_model) or n_edits_data != gp_model.n_edits_data or \
+                gp_model.data['points'].shape[0] < n_points or \
+                len(gp_model.samples_parameters) < n_samples:
+            return None
+
+        if n_samples > 0 and list(gp_model.samples_parameters[n_samples - 1]) != last_sample:
+            return None
+
+        var_noise = []
+        if gp_model.data['var_noise'] is not None:
+            var_noise = list(gp_model.data['var_noise'][n_points:])
+
+        return {
+            'n_points': n_points,
+            'points': [list(point) for point in gp_model.data['points'][n_points:, :]],
+            'evaluations': list(gp_model.data['evaluations'][n_points:]),
+            'var_noise': var_noise,
+            'n_samples_parameters': n_samples,
+            'samples_parameters': [list(sample) for sample in
+                                   gp_model.samples_parameters[n_samples:]],
+            'kernel_values': list(gp_model.kernel_values),
+            'mean_value': list(gp_model.mean_value),
+            'var_noise_value': list(gp_model.var_noise_value),
+            'start_point_sampler': list(gp_model.start_point_sampler),
+        }
+
+    @staticmethod
+    def _apply_record(data, record):
+        """
+        Applies a record of the journal to a serialized model.
+
+        :param data: (dict) serialized model, or None
+        :param record: (dict) output of _journal_record
+        :return: dict
+        """
+        # The journal can't be applied without the file, and the record may be already in the
+        # file if the process died while compacting.
+        if data is None or record['n_points'] != len(data['data']['evaluations']) or \
+                record['n_samples_parameters'] != len(data['samples_parameters']):
+            return data
+
+        data['data']['points'].extend(record['points'])
+        data['data']['evaluations'].extend(record['evaluations'])
+        data['data']['var_noise'].extend(record['var_noise'])
+        data['samples_parameters'].extend(record['samples_parameters'])
+
+        for name in ['kernel_values', 'mean_value', 'var_noise_value', 'start_point_sampler']:
+            data[name] = record[name]
+
+        return data
+
+    @classmethod
+    def _get_path_arrays(cls, model_type, problem_name, type_kernel, training_name, method,
+                         n_samples_parameters):
+        """
+        Path of the directory where write_gp_model_arrays saves the model. It's the path of the
+        file of write_gp_model, with NPY_MODEL_SUFFIX instead of .json.
+
+        :return: str
+        """
+        f_name = cls._get_filename_modified(model_type, problem_name, type_kernel, training_name,
+                                            method, n_samples_parameters)
+        f_name = path.splitext(f_name)[0] + NPY_MODEL_SUFFIX
+
+        return path.join(GP_DIR, problem_name, f_name)
+
+    @classmethod
+    def write_gp_model_arrays(cls, gp_model, method=SBO_METHOD, n_samples_parameters=0,
+                              name_model='gp_fitting_gaussian', cached_factors=False):
+        """
+        Write the gp_model as .npy blocks with a JSON header (see NPYFile), instead of converting
+        its arrays to lists as write_gp_model does.
+
+        :param gp_model: gp model instance
+        :param method: (str)
+        :param n_samples_parameters: int
+        :param name_model: (str)
+        :param cached_factors: (boolean) If True, the cached Cholesky decompositions are written
+            too, so they're not computed again when the model is read.
+        :return: (str) path of the directory
+        """
+        model_type = cls._model_map[name_model]
+
+        gp_dir = path.join(GP_DIR, gp_model.problem_name)
+
+        if not os.path.exists(gp_dir):
+            os.mkdir(gp_dir)
+
+        directory = cls._get_path_arrays(model_type, gp_model.problem_name, gp_model.type_kernel,
+                                         gp_model.training_name, method, n_samples_parameters)
+
+        content, arrays = gp_model.serialize_arrays(cached_factors=cached_factors)
+        NPYFile.write(content, arrays, directory)
+
+        return directory
+
+    @classmethod
+    def read_gp_model_arrays(cls, problem_name, type_kernel, training_name, method=SBO_METHOD,
+                             n_samples_parameters=0, name_model='gp_fitting_gaussian',
+                             mmap_mode='c'):
+        """
+        Read a model written by write_gp_model_arrays.
+
+        :param problem_name: str
+        :param type_kernel: [(str)]
+        :param training_name: (str)
+        :param method: (str)
+        :param n_samples_parameters: int
+        :param name_model: (str)
+        :param mmap_mode: (str) see NPYFile.read. If it's None, the arrays are loaded into memory.
+        :return: (GPFittingGaussian) or None if it wasn't written
+        """
+        model_type = cls._model_map[name_model]
+
+        directory = cls._get_path_arrays(model_type, problem_name, type_kernel, training_name,
+                                         method, n_samples_parameters)
+
+        data = NPYFile.read(directory, mmap_mode=mmap_mode)
+
+        if data is None:
+            return None
+
+        content, arrays = data
+
+        return model_type.deserialize_arrays(content, arrays, use_only_training_points=False)
+
+    @classmethod
+    def read_gp_model(cls, gp_path):
+        """
+        Reads a model written by write_gp_model: the file plus the records of its journal.
+
+        :param gp_path: str
+        :return: (dict) serialized model, or None if the file doesn't exist
+        """
+        return JSONJournal.read(gp_path, cls._apply_record)
@@ -7,6 +7,7 @@ import numpy as np
 
 from stratified_bayesian_optimization.initializers.log import SBOLog
 from stratified_bayesian_optimization.entities.run_spec import RunSpecEntity
+from stratified_bayesian_optimization.entities.objective import Objective
 from stratified_bayesian_optimization.util.json_file import JSONFile
 from stratified_bayesian_optimization.lib.constant import (
     DEFAULT_RANDOM_SEED,
@@ -1023,7 +1024,7 @@ class SpecService(object):
                 )
 
                 file_path = path.join(dir, file_name)
-                if not os.path.exists(file_path):
+                if Objective.read_results(file_path) is None:
                     continue
                 random_seeds[method].append(random_seed)
 
@@ -1063,10 +1064,11 @@ class SpecService(object):
 
             file_path = path.join(dir, file_name)
 
-            if not os.path.exists(file_path):
+            results = Objective.read_results(file_path)
+
+            if results is None:
                 continue
 
-            results = JSONFile.read(file_path)
             results = results['objective_values']
 
             key_dict = (problem_name, training_name, n_training, method)
@@ -13,12 +13,8 @@ from stratified_bayesian_optimization.lib.constant import (
 )
 from stratified_bayesian_optimization.util.json_file import JSONFile
 from stratified_bayesian_optimization.services.domain import DomainService
-from stratified_bayesian_optimization.lib.parallel import Parallel
-from stratified_bayesian_optimization.lib.util import (
-    wrapper_evaluate_objective_function,
-    convert_list_to_dictionary,
-    convert_dictionary_to_list,
-)
+from stratified_bayesian_optimization.lib.evaluation_queue import EvaluationQueue
+from stratified_bayesian_optimization.lib.util import wrapper_evaluate_objective_function
 
 logger = SBOLog(__name__)
 
@@ -56,8 +52,12 @@ class TrainingDataService(object):
     def get_training_data(cls, problem_name, training_name, bounds_domain, n_training=5,
                           points=None, noise=False, n_samples=None,
                           random_seed=DEFAULT_RANDOM_SEED, parallel=True, type_bounds=None,
-                          cache=True, gp_path_cache=None):
+                          cache=True, gp_path_cache=None, n_jobs=None):
         """
+        The evaluations run in a local queue (see EvaluationQueue). If cache is True, each
+        evaluation is saved in a journal as soon as it finishes, so if the process is interrupted,
+        only the missing points are evaluated when it's run again.
+
 
         :param problem_name: str
         :param training_name: (str), prefix used to save the training data.
@@ -74,6 +74,8 @@ class TrainingDataService(object):
         :param type_bounds: [0 or 1], 0 if the bounds are lower or upper bound of the respective
             entry, 1 if the bounds are all the finite options for that entry.
         :param cache: (boolean) Try to get model from cache
+        :param n_jobs: (int) maximum number of evaluations running at once. If it's None, the
+            number of cpus is used.
         :return: {'points': [[float]], 'evaluations': [float], 'var_noise': [float] or []}
         """
 
@@ -117,42 +119,34 @@ class TrainingDataService(object):
                                            problem_name, type_bounds)
 
         name_module = cls.get_name_module(problem_name)
-        module = __import__(name_module, globals(), locals(), -1)
-
-        training_data = {}
-        training_data['points'] = points
-        training_data['evaluations'] = []
-        training_data['var_noise'] = []
-
-        if not parallel:
-            for point in points:
-                if noise:
-                    evaluation = cls.evaluate_function(module, point, n_samples)
-                    training_data['var_noise'].append(evaluation[1])
-                else:
-                    evaluation = cls.evaluate_function(module, point)
-                training_data['evaluations'].append(evaluation[0])
-                JSONFile.write(training_data, training_path)
-            JSONFile.write(training_data, training_path)
-            return training_data
 
-        kwargs = {'name_module': name_module, 'cls_': cls, 'n_samples': n_samples}
-
-        arguments = convert_list_to_dictionary(points)
+        # The evaluations are journaled next to the training data, so they aren't lost if the
+        # process is interrupted.
+        filename_queue = None
+        if cache:
+            filename_queue = training_path
 
+        if not noise:
+            n_samples = None
 
-        training_points = Parallel.run_function_different_arguments_parallel(
-            wrapper_evaluate_objective_function, arguments, **kwargs)
+        queue = EvaluationQueue(filename_queue, n_jobs=n_jobs, parallel=parallel)
+        training_points = queue.evaluate(
+            wrapper_evaluate_objective_function, points, name_module=name_module, cls_=cls,
+            n_samples=n_samples)
 
-        training_points = convert_dictionary_to_list(training_points)
+        logger.info("Evaluations of the training data: %s" % str(queue.statistics()))
 
+        training_data = {}
+        training_data['points'] = points
         training_data['evaluations'] = [value[0] for value in training_points]
+        training_data['var_noise'] = []
 
         if noise:
             training_data['var_noise'] = [value[1] for value in training_points]
 
         if cache:
             JSONFile.write(training_data, training_path)
+            queue.remove_journal()
 
         return training_data
 
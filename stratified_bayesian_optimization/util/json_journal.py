@@ -0,0 +1,180 @@
+from __future__ import absolute_import
+
+import json
+import os
+from os import path
+
+import numpy as np
+
+from stratified_bayesian_optimization.initializers.log import SBOLog
+from stratified_bayesian_optimization.lib.constant import (
+    JOURNAL_SUFFIX,
+    JOURNAL_FSYNC_INTERVAL,
+)
+from stratified_bayesian_optimization.util.json_file import JSONFile
+
+logger = SBOLog(__name__)
+
+
+def _to_json(value):
+    """
+    Converts numpy values to lists or floats, so they can be written to the journal.
+    """
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError("%s can't be written to the journal" % str(type(value)))
+
+
+class JSONJournal(object):
+    """
+    Append-only journal of the changes of a JSON file, with one record per line. Appending a
+    record costs O(1), while rewriting the JSON file costs O(size of the file). The records are
+    flushed after every append, and synced to disk every fsync_interval records.
+
+    The JSON file is only rewritten when the journal is compacted. The current state is the JSON
+    file plus the records of the journal; if the process dies while writing a record, the
+    incomplete record is removed when the journal is read.
+    """
+
+    def __init__(self, filename, fsync_interval=JOURNAL_FSYNC_INTERVAL):
+        """
+        :param filename: (str) path of the JSON file. The journal is filename + JOURNAL_SUFFIX.
+        :param fsync_interval: (int)
+        """
+        self.filename = filename
+        self.journal_path = filename + JOURNAL_SUFFIX
+        self.fsync_interval = fsync_interval
+
+        # Number of records appended since the last compaction
+        self.n_records = 0
+        self.n_unsynced = 0
+        self.n_compactions = 0
+        self._file = None
+
+    def append(self, record):
+        """
+        Appends a record to the journal.
+
+        :param record: dict that can be converted to JSON
+        """
+        if self._file is None:
+            self._file = open(self.journal_path, 'a')
+
+        self._file.write(json.dumps(record, default=_to_json) + '\n')
+        self._file.flush()
+
+        self.n_records += 1
+        self.n_unsynced += 1
+
+        if self.n_unsynced >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """
+        Syncs the appended records to disk.
+        """
+        if self._file is not None and self.n_unsynced > 0:
+            os.fsync(self._file.fileno())
+        self.n_unsynced = 0
+
+    def close(self):
+        self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def compact(self, data):
+        """
+        Writes the current state to the JSON file and empties the journal. The JSON file is
+        replaced atomically, so if the process dies in the middle, either the old file and the
+        journal or the new file are left.
+
+        :param data: current state, i.e. the JSON file after applying all the records
+        """
+        self.close()
+
+        tmp_path = self.filename + '.tmp'
+        JSONFile.write(data, tmp_path)
+        os.rename(tmp_path, self.filename)
+
+        if path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+        self.n_records = 0
+        self.n_compactions += 1
+
+    def remove(self):
+        """
+        Removes the journal, e.g. when the JSON file is rewritten by other means.
+        """
+        self.close()
+
+        if path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+        self.n_records = 0
+
+    @staticmethod
+    def read_records(filename):
+        """
+        Reads the records of the journal of filename.
+
+        :param filename: (str) path of the JSON file
+        :return: [dict]
+        """
+        journal_path = filename + JOURNAL_SUFFIX
+        records = []
+
+        if not path.exists(journal_path):
+            return records
+
+        JSONJournal.truncate_incomplete_line(journal_path)
+
+        with open(journal_path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.info("Ignoring incomplete record of %s" % journal_path)
+
+        return records
+
+    @staticmethod
+    def truncate_incomplete_line(journal_path):
+        """
+        Removes the end of a journal after its last new line, i.e. the line that was being
+        written when the process died. Otherwise, the next line appended to the journal would
+        be joined to it.
+
+        :param journal_path: (str)
+        """
+        with open(journal_path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return
+
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == '\n':
+                return
+
+            f.seek(0)
+            f.truncate(f.read().rfind('\n') + 1)
+
+        logger.info("Removed the incomplete line of %s" % journal_path)
+
+    @classmethod
+    def read(cls, filename, apply_record):
+        """
+        Reads the current state: the JSON file plus the records of the journal.
+
+        :param filename: (str) path of the JSON file
+        :param apply_record: (function) apply_record(data, record) returns data after applying
+            the record. data is None if the JSON file doesn't exist.
+        :return: current state, or None if neither the file nor the journal exist
+        """
+        data = JSONFile.read(filename)
+
+        for record in cls.read_records(filename):
+            data = apply_record(data, record)
+
+        return data
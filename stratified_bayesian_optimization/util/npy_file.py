@@ -0,0 +1,124 @@
+from __future__ import absolute_import
+
+import json
+import os
+import shutil
+from os import path
+
+import numpy as np
+
+from stratified_bayesian_optimization.initializers.log import SBOLog
+from stratified_bayesian_optimization.lib.constant import NPY_HEADER_FILE
+
+logger = SBOLog(__name__)
+
+
+class NPYFile(object):
+    """
+    Directory with a small JSON header and one .npy file per array. Unlike JSONFile, the arrays
+    are neither converted to lists nor parsed when they're read, and they can be memory-mapped,
+    so only the parts that are used are loaded.
+
+    The header is written with json instead of ujson because ujson rounds the floats, and the
+    header may contain keys of caches that must match exactly.
+    """
+
+    @staticmethod
+    def read(directory, mmap_mode='c'):
+        """
+        Read the header and the arrays of directory, or return None. If a write was interrupted
+        while the directory was being replaced, the new directory (directory.tmp) is read if its
+        header is complete, and otherwise the previous one (directory.old).
+
+        :param directory: (str)
+        :param mmap_mode: (str) mmap_mode of np.load. By default the arrays are copy-on-write,
+            i.e. they can be modified in memory without modifying the files. If it's None, the
+            arrays are loaded into memory.
+        :return: (header, {name: np.array}) or None
+        """
+
+        for directory_ in [directory, directory + '.tmp', directory + '.old']:
+            header = NPYFile._read_header(directory_)
+            if header is not None:
+                break
+        else:
+            return None
+
+        logger.info('Loading %s' % directory_)
+
+        arrays = {}
+        for name in header['arrays']:
+            arrays[name] = np.load(path.join(directory_, name + '.npy'), mmap_mode=mmap_mode)
+
+        return header['content'], arrays
+
+    @staticmethod
+    def write(content, arrays, directory):
+        """
+        Write the header and the arrays into directory. The directory is replaced by renaming a
+        new one, so a reader never sees a header with the arrays of another write. The header is
+        written after the arrays, so a directory with a complete header is complete.
+
+        :param content: dict that can be converted to JSON
+        :param arrays: {str: np.array}
+        :param directory: str
+        """
+        tmp_directory = directory + '.tmp'
+        old_directory = directory + '.old'
+
+        NPYFile._recover(directory)
+
+        for name in [tmp_directory, old_directory]:
+            if path.exists(name):
+                shutil.rmtree(name)
+
+        os.mkdir(tmp_directory)
+
+        for name, array in arrays.iteritems():
+            np.save(path.join(tmp_directory, name + '.npy'), np.asarray(array))
+
+        with open(path.join(tmp_directory, NPY_HEADER_FILE), 'w') as f:
+            json.dump({'content': content, 'arrays': sorted(arrays.keys())}, f)
+
+        if path.exists(directory):
+            os.rename(directory, old_directory)
+        os.rename(tmp_directory, directory)
+
+        if path.exists(old_directory):
+            shutil.rmtree(old_directory)
+
+    @staticmethod
+    def _recover(directory):
+        """
+        If a write was interrupted after the directory was moved to directory.old, moves back the
+        directory that read would use, so the next write doesn't remove it.
+
+        :param directory: str
+        """
+        if path.exists(directory):
+            return
+
+        for name in [directory + '.tmp', directory + '.old']:
+            if NPYFile._read_header(name) is not None:
+                logger.info('Recovering %s from %s' % (directory, name))
+                os.rename(name, directory)
+                return
+
+    @staticmethod
+    def _read_header(directory):
+        """
+        Read the header of directory.
+
+        :param directory: str
+        :return: dict, or None if directory doesn't have a complete header
+        """
+        header_path = path.join(directory, NPY_HEADER_FILE)
+
+        if not path.exists(header_path):
+            return None
+
+        try:
+            with open(header_path) as f:
+                return json.load(f)
+        except ValueError:
+            return None
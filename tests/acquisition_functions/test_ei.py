@@ -109,6 +109,14 @@ class TestEI(unittest.TestCase):
         evals = np.clip(samples - maximum, 0, None)
         npt.assert_almost_equal(val, np.mean(evals), decimal=2)
 
+    def test_evaluate_batch(self):
+        points = np.array([[97.5, 0], [91.5, 0], [30.0, 1]])
+        values = self.ei.evaluate(points)
+
+        assert values.shape == (3,)
+        for i in xrange(3):
+            npt.assert_almost_equal(values[i], self.ei.evaluate(points[i:i + 1, :]))
+
     def test_evaluate_gradient(self):
         point = np.array([[91.5, 0]])
         grad = self.ei.evaluate_gradient(point)
@@ -133,6 +141,17 @@ class TestEI(unittest.TestCase):
         npt.assert_almost_equal(finite_diff[0], grad[0], decimal=2)
 
 
+    def test_evaluate_with_gradient(self):
+        point = np.array([[91.5, 0]])
+        value, grad = self.ei.evaluate_with_gradient(point)
+        npt.assert_almost_equal(value, self.ei.evaluate(point))
+        npt.assert_almost_equal(grad, self.ei.evaluate_gradient(point))
+
+        point = np.array([[91.5]])
+        value, grad = self.ei_2.evaluate_with_gradient(point)
+        npt.assert_almost_equal(value, self.ei_2.evaluate(point))
+        npt.assert_almost_equal(grad, self.ei_2.evaluate_gradient(point))
+
     def test_optimize(self):
         np.random.seed(2)
         opt = self.ei.optimize(random_seed=1, n_restarts=120)
@@ -140,6 +159,19 @@ class TestEI(unittest.TestCase):
         evaluations = self.ei.generate_evaluations('1', '2', '3', 1, 1, 1, [100], 2)
         npt.assert_almost_equal(opt['optimal_value'], np.max(evaluations))
 
+    def test_optimize_batch(self):
+        data = deepcopy(self.gp.data)
+        opt = self.ei.optimize(random_seed=1, n_restarts=10, parallel=False)
+        batch = self.ei.optimize_batch(2, random_seed=1, n_restarts=10, parallel=False)
+
+        assert batch['solution'].shape == (2, 2)
+        npt.assert_almost_equal(batch['solution'][0, :], opt['solution'])
+        npt.assert_almost_equal(batch['optimal_value'][0], opt['optimal_value'])
+        assert np.any(batch['solution'][0, :] != batch['solution'][1, :])
+
+        npt.assert_almost_equal(self.gp.data['points'], data['points'])
+        npt.assert_almost_equal(self.gp.data['evaluations'], data['evaluations'])
+
     def test_optimize_bq(self):
         np.random.seed(2)
         opt = self.ei_2.optimize(random_seed=1, n_restarts=50)
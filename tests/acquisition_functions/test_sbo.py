@@ -38,6 +38,7 @@ from stratified_bayesian_optimization.entities.run_spec import RunSpecEntity
 from stratified_bayesian_optimization.services.domain import DomainService
 from stratified_bayesian_optimization.lib.finite_differences import FiniteDifferences
 from stratified_bayesian_optimization.lib.affine_break_points import (
+    AffineBreakPointsPrep,
     AffineBreakPoints,
 )
 from stratified_bayesian_optimization.lib.parallel import Parallel
@@ -216,6 +217,16 @@ class TestSBO(unittest.TestCase):
         npt.assert_almost_equal(finite_diff[1], grad[1])
         npt.assert_almost_equal(finite_diff[0], grad[0])
 
+    def test_evaluate_with_gradient(self):
+        candidate = np.array([[52.5, 0]])
+        value, grad = self.sbo.evaluate_with_gradient(candidate)
+        npt.assert_almost_equal(value, self.sbo.evaluate(candidate))
+        npt.assert_almost_equal(grad, self.sbo.evaluate_gradient(candidate))
+
+        value, grad = self.sbo_simple.evaluate_with_gradient(candidate)
+        assert value == self.sbo_simple.evaluate(candidate)
+        assert np.all(grad == np.array([0, 0]))
+
     def test_hvoi(self):
         b = np.array([1, 2])
         c = np.array([3, 4])
@@ -223,6 +234,26 @@ class TestSBO(unittest.TestCase):
         z = self.sbo.hvoi(b, c, keep)
         assert z == 0
 
+    def test_hvoi_batch(self):
+        np.random.seed(1)
+        a = np.random.randn(20)
+        b = np.random.randn(20, 6)
+        b[3, 1] = b[7, 1]
+        b[:, 2] = b[0, 2]
+        b[4, 4] = np.inf
+        b[:, 5] = np.round(b[:, 5])
+
+        values = SBO.hvoi_batch(a, b)
+
+        for i in xrange(b.shape[1]):
+            if not np.all(np.isfinite(b[:, i])):
+                assert values[i] == 0
+                continue
+            a_, b_, keep = AffineBreakPointsPrep(a, b[:, i])
+            keep_1, c = AffineBreakPoints(a_, b_)
+            keep_1 = keep_1.astype(np.int64)
+            npt.assert_almost_equal(values[i], SBO.hvoi(b_, c, keep_1))
+
     def test_optimization(self):
         val = self.sbo_med.optimize(random_seed=1, parallel=False, n_restarts=1, start_ei=False)
         # Benchmark numbers obtained after optimizing the function manually, i.e. plot the function
@@ -360,6 +391,24 @@ class TestSBO(unittest.TestCase):
 
         assert np.max(values) <= eval
 
+    def test_evaluate_sbo_by_samples_batch(self):
+        candidate_point = np.array([[52.5, 0]])
+        np.random.seed(1)
+        discretization = self.sbo.discretization
+
+        samples = np.array([-2.0, 0.5])
+        evals = self.sbo.evaluate_sbo_by_samples_batch(candidate_point, samples, n_restarts=10)
+
+        for i, sample in enumerate(samples):
+            values = []
+            for point in discretization:
+                val = self.sbo.evaluate_sample(point, candidate_point, sample)
+                values.append(val)
+            assert np.max(values) <= evals['max'][i] + 1e-8
+
+            value = self.sbo.evaluate_sample(evals['optimum'][i, :], candidate_point, sample)
+            npt.assert_almost_equal(value, evals['max'][i])
+
     def test_evaluate_sbo_by_sample_hessian(self):
         candidate_point = np.array([[52.5, 0]])
         np.random.seed(1)
@@ -773,6 +822,29 @@ class TestSBO(unittest.TestCase):
         npt.assert_almost_equal(values['evaluations'], values_2['evaluations'], decimal=4)
 
 
+    def test_evaluate_mc_bayesian_candidate_points_no_restarts_batch(self):
+        candidate_points = np.array([[52.5, 0], [42.5, 1]])
+        np.random.seed(1)
+        n_samples_parameters = 5
+        n_samples = 10
+        n_restarts = 10
+
+        self.sbo_med.bq.gp.sample_parameters(n_samples_parameters)
+
+        np.random.seed(1)
+        values = self.sbo_med.evaluate_mc_bayesian_candidate_points_no_restarts(
+            candidate_points, n_samples_parameters, n_samples, n_restarts=n_restarts,
+            compute_gradient=True)
+        self.sbo_med.clean_cache()
+
+        np.random.seed(1)
+        values_2 = self.sbo_med.evaluate_mc_bayesian_candidate_points_no_restarts(
+            candidate_points, n_samples_parameters, n_samples, n_restarts=n_restarts,
+            compute_gradient=True, batch_samples=True)
+
+        npt.assert_almost_equal(values['evaluations'], values_2['evaluations'], decimal=4)
+        npt.assert_almost_equal(values['gradient'], values_2['gradient'], decimal=4)
+
     def test_evaluate_hessian_sample(self):
         point = np.array([[49.2]])
         candidate_point = np.array([[52.5, 0]])
@@ -1,13 +1,19 @@
 from __future__ import absolute_import
 
 import unittest
+import shutil
+import tempfile
 import numpy.testing as npt
 
 from mock import mock_open, patch, MagicMock
 
 import numpy as np
 
+from os import path
+
 from stratified_bayesian_optimization.entities.objective import Objective
+from stratified_bayesian_optimization.util.json_journal import JSONJournal
+from stratified_bayesian_optimization.util.json_file import JSONFile
 
 
 class TestObjective(unittest.TestCase):
@@ -31,6 +37,39 @@ class TestObjective(unittest.TestCase):
         npt.assert_almost_equal(self.obj.objective_values, [1.0], decimal=1)
         assert self.obj.standard_deviation_evaluations == [7.8350152288466661e-05]
 
+    def test_add_point_evaluation(self):
+        val = self.obj.add_point(np.array([1.0]), [0.5], evaluation=[3.0, 0.1])
+        assert val == 3.0
+        assert self.obj.objective_values == [3.0]
+        assert self.obj.standard_deviation_evaluations == [0.1]
+
+    def test_read_results(self):
+        dir = tempfile.mkdtemp()
+        self.obj.file_path = path.join(dir, 'results.json')
+        self.obj.journal = JSONJournal(self.obj.file_path)
+
+        for i in xrange(3):
+            self.obj.add_point(np.array([float(i)]), 0.5, evaluation=[float(i), 0.1])
+
+        assert JSONFile.read(self.obj.file_path)['evaluated_points'] == [[0.0]]
+        assert len(JSONJournal.read_records(self.obj.file_path)) == 2
+        assert Objective.read_results(self.obj.file_path) == self.obj.serialize()
+
+        with patch('stratified_bayesian_optimization.entities.objective.'
+                   'JOURNAL_COMPACTION_INTERVAL', 2):
+            self.obj.add_point(np.array([3.0]), 0.5, evaluation=[3.0, 0.1])
+        assert JSONFile.read(self.obj.file_path) == self.obj.serialize()
+        assert JSONJournal.read_records(self.obj.file_path) == []
+
+        obj = Objective(self.problem_name, self.training_name, self.random_seed, self.n_training,
+                        self.n_samples, self.noise)
+        obj.file_path = self.obj.file_path
+        obj.set_data_from_file()
+        assert obj.objective_values == [0.0, 1.0, 2.0, 3.0]
+        assert obj.standard_deviation_evaluations == [0.1] * 4
+
+        shutil.rmtree(dir)
+
     @patch('os.path.exists')
     @patch('os.mkdir')
     def test_builder(self, mock_mkdir, mock_exists):
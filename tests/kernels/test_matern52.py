@@ -151,6 +151,38 @@ class TestMatern52(unittest.TestCase):
         assert GradientLSMatern52.gradient_respect_distance_cross(
             self.length_scale, self.inputs, self.inputs) == np.array([0.0])
 
+    def test_derivatives_respect_point_from_params(self):
+        np.random.seed(3)
+        params = np.array([2.0, 0.5, 1.3])
+        inputs = np.random.rand(6, 3) * 3
+
+        point = np.random.rand(1, 3) * 3
+        derivatives = Matern52.derivatives_respect_point_from_params(
+            params, point, inputs, 3, hessian=True)
+
+        npt.assert_almost_equal(derivatives['cov'],
+                                Matern52.cross_cov_from_params(params, point, inputs, 3)[0, :])
+        npt.assert_almost_equal(derivatives['gradient'],
+                                Matern52.evaluate_grad_respect_point(params, point, inputs, 3))
+        npt.assert_almost_equal(derivatives['hessian'],
+                                Matern52.evaluate_hessian_respect_point(params, point, inputs, 3))
+
+        points = np.random.rand(6, 3) * 3
+        derivatives = Matern52.derivatives_respect_point_from_params(params, points, inputs, 3)
+        assert 'hessian' not in derivatives
+        npt.assert_almost_equal(derivatives['gradient'],
+                                Matern52.evaluate_grad_respect_point(params, points, inputs, 3))
+        for i in xrange(6):
+            npt.assert_almost_equal(
+                derivatives['cov'][i],
+                Matern52.cross_cov_from_params(params, points[i:i + 1], inputs[i:i + 1], 3)[0, 0])
+
+        derivatives = Matern52.derivatives_respect_point_from_params(
+            params, inputs[0:1, :], inputs, 3, hessian=True)
+        assert np.all(derivatives['gradient'][0, :] == 0)
+        npt.assert_almost_equal(derivatives['hessian'][0],
+                                np.diag(- (5.0 / 3.0) / (params ** 2)))
+
     def test_grad_respect_point_2(self):
         expect(GradientLSMatern52).gradient_respect_distance_cross.once().and_return(
             np.array([[1, 0], [0, 1]]))
@@ -350,3 +382,14 @@ class TestMatern52(unittest.TestCase):
                 print i, j
                 npt.assert_almost_equal(finite_diff[i, j],
                                         np.array([[result[0, i, j], result[1, i, j]]]), decimal=5)
+
+    def test_cross_cov_from_params(self):
+        inputs_1 = np.array([[1.0, 0.0], [0.5, 3.0], [2.0, 2.0]])
+        inputs_2 = np.array([[0.0, 1.0]])
+        params = np.array([2.0, 3.0])
+
+        kernel = Matern52.define_kernel_from_array(2, params)
+        npt.assert_almost_equal(Matern52.cross_cov_from_params(params, inputs_1, inputs_2, 2),
+                                kernel.cross_cov(inputs_1, inputs_2))
+        npt.assert_almost_equal(Matern52.cov_from_params(params, inputs_1, 2),
+                                kernel.cov(inputs_1))
@@ -223,6 +223,21 @@ class TestProductKernels(unittest.TestCase):
         for i in range(2):
             npt.assert_almost_equal(finite_diff[i], gradient[:, i:i+1].transpose())
 
+    def test_grad_respect_point_pairs(self):
+        inputs_1 = np.array([[2.0, 4.0, 0], [3.0, 5.0, 1], [1.0, 2.0, 1]])
+        points = np.array([[42.0, 35.0, 1], [42.0, 35.0, 0], [40.0, 30.0, 1]])
+
+        gradient = self.kernel_.grad_respect_point(points, inputs_1)
+        hessian = self.kernel_.hessian_respect_point(points, inputs_1)
+
+        for i in xrange(3):
+            npt.assert_almost_equal(
+                gradient[i:i + 1, :],
+                self.kernel_.grad_respect_point(points[i:i + 1, :], inputs_1[i:i + 1, :]))
+            npt.assert_almost_equal(
+                hessian[i:i + 1, :, :],
+                self.kernel_.hessian_respect_point(points[i:i + 1, :], inputs_1[i:i + 1, :]))
+
     def test_hypers_as_list(self):
         assert self.kernel_.hypers_as_list == [self.length_scale_, self.sigma2_, self.lower_triang_]
 
@@ -358,3 +373,22 @@ class TestProductKernels(unittest.TestCase):
                 npt.assert_almost_equal(finite_diff[i, j],
                                         np.array([[result[0, i, j], result[1, i, j]]]), decimal=5)
 
+
+    def test_cross_cov_from_params(self):
+        params = [np.array([1.0, 5.0]), np.array([1.0, 5.0, 6.0])]
+        inputs_1 = np.array([[3.0, 4.0, 1.0], [2.0, 1.0, 0.0]])
+        inputs_2 = np.array([[1.0, 2.0, 0.0], [5.0, 1.0, 1.0], [2.0, 2.0, 1.0]])
+
+        kernel = ProductKernels.define_kernel_from_array(
+            [2, 2], params, [MATERN52_NAME, TASKS_KERNEL_NAME])
+        expected = kernel.cross_cov(inputs_1, inputs_2)
+
+        result = ProductKernels.cross_cov_from_params(
+            params, kernel.inputs_from_array_to_dict(inputs_1),
+            kernel.inputs_from_array_to_dict(inputs_2), [2, 2],
+            [MATERN52_NAME, TASKS_KERNEL_NAME])
+        npt.assert_almost_equal(result, expected)
+
+        result = ProductKernels.evaluate_cross_cov_defined_by_params_array(
+            params, inputs_1, inputs_2, [2, 2], [MATERN52_NAME, TASKS_KERNEL_NAME])
+        npt.assert_almost_equal(result, expected)
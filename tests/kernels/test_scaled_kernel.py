@@ -99,3 +99,15 @@ class TestScaledKernel(unittest.TestCase):
                 npt.assert_almost_equal(finite_diff[i, j],
                                         np.array([[result[0, i, j], result[1, i, j]]]), decimal=5)
 
+
+    def test_cross_cov_from_params(self):
+        inputs_1 = np.array([[1.0, 0.0], [0.5, 3.0]])
+        inputs_2 = np.array([[0.0, 1.0], [2.0, 2.0], [1.0, 1.0]])
+        params = np.array([1.0, 2.0, 3.0])
+
+        npt.assert_almost_equal(
+            ScaledKernel.cross_cov_from_params(params, inputs_1, inputs_2, 2, *([MATERN52_NAME],)),
+            self.matern52.cross_cov(inputs_1, inputs_2))
+        npt.assert_almost_equal(
+            ScaledKernel.cov_from_params(params, inputs_1, 2, *([MATERN52_NAME],)),
+            self.matern52.cov(inputs_1))
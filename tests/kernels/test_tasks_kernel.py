@@ -281,3 +281,21 @@ class TestTasksKernel(unittest.TestCase):
 
         kernel = TasksKernel.define_kernel_from_array(1, np.array([5.0]))
         assert np.all(result == kernel.grad_respect_point(np.array([[0]]), np.array([[0], [0]])))
+
+    def test_cross_cov_from_params(self):
+        inputs_1 = np.array([[0], [2], [1], [2]])
+        inputs_2 = np.array([[1], [0]])
+        params = np.array([0.1, 0.2, 0.3, 0.4, 0.5, 0.6])
+
+        kernel = TasksKernel.define_kernel_from_array(3, params)
+        npt.assert_almost_equal(TasksKernel.cross_cov_from_params(params, inputs_1, inputs_2, 3),
+                                kernel.cross_cov(inputs_1, inputs_2))
+        npt.assert_almost_equal(TasksKernel.cov_from_params(params, inputs_1, 3),
+                                kernel.cov(inputs_1))
+
+        params = np.array([0.1, 0.2])
+        kernel = TasksKernel.define_kernel_from_array(3, params, same_correlation=True)
+        npt.assert_almost_equal(
+            TasksKernel.cross_cov_from_params(params, inputs_1, inputs_2, 3,
+                                              same_correlation=True),
+            kernel.cross_cov(inputs_1, inputs_2))
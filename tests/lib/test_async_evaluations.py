@@ -0,0 +1,63 @@
+import unittest
+import time
+
+from stratified_bayesian_optimization.lib.async_evaluations import AsyncEvaluations
+from stratified_bayesian_optimization.lib.parallel import Parallel
+
+
+def sleep_and_square(x, seconds=0.0):
+    time.sleep(seconds)
+    return x ** 2
+
+
+def parallel_squares(x):
+    return Parallel.run_function_different_arguments_parallel(sleep_and_square, {0: x, 1: x + 1})
+
+
+class TestAsyncEvaluations(unittest.TestCase):
+
+    def test_deterministic_order(self):
+        with AsyncEvaluations(n_in_flight=2, threads=True) as evaluations:
+            evaluations.submit('a', sleep_and_square, 2, seconds=0.2)
+            evaluations.submit('b', sleep_and_square, 3)
+            assert evaluations.n_pending == 2
+
+            assert evaluations.next_result() == ('a', 4)
+            assert evaluations.next_result() == ('b', 9)
+            assert evaluations.next_result() is None
+
+            with self.assertRaises(ValueError):
+                evaluations.submit('c', sleep_and_square, 1, seconds=0.1)
+                evaluations.submit('c', sleep_and_square, 1)
+
+    def test_completion_order(self):
+        with AsyncEvaluations(n_in_flight=2, deterministic=False, threads=True) as evaluations:
+            evaluations.submit('a', sleep_and_square, 2, seconds=0.2)
+            evaluations.submit('b', sleep_and_square, 3)
+
+            assert evaluations.next_result() == ('b', 9)
+            assert evaluations.next_result(block=False) is None
+            assert evaluations.next_result() == ('a', 4)
+
+            stats = evaluations.statistics()
+            assert stats['submitted'] == 2
+            assert stats['completed'] == 2
+            assert stats['pending'] == 0
+            assert stats['mean_time'] > 0.0
+
+    def test_processes(self):
+        with AsyncEvaluations(n_in_flight=1) as evaluations:
+            for i in xrange(3):
+                evaluations.submit(i, sleep_and_square, i)
+            results = [evaluations.next_result() for i in xrange(3)]
+
+        assert results == [(0, 0), (1, 1), (2, 4)]
+
+    def test_processes_parallel_function(self):
+        with Parallel.pool(n_jobs=1):
+            with AsyncEvaluations(n_in_flight=2) as evaluations:
+                evaluations.submit(0, parallel_squares, 1)
+                evaluations.submit(1, parallel_squares, 2)
+                results = [evaluations.next_result() for i in xrange(2)]
+
+        assert results == [(0, {0: 1, 1: 4}), (1, {0: 4, 1: 9})]
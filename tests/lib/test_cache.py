@@ -0,0 +1,81 @@
+import unittest
+import pickle
+
+import numpy as np
+import numpy.testing as npt
+
+from stratified_bayesian_optimization.lib.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = LRUCache(max_bytes=3 * 8 * 10)
+
+    def test_get(self):
+        self.cache['a'] = np.ones(10)
+        npt.assert_almost_equal(self.cache.get('a'), np.ones(10))
+        assert self.cache.get('b') is None
+        assert self.cache.get('b', False) is False
+
+        with self.assertRaises(KeyError):
+            self.cache['b']
+
+        assert self.cache.hits == 1
+        assert self.cache.misses == 3
+
+    def test_evictions(self):
+        self.cache['a'] = np.ones(10)
+        self.cache['b'] = np.ones(10)
+        self.cache['c'] = (np.ones(5), np.ones(5))
+        assert self.cache.n_bytes == 3 * 8 * 10
+
+        self.cache.get('a')
+        self.cache['d'] = np.zeros(10)
+
+        assert sorted(self.cache.keys()) == ['a', 'c', 'd']
+        assert self.cache.evictions == 1
+        assert self.cache.n_bytes == 3 * 8 * 10
+
+        self.cache['e'] = np.zeros(40)
+        assert 'e' not in self.cache
+        assert len(self.cache) == 3
+
+        self.cache['a'] = np.ones(20)
+        assert sorted(self.cache.keys()) == ['a', 'd']
+        assert self.cache.n_bytes == 3 * 8 * 10
+
+    def test_clear(self):
+        self.cache['a'] = np.ones(10)
+        self.cache.get('a')
+        self.cache.clear()
+
+        assert self.cache == {}
+        assert self.cache.n_bytes == 0
+
+        statistics = self.cache.statistics()
+        assert statistics['hits'] == 1
+        assert statistics['entries'] == 0
+        assert statistics['max_bytes'] == 3 * 8 * 10
+
+    def test_pickle(self):
+        self.cache['a'] = np.ones(10)
+        self.cache.get('a')
+
+        cache = pickle.loads(pickle.dumps(self.cache, pickle.HIGHEST_PROTOCOL))
+        assert cache == {}
+        assert cache.n_bytes == 0
+        assert cache.max_bytes == 3 * 8 * 10
+        assert cache.hits == 1
+
+        cache['b'] = np.ones(10)
+        assert len(cache) == 1
+        assert len(self.cache) == 1
+
+        LRUCache.pickle_entries = True
+        try:
+            cache = pickle.loads(pickle.dumps(self.cache, pickle.HIGHEST_PROTOCOL))
+        finally:
+            LRUCache.pickle_entries = False
+        assert cache.keys() == ['a']
+        assert cache.n_bytes == 80
@@ -5,6 +5,8 @@ import unittest
 from doubles import expect
 
 import numpy as np
+import numpy.testing as npt
+from scipy.spatial.distance import cdist
 
 from stratified_bayesian_optimization.lib.distances import Distances
 
@@ -28,3 +30,30 @@ class TestDistances(unittest.TestCase):
         expect(Distances).dist_square_length_scale.once().and_return(np.array([[1.0]]))
         assert Distances.gradient_distance_length_scale_respect_point(self.ls, self.x1, self.x1)\
             == np.array([[0.0]])
+
+    def test_squared_differences_training_points(self):
+        np.random.seed(1)
+        x = np.random.rand(10, 3)
+        ls = np.array([1.0, 2.0, 0.5])
+
+        differences = Distances.squared_differences_training_points(x)
+        assert differences.shape == (3, 10, 10)
+        assert Distances.squared_differences_training_points(x.copy()) is differences
+
+        npt.assert_almost_equal(Distances.dist_square_length_scale(ls, x),
+                                cdist(x / ls, x / ls, 'sqeuclidean'))
+
+        # x.copy() is not x, so the gradient is computed without the cached differences
+        gradient = Distances.gradient_distance_length_scale_respect_ls(ls, x)
+        gradient_2 = Distances.gradient_distance_length_scale_respect_ls(ls, x, x.copy())
+        for i in xrange(3):
+            npt.assert_almost_equal(gradient[i], gradient_2[i])
+
+        max_bytes = Distances._cache_differences.max_bytes
+        Distances._cache_differences.max_bytes = 100
+        try:
+            assert Distances.squared_differences_training_points(x) is None
+            npt.assert_almost_equal(Distances.dist_square_length_scale(ls, x),
+                                    cdist(x / ls, x / ls, 'sqeuclidean'))
+        finally:
+            Distances._cache_differences.max_bytes = max_bytes
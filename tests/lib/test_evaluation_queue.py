@@ -0,0 +1,68 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from os import path
+
+from stratified_bayesian_optimization.lib.evaluation_queue import EvaluationQueue
+from stratified_bayesian_optimization.lib.constant import JOURNAL_SUFFIX
+
+
+def square(point, shift=0.0):
+    return [point[0] ** 2 + shift]
+
+
+class TestEvaluationQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = path.join(self.dir, 'training_data.json')
+        self.journal_path = self.filename + JOURNAL_SUFFIX
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_evaluate(self):
+        points = [[1.0], [2.0], [3.0]]
+
+        queue = EvaluationQueue(self.filename, n_jobs=2)
+        assert queue.evaluate(square, points, shift=1.0) == [[2.0], [5.0], [10.0]]
+
+        queue_2 = EvaluationQueue(self.filename, parallel=False)
+        assert queue_2.evaluate(square, points, shift=1.0) == [[2.0], [5.0], [10.0]]
+
+        stats = queue.statistics()
+        assert stats['points'] == 3
+        assert stats['evaluated'] == 3
+        assert stats['reused'] == 0
+        assert stats['throughput'] > 0
+
+        stats_2 = queue_2.statistics()
+        assert stats_2['evaluated'] == 0
+        assert stats_2['reused'] == 3
+
+        queue.remove_journal()
+        assert not path.exists(self.journal_path)
+
+    def test_restart(self):
+        queue = EvaluationQueue(self.filename, parallel=False)
+        queue.evaluate(square, [[1.0], [2.0]])
+
+        with open(self.journal_path, 'a') as f:
+            f.write('{"point": [3.0], "out')
+
+        queue_2 = EvaluationQueue(self.filename, parallel=False)
+        assert queue_2.read_journal() == {(1.0, ): [1.0], (2.0, ): [4.0]}
+        assert queue_2.evaluate(square, [[3.0], [2.0], [1.0]]) == [[9.0], [4.0], [1.0]]
+        assert queue_2.statistics()['evaluated'] == 1
+        assert queue_2.statistics()['reused'] == 2
+
+        queue_3 = EvaluationQueue(self.filename, parallel=False)
+        assert queue_3.read_journal() == {(1.0, ): [1.0], (2.0, ): [4.0], (3.0, ): [9.0]}
+
+    def test_no_journal(self):
+        queue = EvaluationQueue(n_jobs=2)
+        assert queue.evaluate(square, [[1.0], [2.0]]) == [[1.0], [4.0]]
+        assert queue.read_journal() == {}
+        assert os.listdir(self.dir) == []
@@ -12,6 +12,7 @@ from stratified_bayesian_optimization.lib.expectations import (
     gradient_uniform_finite,
     gradient_uniform_finite_resp_candidate,
     hessian_uniform_finite,
+    uniform_finite,
 )
 from stratified_bayesian_optimization.lib.finite_differences import FiniteDifferences
 from stratified_bayesian_optimization.lib.constant import (
@@ -98,3 +99,19 @@ class TestExpectations(unittest.TestCase):
 
         assert np.all(hessian[0, :] == hessian_[0])
         assert np.all(hessian[1, :] == hessian_[1])
+
+    def test_uniform_finite_several_points(self):
+        points_2 = self.gp.gp.data['points']
+        parameters_kernel = self.gp.gp.kernel.hypers_values_as_array
+        f = lambda x: self.gp.gp.evaluate_cross_cov(x, points_2, parameters_kernel)
+
+        points = np.array([[41.0], [42.0], [45.0]])
+        weights = np.array([0.3, 0.7])
+        values = uniform_finite(f, points, [0], np.array([[0], [1]]), [1], weights=weights)
+
+        assert values.shape == (3, 2)
+        for i in xrange(3):
+            npt.assert_almost_equal(
+                values[i, :],
+                uniform_finite(f, points[i:i + 1, :], [0], np.array([[0], [1]]), [1],
+                               weights=weights))
@@ -1,5 +1,6 @@
 import unittest
 
+from mock import patch
 import numpy.testing as npt
 
 import numpy as np
@@ -8,6 +9,11 @@ from stratified_bayesian_optimization.lib.la_functions import (
     cholesky,
     linalg,
     cho_solve,
+    cholesky_extend,
+    cho_inverse,
+    cho_quadratic_diagonal,
+    cholesky_batch,
+    cho_solve_batch,
 )
 from stratified_bayesian_optimization.kernels.matern52 import Matern52
 
@@ -54,3 +60,41 @@ class TestLAFunctions(unittest.TestCase):
         y = np.linspace(1.0, 100.0, self.cov.shape[0])
         sol = cho_solve(chol, y)
         npt.assert_almost_equal(np.dot(self.cov, sol), y)
+
+    def test_cholesky_extend(self):
+        chol = cholesky(self.cov[0:45, 0:45])
+        extended_chol = cholesky_extend(chol, self.cov[0:45, 45:], self.cov[45:, 45:])
+        npt.assert_almost_equal(extended_chol, cholesky(self.cov))
+        npt.assert_almost_equal(np.dot(extended_chol, extended_chol.transpose()), self.cov)
+
+    def test_cho_inverse(self):
+        chol = cholesky(self.cov_)
+        npt.assert_almost_equal(cho_inverse(chol), np.linalg.inv(self.cov_))
+
+    def test_cho_quadratic_diagonal(self):
+        chol = cholesky(self.cov_)
+        y = np.random.normal(0, 1, (5, 7))
+        expect = np.diag(np.dot(y.transpose(), cho_solve(chol, y)))
+        npt.assert_almost_equal(cho_quadratic_diagonal(chol, y), expect)
+
+    def test_cholesky_batch(self):
+        covs = np.array([self.cov_, 2.0 * self.cov_])
+        chols = cholesky_batch(covs)
+        npt.assert_almost_equal(chols[0, :, :], cholesky(self.cov_))
+        npt.assert_almost_equal(chols[1, :, :], cholesky(2.0 * self.cov_))
+
+        chols = cholesky_batch(np.array([self.cov_, self.cov_2]), max_tries=7)
+        npt.assert_almost_equal(chols[0, :, :], cholesky(self.cov_))
+        npt.assert_almost_equal(chols[1, :, :], cholesky(self.cov_2, max_tries=7))
+
+        with self.assertRaises(linalg.LinAlgError):
+            cholesky_batch(np.array([self.cov_, self.cov_2]))
+
+    @patch('stratified_bayesian_optimization.lib.la_functions.N_ROWS_TRIANGULAR_BATCH', new=7)
+    def test_cho_solve_batch(self):
+        covs = np.array([self.cov, self.cov + np.eye(self.cov.shape[0])])
+        chols = cholesky_batch(covs)
+        y = np.random.normal(0, 1, (2, self.cov.shape[0]))
+        sol = cho_solve_batch(chols, y)
+        npt.assert_almost_equal(sol[0, :], cho_solve(chols[0, :, :], y[0, :]))
+        npt.assert_almost_equal(sol[1, :], cho_solve(chols[1, :, :], y[1, :]))
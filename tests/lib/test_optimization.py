@@ -3,6 +3,7 @@ from __future__ import absolute_import
 import unittest
 
 import numpy as np
+import numpy.testing as npt
 from scipy.optimize import fmin_l_bfgs_b
 
 from stratified_bayesian_optimization.lib.optimization import Optimization
@@ -36,3 +37,43 @@ class TestOptimization(unittest.TestCase):
         assert opt_2['solution'] == 1
         assert opt_2['optimal_value'] == 1
         assert opt_2['gradient'] == 2
+
+    def test_optimize_batch(self):
+        def f(x, shift):
+            return np.sum((x - shift) ** 2, axis=1)
+
+        def grad(x, shift):
+            return 2.0 * (x - shift)
+
+        bounds = [(-1, 1), (-1, 1)]
+        shift = np.array([[0.5, -0.5], [2.0, 0.0], [-0.3, 0.1]])
+        starts = np.zeros((3, 2))
+
+        opt = Optimization(LBFGS_NAME, f, bounds, grad)
+        sol = opt.optimize_batch(starts, (shift,))
+
+        npt.assert_almost_equal(sol['solution'], [[0.5, -0.5], [1.0, 0.0], [-0.3, 0.1]],
+                                decimal=4)
+        npt.assert_almost_equal(sol['optimal_value'], [0.0, 1.0, 0.0], decimal=4)
+
+        opt_2 = Optimization(LBFGS_NAME, lambda x, s: -f(x, s), bounds, lambda x, s: -grad(x, s),
+                             minimize=False)
+        sol_2 = opt_2.optimize_batch(starts, (shift,))
+        npt.assert_almost_equal(sol_2['solution'], sol['solution'])
+        npt.assert_almost_equal(sol_2['optimal_value'], -sol['optimal_value'])
+
+    def test_optimize_value_and_grad(self):
+        def f_and_grad(x):
+            return x[0] ** 2, 2.0 * x
+
+        opt = Optimization(LBFGS_NAME, None, self.bounds, None, value_and_grad=f_and_grad)
+        sol = opt.optimize(np.array([0.9]))
+        assert sol['solution'] == 0
+        assert sol['optimal_value'] == 0
+
+        opt_2 = Optimization(LBFGS_NAME, None, self.bounds, None, minimize=False,
+                             value_and_grad=f_and_grad)
+        sol_2 = opt_2.optimize(np.array([0.9]))
+        assert sol_2['solution'] == 1
+        assert sol_2['optimal_value'] == 1
+        assert sol_2['gradient'] == 2
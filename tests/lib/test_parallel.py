@@ -1,10 +1,15 @@
 from __future__ import absolute_import
 
+import os
 import unittest
 
-from mock import Mock
+import numpy as np
+
+from mock import Mock, patch
 
 from stratified_bayesian_optimization.lib.parallel import Parallel
+from stratified_bayesian_optimization.models.gp_fitting_gaussian import GPFittingGaussian
+from stratified_bayesian_optimization.lib.constant import SCALED_KERNEL, MATERN52_NAME
 
 
 def f(x):
@@ -15,6 +20,44 @@ def g(x):
     return x[1]
 
 
+def h(x, state):
+    return x + sum(state.values), state.n_deltas
+
+
+def sum_array(x, array):
+    return x + np.sum(array), isinstance(array, np.memmap), array.flags.writeable
+
+
+def cached_factors(x, gp_model):
+    chol, cov = gp_model.cache_chol_cov.values()[0]
+    return gp_model.cache_chol_cov.keys(), isinstance(chol, np.memmap), \
+        isinstance(cov, np.memmap), np.sum(chol)
+
+
+def gp_state(x, gp_model):
+    return gp_model.data['evaluations'].tolist(), list(gp_model.get_value_parameters_model), \
+        [list(sample) for sample in gp_model.samples_parameters]
+
+
+class State(object):
+
+    def __init__(self):
+        self.values = [1]
+        self.n_deltas = 0
+
+    def parallel_state_token(self):
+        return len(self.values)
+
+    def parallel_state_delta(self, token):
+        if len(self.values) < token:
+            return None
+        return self.values[token:]
+
+    def apply_parallel_state_delta(self, delta):
+        self.values += delta
+        self.n_deltas += 1
+
+
 class TestParallel(unittest.TestCase):
 
     def test_run_function_different_arguments_parallel(self):
@@ -33,3 +76,131 @@ class TestParallel(unittest.TestCase):
 
         assert -1 == Parallel.run_function_different_arguments_parallel(
             mock, arguments, all_success=False, signal=mock)
+
+    def test_pool(self):
+        arguments = {0: 1, 1: 2, 2: 3, 3: 4}
+        state = State()
+
+        with Parallel.pool(n_jobs=2):
+            Parallel.share_state(state)
+
+            result = Parallel.run_function_different_arguments_parallel(
+                h, arguments, False, None, True, 0, state)
+            assert result == {0: (2, 0), 1: (3, 0), 2: (4, 0), 3: (5, 0)}
+
+            state.values.append(10)
+            result = Parallel.run_function_different_arguments_parallel(
+                h, arguments, False, None, True, 0, state)
+            assert result == {0: (12, 1), 1: (13, 1), 2: (14, 1), 3: (15, 1)}
+
+            state.values = [5]
+            result = Parallel.run_function_different_arguments_parallel(
+                h, arguments, False, None, True, 0, state)
+            assert result == {0: (6, 0), 1: (7, 0), 2: (8, 0), 3: (9, 0)}
+
+            with self.assertRaises(Exception):
+                Parallel.run_function_different_arguments_parallel(g, arguments, all_success=True)
+
+            assert Parallel.run_function_different_arguments_parallel(g, arguments) == {}
+
+        assert Parallel._pool is None
+        assert Parallel._shared == {}
+
+    def test_pool_shared_memory(self):
+        arguments = {0: 1, 1: 2}
+        array = np.ones((100, 10))
+        state = State()
+        state.values = np.ones(1000)
+
+        with Parallel.pool(n_jobs=2, shared_memory=True, min_bytes_shared_memory=1000):
+            arrays_dir = Parallel._arrays_dir
+            Parallel.share_state(state)
+            assert len(os.listdir(arrays_dir)) == 1
+
+            result = Parallel.run_function_different_arguments_parallel(
+                sum_array, arguments, True, None, True, 0, array)
+            assert result == {0: (1001.0, True, False), 1: (1002.0, True, False)}
+
+            result = Parallel.run_function_different_arguments_parallel(
+                h, arguments, True, None, True, 0, state)
+            assert result == {0: (1001.0, 0), 1: (1002.0, 0)}
+
+            result = Parallel.run_function_different_arguments_parallel(
+                sum_array, arguments, True, None, True, 0, array[0:10, :])
+            assert result == {0: (101.0, False, True), 1: (102.0, False, True)}
+
+            assert len(os.listdir(arrays_dir)) == 1
+
+        assert not os.path.exists(arrays_dir)
+        assert Parallel._arrays_dir is None
+
+    def test_pool_shared_cached_factors(self):
+        x = np.linspace(0, 100, 50).reshape((50, 1))
+        training_data = {'points': x.tolist(), 'evaluations': list(x[:, 0]), 'var_noise': []}
+        gp = GPFittingGaussian([SCALED_KERNEL, MATERN52_NAME], training_data, [1],
+                               bounds_domain=[[0, 100]])
+        gp.compute_posterior_parameters(np.array([[20.0]]))
+        chol, cov = gp.cache_chol_cov.values()[0]
+
+        with Parallel.pool(n_jobs=1, shared_memory=True, min_bytes_shared_memory=1000):
+            Parallel.share_state(gp)
+            result = Parallel.run_function_different_arguments_parallel(
+                cached_factors, {0: 0}, True, None, True, 0, gp)
+
+        assert result[0][0] == gp.cache_chol_cov.keys()
+        assert result[0][1]
+        assert result[0][2]
+        assert result[0][3] == np.sum(chol)
+
+    @patch('stratified_bayesian_optimization.lib.parallel.MAX_PARALLEL_STATE_DELTAS', new=1)
+    def test_pool_collapse_deltas(self):
+        arguments = {0: 1}
+        state = State()
+
+        with Parallel.pool(n_jobs=1):
+            Parallel.share_state(state)
+
+            state.values.append(10)
+            result = Parallel.run_function_different_arguments_parallel(
+                h, arguments, False, None, True, 0, state)
+            assert result == {0: (12, 1)}
+            assert len(Parallel._shared[id(state)]['deltas']) == 1
+
+            state.values.append(20)
+            result = Parallel.run_function_different_arguments_parallel(
+                h, arguments, False, None, True, 0, state)
+            assert result == {0: (32, 0)}
+            assert Parallel._shared[id(state)]['deltas'] == []
+
+    def test_pool_gp_deltas(self):
+        x = np.linspace(0, 100, 10).reshape((10, 1))
+        training_data = {'points': x.tolist(), 'evaluations': list(x[:, 0]), 'var_noise': []}
+        gp = GPFittingGaussian([SCALED_KERNEL, MATERN52_NAME], training_data, [1],
+                               bounds_domain=[[0, 100]])
+
+        with Parallel.pool(n_jobs=1, shared_memory=True, min_bytes_shared_memory=1):
+            Parallel.share_state(gp)
+
+            with patch.object(Parallel, '_restart_pool') as restart_pool:
+                gp.add_points_evaluations(np.array([[50.0], [60.0]]), np.array([1.0, 2.0]))
+                gp.replace_evaluations(np.array([10]), np.array([3.0]))
+                gp.remove_points_evaluations(1)
+                gp.update_value_parameters(np.array([0.5, 1.0, 20.0, 2.0]))
+                gp.samples_parameters = [np.array([0.5, 1.0, 20.0, 2.0])]
+
+                result = Parallel.run_function_different_arguments_parallel(
+                    gp_state, {0: 0}, True, None, True, 0, gp)
+
+                gp.samples_parameters = [np.array([0.1, 1.0, 20.0, 2.0])]
+                gp.replace_evaluations(np.array([0]), np.array([7.0]))
+
+                result_2 = Parallel.run_function_different_arguments_parallel(
+                    gp_state, {0: 0}, True, None, True, 0, gp)
+
+            assert restart_pool.call_count == 0
+
+        evaluations = list(x[:, 0]) + [3.0]
+        assert result[0][0] == evaluations
+        assert result[0][1] == [0.5, 1.0, 20.0, 2.0]
+        assert result[0][2] == [[0.5, 1.0, 20.0, 2.0]]
+        assert result_2[0] == gp_state(0, gp)
@@ -5,8 +5,11 @@ import numpy.testing as npt
 
 from copy import deepcopy
 
+from mock import patch
+
 from stratified_bayesian_optimization.models.gp_fitting_gaussian import (
     GPFittingGaussian,
+    GradientGPFittingGaussian,
     ValidationGPModel,
 )
 from stratified_bayesian_optimization.lib.constant import (
@@ -138,6 +141,98 @@ class TestGPFittingGaussian(unittest.TestCase):
 
         assert self.gp_noisy.training_data == self.training_data_noisy
 
+    def test_add_points_evaluations_extends_cache(self):
+        parameters_kernel = np.array([50.0, 9.0])
+        var_noise = 0.5
+        mean = 2.0
+
+        self.gp_3._cholesky_solve_vectors_for_posterior(var_noise, mean, parameters_kernel)
+        self.gp_3.add_points_evaluations(self.new_point, self.evaluation, np.array([0.1]))
+
+        index = (var_noise, tuple(parameters_kernel))
+        chol, cov = self.gp_3.cache_chol_cov[index]
+        solve = self.gp_3.cache_sol_chol_y_unbiased[index + (mean, )]
+
+        self.gp_3.clean_cache()
+        expect_chol, expect_cov = self.gp_3._chol_cov_including_noise(var_noise, parameters_kernel)
+        npt.assert_almost_equal(chol, expect_chol)
+        npt.assert_almost_equal(cov, expect_cov)
+        npt.assert_almost_equal(
+            solve, np.linalg.solve(expect_cov, self.gp_3.data['evaluations'] - mean))
+
+    def test_parallel_state_delta(self):
+        token = self.gp.parallel_state_token()
+        delta = self.gp.parallel_state_delta(token)
+        assert delta['changes_data'] == []
+        assert delta['samples_parameters'] is None
+
+        copy_gp = deepcopy(self.gp)
+        self.gp.add_points_evaluations(self.new_point, self.evaluation)
+        self.gp.replace_evaluations(np.array([0]), np.array([5.0]))
+        self.gp.var_noise.set_value(np.array([2.0]))
+        self.gp.samples_parameters = [np.array([2.0, 1.0, 10.0, 1.0])]
+        delta = self.gp.parallel_state_delta(token)
+        assert len(delta['changes_data']) == 2
+        npt.assert_almost_equal(delta['changes_data'][0][1], [[80.0]])
+        npt.assert_almost_equal(delta['samples_parameters'], [[2.0, 1.0, 10.0, 1.0]])
+
+        copy_gp.apply_parallel_state_delta(delta)
+        assert copy_gp.parallel_state_token() == self.gp.parallel_state_token()
+        npt.assert_almost_equal(copy_gp.data['points'], self.gp.data['points'])
+        npt.assert_almost_equal(copy_gp.data['evaluations'], self.gp.data['evaluations'])
+        npt.assert_almost_equal(copy_gp.get_value_parameters_model,
+                                self.gp.get_value_parameters_model)
+
+        token = self.gp.parallel_state_token()
+        self.gp.changes_data = []
+        self.gp.add_points_evaluations(self.new_point, self.evaluation)
+        self.gp.n_changes_data += 1
+        assert self.gp.parallel_state_delta(token) is None
+
+    def test_replace_evaluations(self):
+        point = np.array([[60.0]])
+        believed = self.gp.compute_posterior_parameters(point, only_mean=True)['mean']
+        expected_gp = deepcopy(self.gp)
+        token = self.gp.parallel_state_token()
+
+        self.gp.add_points_evaluations(point, believed)
+        self.gp.replace_evaluations(np.array([len(self.gp.data['evaluations']) - 1]),
+                                    np.array([70.0]))
+        expected_gp.add_points_evaluations(point, np.array([70.0]))
+
+        npt.assert_almost_equal(self.gp.data['evaluations'], expected_gp.data['evaluations'])
+        npt.assert_almost_equal(
+            self.gp.compute_posterior_parameters(self.new_point, only_mean=True)['mean'],
+            expected_gp.compute_posterior_parameters(self.new_point, only_mean=True)['mean'])
+        changes = self.gp.parallel_state_delta(token)['changes_data']
+        assert [change[0] for change in changes] == ['add', 'replace']
+
+    def test_remove_points_evaluations(self):
+        parameters_kernel = np.array([50.0, 9.0])
+        var_noise = 0.5
+        mean = 2.0
+        index = (var_noise, tuple(parameters_kernel))
+
+        data = deepcopy(self.gp_3.data)
+        self.gp_3._cholesky_solve_vectors_for_posterior(var_noise, mean, parameters_kernel)
+        chol, cov = self.gp_3.cache_chol_cov[index]
+        solve = self.gp_3.cache_sol_chol_y_unbiased[index + (mean, )]
+        token = self.gp_3.parallel_state_token()
+
+        self.gp_3.add_points_evaluations(np.array([[60.0], [70.0]]), np.array([5.0, 6.0]),
+                                         np.array([0.1, 0.1]))
+        self.gp_3.remove_points_evaluations(2)
+
+        npt.assert_almost_equal(self.gp_3.data['points'], data['points'])
+        npt.assert_almost_equal(self.gp_3.data['evaluations'], data['evaluations'])
+        npt.assert_almost_equal(self.gp_3.data['var_noise'], data['var_noise'])
+        npt.assert_almost_equal(self.gp_3.cache_chol_cov[index][0], chol)
+        npt.assert_almost_equal(self.gp_3.cache_chol_cov[index][1], cov)
+        npt.assert_almost_equal(self.gp_3.cache_sol_chol_y_unbiased[index + (mean, )], solve)
+        assert self.gp_3.parallel_state_token() != token
+        changes = self.gp_3.parallel_state_delta(token)['changes_data']
+        assert [change[0] for change in changes] == ['add', 'remove']
+
     def test_convert_from_list_to_numpy(self):
         data = GPFittingGaussian.convert_from_list_to_numpy(self.training_data_noisy)
         assert np.all(data['points'] == np.array([[42.2851784656]]))
@@ -192,6 +287,7 @@ class TestGPFittingGaussian(unittest.TestCase):
             "bounds_domain": [],
             'n_burning': 0,
             'max_steps_out': 1,
+            'n_chains': 1,
             'bounds_domain': [[0, 100]],
             'type_bounds': [0],
             'name_model': 'gp_fitting_gaussian',
@@ -218,6 +314,34 @@ class TestGPFittingGaussian(unittest.TestCase):
         assert gp.training_data == self.training_data
         assert gp.dimensions == [1]
 
+    def test_serialize_arrays(self):
+        self.gp_3.add_points_evaluations(np.array([[80.0]]), np.array([80.0]),
+                                         var_noise_eval=np.array([0.5]))
+        self.gp_3.samples_parameters = [np.array([1.0, 2.0, 3.0, 4.0])]
+        self.gp_3.compute_posterior_parameters(np.array([[50.0]]))
+
+        content, arrays = self.gp_3.serialize_arrays()
+        assert content['cache_chol_cov'] == []
+        assert 'chol_0' not in arrays
+
+        content, arrays = self.gp_3.serialize_arrays(cached_factors=True)
+        expected = self.gp_3.serialize()
+        assert content['training_data'] == expected['training_data']
+        assert content['kernel_values'] == expected['kernel_values']
+        assert len(content['cache_chol_cov']) == 1
+        assert len(content['cache_sol_chol_y_unbiased']) == 1
+        npt.assert_almost_equal(arrays['var_noise'], [0.5, 0.8, 0.7, 0.9, 1.0, 0.5])
+        npt.assert_almost_equal(arrays['samples_parameters'], [[1.0, 2.0, 3.0, 4.0]])
+
+        gp = GPFittingGaussian.deserialize_arrays(content, arrays, use_only_training_points=False)
+        assert gp.serialize() == expected
+        assert gp.cache_chol_cov == self.gp_3.cache_chol_cov
+        assert gp.cache_sol_chol_y_unbiased == self.gp_3.cache_sol_chol_y_unbiased
+
+        gp = GPFittingGaussian.deserialize_arrays(content, arrays)
+        assert gp.data['points'].shape == (5, 1)
+        assert len(gp.cache_chol_cov) == 0
+
     def test_get_parameters_model(self):
         parameters = self.gp.get_parameters_model
         parameters_values = [parameter.value for parameter in parameters]
@@ -245,6 +369,10 @@ class TestGPFittingGaussian(unittest.TestCase):
         assert np.all(parameters == np.array([var, mean, ls, var]))
 
     def test_cached_data(self):
+        self.gp.clean_cache()
+        hits = self.gp.cache_chol_cov.hits
+        misses = self.gp.cache_chol_cov.misses
+
         self.gp._updated_cached_data((3, 5, 1), -1, SOL_CHOL_Y_UNBIASED)
         assert self.gp.cache_sol_chol_y_unbiased[(3, 5, 1)] == -1
         assert self.gp.cache_sol_chol_y_unbiased.keys() == [(3, 5, 1)]
@@ -253,11 +381,16 @@ class TestGPFittingGaussian(unittest.TestCase):
         self.gp._updated_cached_data((3, 5), 0, CHOL_COV)
         assert self.gp.cache_chol_cov[(3, 5)] == 0
         assert self.gp.cache_chol_cov.keys() == [(3, 5)]
-        assert self.gp.cache_sol_chol_y_unbiased == {}
+        assert self.gp.cache_sol_chol_y_unbiased.keys() == [(3, 5, 1)]
         assert self.gp._get_cached_data((3, 5), CHOL_COV) == 0
 
         assert self.gp._get_cached_data((3, 0), CHOL_COV) is False
 
+        statistics = self.gp.cache_statistics()
+        assert statistics[CHOL_COV]['hits'] == hits + 2
+        assert statistics[CHOL_COV]['misses'] == misses + 1
+        assert statistics[CHOL_COV]['entries'] == 1
+
     def test_chol_cov_including_noise(self):
         chol, cov = self.simple_gp._chol_cov_including_noise(1.0, np.array([1.0, 1.0]))
         assert cov == np.array([[2.0]])
@@ -275,6 +408,17 @@ class TestGPFittingGaussian(unittest.TestCase):
         llh = self.complex_gp.log_likelihood(1.0, 1.0, np.array([1.0, 0.0]))
         assert llh == -0.45814536593707761
 
+    def test_log_likelihood_n_points(self):
+        params = np.array([1.0, 1.0, 10.0, 50.0])
+        llh = self.gp.log_likelihood(params[0], params[1], params[2:], 3)
+
+        training_data = {
+            "evaluations": self.training_data['evaluations'][0:3],
+            "points": self.training_data['points'][0:3],
+            "var_noise": []}
+        gp = GPFittingGaussian([SCALED_KERNEL, MATERN52_NAME], training_data, [1])
+        npt.assert_almost_equal(llh, gp.log_likelihood(params[0], params[1], params[2:]))
+
     def test_grad_log_likelihood(self):
         grad = self.complex_gp_2.grad_log_likelihood(1.0, 1.0, np.array([1.0, 0.0, 0.0, 0.0]))
 
@@ -331,6 +475,31 @@ class TestGPFittingGaussian(unittest.TestCase):
         assert grad_2[1] == grad['mean']
         assert np.all(grad_2[2:] == grad['kernel_params'])
 
+    def test_grad_log_likelihood_dict_shared_inverse(self):
+        var_noise = 1.82
+        mean = 123.1
+        parameters_kernel = np.array([5.0, 1.0, -5.5, 10.0])
+        grad = self.complex_gp_2.grad_log_likelihood_dict(var_noise, mean, parameters_kernel)
+
+        chol, cov = self.complex_gp_2._chol_cov_including_noise(var_noise, parameters_kernel)
+        y_unbiased = self.complex_gp_2.data['evaluations'] - mean
+        solve = np.linalg.solve(cov, y_unbiased)
+        grad_cov = self.complex_gp_2.evaluate_grad_cov(
+            parameters_kernel, self.complex_gp_2.data['points'])
+
+        for i in xrange(len(parameters_kernel)):
+            npt.assert_almost_equal(
+                grad['kernel_params'][i],
+                GradientGPFittingGaussian.compute_gradient_llh_given_grad_cov(
+                    grad_cov[i], chol, solve))
+
+        npt.assert_almost_equal(
+            grad['mean'], GradientGPFittingGaussian.compute_gradient_mean(chol, y_unbiased, 3))
+        npt.assert_almost_equal(
+            grad['var_noise'],
+            GradientGPFittingGaussian.compute_gradient_llh_given_grad_cov(np.identity(3), chol,
+                                                                          solve))
+
     def test_mle_parameters(self):
         # Results compared with the ones given by GPy
 
@@ -443,6 +612,90 @@ class TestGPFittingGaussian(unittest.TestCase):
         value2 = gp2.sample_parameters(1, random_seed=1)[-1]
         assert np.all(gp.start_point_sampler == value2)
 
+    def test_update_chain(self):
+        gp = deepcopy(self.gp)
+        gp.update_chain(5, random_seed=1)
+        assert len(gp.samples_parameters) == 6
+        assert gp.chain_n_points == 5
+        npt.assert_almost_equal(gp.effective_sample_size(5), 5.0)
+
+        gp.add_points_evaluations(np.array([[60.0]]), np.array([55.0]))
+        weights = gp.importance_weights_samples(5)
+        npt.assert_almost_equal(np.sum(weights), 1.0)
+        ess = gp.effective_sample_size(5)
+        assert 2.5 < ess <= 5.0
+
+        samples = gp.samples_parameters[-5:]
+        log_weights = [gp.log_likelihood(sample[0], sample[1], sample[2:]) -
+                       gp.log_likelihood(sample[0], sample[1], sample[2:], 5)
+                       for sample in samples]
+        expect = np.exp(log_weights) / np.sum(np.exp(log_weights))
+        npt.assert_almost_equal(weights, expect)
+
+        gp_2 = deepcopy(gp)
+        gp_2.warm_start_chain = True
+        with patch.object(gp_2, 'start_new_chain', wraps=gp_2.start_new_chain) as mock_chain:
+            gp_2.update_chain(5, random_seed=1)
+        assert mock_chain.call_count == 0
+        assert gp_2.chain_n_points == 6
+        npt.assert_almost_equal(gp_2.effective_sample_size(5), 5.0)
+
+        with patch.object(gp, 'start_new_chain', wraps=gp.start_new_chain) as mock_chain:
+            gp.update_chain(5, random_seed=1)
+        assert mock_chain.call_count == 1
+        assert gp.chain_n_points == 6
+
+    def test_sample_parameters_chains(self):
+        gp = deepcopy(self.gp)
+        gp_2 = deepcopy(self.gp)
+        n_samples = len(gp.samples_parameters)
+        samples = gp.sample_parameters_chains(3, 2, random_seed=1, parallel=False)
+
+        assert len(samples) == 6
+        assert len(gp.samples_parameters) == n_samples + 6
+        npt.assert_almost_equal(gp.samples_parameters[-1], samples[-1])
+        assert len(gp.chains_statistics) == 2
+        for statistics in gp.chains_statistics:
+            assert statistics['n_samples'] == 3 * len(gp.slice_samplers)
+            assert statistics['n_log_prob_evaluations'] > statistics['n_rejected_proposals']
+            assert statistics['time'] >= 0
+
+        np.random.seed(1)
+        random_seeds = np.random.randint(0, 4294967295, 2)
+        np.random.seed(random_seeds[1])
+        chain = self.gp.sample_parameters(3, start_point=self.gp.samples_parameters[-1])
+        for j in xrange(3):
+            npt.assert_almost_equal(samples[2 * j + 1], chain[j])
+
+        samples_2 = gp_2.sample_parameters_chains(3, 2, random_seed=1, parallel=True)
+        npt.assert_almost_equal(np.array(samples_2), np.array(samples))
+
+    def test_start_new_chain_n_chains(self):
+        gp = deepcopy(self.gp)
+        gp.n_chains = 3
+        gp.n_burning = 2
+        last_sample = gp.samples_parameters[-1]
+
+        # The method is patched in the class, because the model is pickled to run the chains.
+        sample_parameters_chains = GPFittingGaussian.sample_parameters_chains
+        with patch.object(GPFittingGaussian, 'sample_parameters_chains', autospec=True,
+                          side_effect=sample_parameters_chains) as mock_chains:
+            gp.start_new_chain(random_seed=1)
+        start_points = mock_chains.call_args[1]['start_points']
+        assert mock_chains.call_args[0] == (gp, 2.0, 3)
+        assert len(start_points) == 3
+        npt.assert_almost_equal(start_points[0], last_sample)
+        assert len(set([tuple(point) for point in start_points])) == 3
+        assert len(gp.samples_parameters) == 3
+        assert len(gp.chains_statistics) == 3
+        assert gp.chain_n_points == 5
+
+        with patch.object(GPFittingGaussian, 'sample_parameters_chains', autospec=True,
+                          side_effect=sample_parameters_chains) as mock_chains:
+            gp.update_chain(5, random_seed=1)
+        assert mock_chains.call_args[0] == (gp, 2, 3)
+        assert len(gp.samples_parameters) == 3 + 2 * 3
+
     def test_sample_parameters_posterior(self):
         start = self.gp.samples_parameters[-1]
         sample = self.gp.sample_parameters_posterior(1, 1)
@@ -553,6 +806,25 @@ class TestGPFittingGaussian(unittest.TestCase):
         npt.assert_almost_equal(mean, np.array([0.30891226, 0.60256237]))
         npt.assert_almost_equal(cov, np.array([[0.48844879, 0.16799927], [0.16799927, 0.16536313]]))
 
+        z_diag = gp.compute_posterior_parameters(new_point, diag_only=True)
+        npt.assert_almost_equal(z_diag['mean'], mean)
+        npt.assert_almost_equal(z_diag['cov'], np.diag(cov))
+
+    def test_posterior_mean_many(self):
+        points = np.array([[1.0], [30.0], [97.5]])
+        values = self.gp.posterior_mean_many(points)
+        values_samples = self.gp.posterior_mean_many(points, n_samples_parameters=1)
+
+        params = self.gp.samples_parameters[-1]
+        for i in xrange(3):
+            point = points[i:i + 1, :]
+            npt.assert_almost_equal(
+                values[i], self.gp.compute_posterior_parameters(point, only_mean=True)['mean'][0])
+            npt.assert_almost_equal(
+                values_samples[i],
+                self.gp.compute_posterior_parameters(point, params[0], params[1], params[2:],
+                                                     only_mean=True)['mean'][0])
+
     def test_sample_new_observations(self):
         np.random.seed(5)
         n_points = 10
@@ -29,6 +29,7 @@ from stratified_bayesian_optimization.services.domain import (
     DomainService,
 )
 from stratified_bayesian_optimization.util.json_file import JSONFile
+from stratified_bayesian_optimization.lib.util import wrapper_objective_posterior_mean_bq
 
 
 class TestBayesianQuadrature(unittest.TestCase):
@@ -149,6 +150,80 @@ class TestBayesianQuadrature(unittest.TestCase):
 
         assert value[1] == np.mean([value_1, value_2])
 
+    def test_factorized_quadrature(self):
+        assert self.gp_2.factorized_quadrature
+        assert not BayesianQuadrature(self.complex_gp_2, [1], UNIFORM_FINITE,
+                                      {TASKS: 2}).factorized_quadrature
+
+        parameters_kernel = np.array([0.5, 0.2, -0.3, 0.1])
+        points = np.array([[41.0], [42.5], [43.0]])
+        points_2 = np.array([[42.2851784656, 0], [42.3851784656, 1], [41.5, 1]])
+        candidate_point = np.array([[41.7, 1]])
+
+        values = []
+        for factorized in [True, False]:
+            self.gp_2.factorized_quadrature = factorized
+            values.append([
+                self.gp_2.evaluate_quadrate_cov(points[0:1, :], parameters_kernel),
+                self.gp_2.evaluate_quadrature_cross_cov(points, points_2, parameters_kernel),
+                self.gp_2.evaluate_quadrature_cross_cov(
+                    points[0:1, :], points_2, parameters_kernel),
+                self.gp_2.evaluate_grad_quadrature_cross_cov(
+                    points[0:1, :], points_2, parameters_kernel),
+                self.gp_2.evaluate_hessian_cross_cov(points[0:1, :], points_2, parameters_kernel),
+                self.gp_2.evaluate_grad_quadrature_cross_cov_resp_candidate(
+                    candidate_point, points, parameters_kernel),
+            ])
+
+        for value, expect in zip(values[0], values[1]):
+            assert np.shape(value) == np.shape(expect)
+            npt.assert_almost_equal(value, expect, decimal=12)
+
+    def test_matern52_derivatives_respect_point(self):
+        parameters_kernel = np.array([0.5, 0.2, -0.3, 0.1])
+        point = np.array([[41.0]])
+        points_2 = np.array([[42.2851784656, 0], [42.3851784656, 1], [41.5, 1]])
+
+        hessian = self.gp_2.evaluate_hessian_cross_cov(point, points_2, parameters_kernel)
+
+        with patch.object(Matern52, 'derivatives_respect_point_from_params') as derivatives:
+            gradient = self.gp_2.evaluate_grad_quadrature_cross_cov(
+                point, points_2, parameters_kernel)
+            cov = self.gp_2.evaluate_quadrature_cross_cov(point, points_2, parameters_kernel)
+            assert derivatives.call_count == 0
+
+        self.gp_2.factorized_quadrature = False
+        npt.assert_almost_equal(
+            hessian, self.gp_2.evaluate_hessian_cross_cov(point, points_2, parameters_kernel))
+        npt.assert_almost_equal(
+            gradient,
+            self.gp_2.evaluate_grad_quadrature_cross_cov(point, points_2, parameters_kernel))
+        npt.assert_almost_equal(
+            cov, self.gp_2.evaluate_quadrature_cross_cov(point, points_2, parameters_kernel))
+
+    def test_evaluate_quadrate_cov_diagonal(self):
+        parameters_kernel = np.array([0.5, 0.2, -0.3, 0.1])
+        points = np.array([[41.0], [42.5], [97.5]])
+
+        expect = [np.ravel(self.gp_2.evaluate_quadrate_cov(points[i:i + 1, :],
+                                                           parameters_kernel))[0]
+                  for i in xrange(points.shape[0])]
+
+        for factorized in [True, False]:
+            self.gp_2.factorized_quadrature = factorized
+            value = self.gp_2.evaluate_quadrate_cov_diagonal(points, parameters_kernel)
+            assert value.shape == (3,)
+            npt.assert_almost_equal(value, expect)
+
+    def test_compute_posterior_parameters_diag_only(self):
+        points = np.array([[42.0], [42.1], [41.0], [97.5]])
+        value = self.gp_2.compute_posterior_parameters(points, cache=False, diag_only=True)
+
+        for i in xrange(points.shape[0]):
+            expect = self.gp_2.compute_posterior_parameters(points[i:i + 1, :], cache=False)
+            npt.assert_almost_equal(value['mean'][i], expect['mean'][0])
+            npt.assert_almost_equal(value['cov'][i], expect['cov'])
+
     def test_compute_posterior_parameters_kg(self):
         points = np.array([[42.0], [42.1], [41.0]])
         candidate_point = np.array([[41.0, 0]])
@@ -171,6 +246,36 @@ class TestBayesianQuadrature(unittest.TestCase):
         npt.assert_almost_equal(np.mean(a_n), value['a'][2], decimal=1)
         npt.assert_almost_equal(np.var(a_n),  (value['b'][2]) ** 2, decimal=1)
 
+    def test_compute_posterior_parameters_kg_new_points(self):
+        points = np.array([[42.0], [42.1], [41.0]])
+        candidate_point = np.array([[41.0, 0]])
+        self.gp_2.compute_posterior_parameters_kg(points, candidate_point, parallel=False)
+
+        self.gp_2.clean_cache()
+        self.gp_2.gp.add_points_evaluations(np.array([[41.5, 1]]), np.array([1.05]))
+
+        with patch.object(self.gp_2, 'compute_vectors_b',
+                          wraps=self.gp_2.compute_vectors_b) as mock_vectors:
+            value = self.gp_2.compute_posterior_parameters_kg(points, candidate_point,
+                                                              parallel=False)
+
+        calls_vec_covs = [call for call in mock_vectors.call_args_list if call[0][4]]
+        assert len(calls_vec_covs) == 1
+        npt.assert_almost_equal(calls_vec_covs[0][0][2], np.array([[41.5, 1]]))
+
+        parameters_kernel = self.gp_2.gp.kernel.hypers_values_as_array
+        vec_covs = self.gp_2.get_vec_covs(True, points, parameters_kernel, candidate_point,
+                                          False)[0]
+        assert vec_covs.shape == (3, 3)
+        npt.assert_almost_equal(
+            vec_covs, self.gp_2.evaluate_quadrature_cross_cov(
+                points, self.gp_2.gp.data['points'], parameters_kernel))
+
+        expect = self.gp_2.compute_posterior_parameters_kg(points, candidate_point, cache=False,
+                                                           parallel=False)
+        npt.assert_almost_equal(value['a'], expect['a'])
+        npt.assert_almost_equal(value['b'], expect['b'])
+
     def test_gradient_posterior_mean(self):
         gp = self.gp_complete
 
@@ -203,6 +308,15 @@ class TestBayesianQuadrature(unittest.TestCase):
 
         npt.assert_almost_equal(finite_diff[0], gradient[0], decimal=5)
 
+    def test_objective_and_grad_posterior_mean(self):
+        gp = self.gp_complete
+
+        point = np.array([80.5])
+        value, gradient = gp.objective_and_grad_posterior_mean(point)
+
+        npt.assert_almost_equal(value, gp.objective_posterior_mean(point))
+        npt.assert_almost_equal(gradient, gp.grad_posterior_mean(point))
+
     def test_optimize_posterior_mean(self):
         gp = self.gp_complete
 
@@ -370,6 +484,19 @@ class TestBayesianQuadrature(unittest.TestCase):
 
         npt.assert_almost_equal(val_1, val_2)
 
+    def test_posterior_mean_many(self):
+        points = np.array([[97.5], [5.1], [50.0]])
+        values = self.gp_complete.posterior_mean_many(points)
+        values_samples = self.gp_complete.posterior_mean_many(points, n_samples_parameters=3)
+
+        for i in xrange(3):
+            npt.assert_almost_equal(
+                values[i], self.gp_complete.objective_posterior_mean(points[i, :])[0])
+            npt.assert_almost_equal(
+                values_samples[i],
+                wrapper_objective_posterior_mean_bq(points[i, :], self.gp_complete,
+                                                    n_samples_parameters=3)[0])
+
     def test_evaluate_grad_posterior_mean_params(self):
         point = np.array([[97.5]])
 
@@ -441,7 +568,7 @@ class TestBayesianQuadrature(unittest.TestCase):
         dh = 0.01
         finite_diff = FiniteDifferences.second_order_central(
             lambda x: self.gp_complete_2.compute_parameters_for_sample(
-                x.reshape((1, len(point))), candidate_point, clear_cache=False)['a'],
+                x.reshape((1, len(point))), candidate_point)['a'],
             point[0, :], np.array([dh])
         )
 
@@ -450,7 +577,7 @@ class TestBayesianQuadrature(unittest.TestCase):
         dh = 0.1
         finite_diff = FiniteDifferences.second_order_central(
             lambda x: self.gp_complete_2.compute_parameters_for_sample(
-                x.reshape((1, len(point))), candidate_point, clear_cache=False)['b'],
+                x.reshape((1, len(point))), candidate_point)['b'],
             point[0, :], np.array([dh])
         )
 
@@ -475,3 +602,35 @@ class TestBayesianQuadrature(unittest.TestCase):
 
         npt.assert_almost_equal(finite_diff[(0, 0)], hessian[0, 0])
 
+
+    def test_get_parameters_for_samples_batch(self):
+        gp = self.gp_2
+        params_kernel = gp.gp.kernel.hypers_values_as_array
+        parameters = [
+            np.concatenate(([0.5, 1.0], params_kernel)),
+            np.concatenate(([0.1, 2.0], 1.5 * params_kernel)),
+            np.concatenate(([1.0, 0.0], 0.5 * params_kernel)),
+        ]
+        candidate_point = np.array([[42.25, 1]])
+
+        batch = gp.get_parameters_for_samples_batch(candidate_point, parameters, cache=False)
+
+        for i, parameter in enumerate(parameters):
+            value = gp.get_parameters_for_samples(
+                False, candidate_point, parameter[2:], parameter[0], parameter[1])
+            npt.assert_almost_equal(batch['gamma'][i, :], value['gamma'][:, 0])
+            npt.assert_almost_equal(batch['solve_2'][i, :], value['solve_2'][:, 0])
+            npt.assert_almost_equal(batch['denominator'][i], value['denominator'][0])
+            npt.assert_almost_equal(batch['chol'][i, :, :], value['chol'])
+            npt.assert_almost_equal(batch['solve'][i, :], value['solve'])
+        assert len(gp.cache_sample) == 0
+
+        gp.get_parameters_for_samples_batch(candidate_point, parameters[0:2])
+        assert len(gp.cache_sample) == 2
+        assert len(gp.gp.cache_chol_cov) == 2
+
+        batch_2 = gp.get_parameters_for_samples_batch(candidate_point, parameters)
+        for key in ['gamma', 'solve_2', 'denominator', 'chol', 'solve']:
+            npt.assert_almost_equal(batch_2[key], batch[key])
+        assert len(gp.cache_sample) == 3
+        assert len(gp.gp.cache_chol_cov) == 3
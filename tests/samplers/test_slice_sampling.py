@@ -9,6 +9,7 @@ from stratified_bayesian_optimization.lib.sample_functions import SampleFunction
 from stratified_bayesian_optimization.kernels.matern52 import Matern52
 from stratified_bayesian_optimization.kernels.scaled_kernel import ScaledKernel
 from stratified_bayesian_optimization.models.gp_fitting_gaussian import GPFittingGaussian
+from stratified_bayesian_optimization.samplers.slice_sampling import SliceSampling
 from stratified_bayesian_optimization.lib.constant import (
     MATERN52_NAME,
     SIGMA2_NAME,
@@ -64,6 +65,25 @@ class TestSliceSampling(unittest.TestCase):
         new_point = self.gp_gaussian_2.sample_parameters(1, point, 1)[0]
         npt.assert_almost_equal(new_point, benchmark_point)
 
+    def test_statistics(self):
+        np.random.seed(1)
+        sampler = SliceSampling(lambda point: -0.5 * np.sum(point ** 2), [0, 1])
+
+        point = np.array([0.1, 0.7])
+        for i in xrange(2):
+            point = sampler.slice_sample(point, None)
+
+        statistics = sampler.statistics()
+        assert statistics['n_samples'] == 2
+        assert statistics['n_log_prob_evaluations'] >= 2 + statistics['n_rejected_proposals']
+
+        sampler.reset_statistics()
+        assert sampler.statistics() == {
+            'n_samples': 0,
+            'n_rejected_proposals': 0,
+            'n_log_prob_evaluations': 0,
+        }
+
     def test_acceptable(self):
         sampler = self.gp_gaussian.slice_samplers[0]
 
@@ -1,11 +1,14 @@
 import unittest
+import shutil
+import tempfile
 
-from mock import create_autospec
+from mock import create_autospec, MagicMock, patch
 from doubles import expect
 
 import numpy.testing as npt
 
 from copy import deepcopy
+from os import path
 
 import numpy as np
 
@@ -14,6 +17,10 @@ from stratified_bayesian_optimization.services.domain import DomainService
 from stratified_bayesian_optimization.entities.run_spec import RunSpecEntity
 from stratified_bayesian_optimization.entities.domain import BoundsEntity, DomainEntity
 from stratified_bayesian_optimization.util.json_file import JSONFile
+from stratified_bayesian_optimization.entities.objective import Objective
+from stratified_bayesian_optimization.services.gp_fitting import GPFittingService
+from stratified_bayesian_optimization.lib.async_evaluations import AsyncEvaluations
+from stratified_bayesian_optimization.lib.parallel import Parallel
 from stratified_bayesian_optimization.lib.constant import (
     SCALED_KERNEL,
     MATERN52_NAME,
@@ -29,6 +36,12 @@ from stratified_bayesian_optimization.numerical_tools.bayesian_quadrature import
 from stratified_bayesian_optimization.acquisition_functions.sbo import SBO
 
 
+def posterior_mean(x, gp_model):
+    cached = len(gp_model.cache_chol_cov.keys()) > 0
+    mean = gp_model.compute_posterior_parameters(np.array([[x, 0.0]]), only_mean=True)['mean']
+    return cached, mean[0]
+
+
 class TestBGOService(unittest.TestCase):
 
     def setUp(self):
@@ -186,6 +199,205 @@ class TestBGOService(unittest.TestCase):
         assert 1 == 1
      #   assert z['optimal_solution'] == np.array([100.0])
 
+    def test_pipelined_evaluations(self):
+        gp = GPFittingGaussian(
+            [PRODUCT_KERNELS_SEPARABLE, MATERN52_NAME, TASKS_KERNEL_NAME],
+            deepcopy(self.training_data), [2, 1, 2], bounds_domain=[[0, 100], [0, 1]],
+            type_bounds=[0, 1], var_noise_value=[self.params[0]], mean_value=[self.params[1]],
+            kernel_values=list(self.params[2:]))
+
+        bgo = BGO.__new__(BGO)
+        bgo.gp_model = gp
+        bgo.n_samples = 0
+        bgo.objective = MagicMock(noise=False, name_module='problems.test_problem.main')
+        bgo.acquisition_function = MagicMock()
+        bgo.evaluations_queue = AsyncEvaluations(n_in_flight=1, threads=True)
+
+        point = np.array([50.0, 1.0])
+        believed = gp.compute_posterior_parameters(point.reshape((1, 2)), only_mean=True)['mean']
+
+        bgo._submit_evaluation(point)
+        assert len(gp.data['evaluations']) == 6
+        npt.assert_almost_equal(gp.data['evaluations'][-1], believed[0])
+
+        bgo._submit_evaluation(np.array([60.0, 0.0]))
+        npt.assert_almost_equal(gp.data['evaluations'][-2], 51.0)
+
+        bgo._collect_evaluations(block=True)
+        npt.assert_almost_equal(gp.data['evaluations'][-1], 60.0)
+        assert bgo.evaluations_queue.n_pending == 0
+        assert bgo.acquisition_function.clean_cache.call_count == 2
+        bgo.evaluations_queue.close()
+
+    def test_evaluate_batch(self):
+        gp = GPFittingGaussian(
+            [PRODUCT_KERNELS_SEPARABLE, MATERN52_NAME, TASKS_KERNEL_NAME],
+            deepcopy(self.training_data), [2, 1, 2], bounds_domain=[[0, 100], [0, 1]],
+            type_bounds=[0, 1])
+
+        bgo = BGO.__new__(BGO)
+        bgo.gp_model = gp
+        bgo.n_samples = 0
+        bgo.parallel = True
+        bgo.objective = MagicMock(noise=False, name_module='problems.test_problem.main')
+
+        bgo._evaluate_batch(np.array([[50.0, 1.0], [60.0, 0.0]]))
+        npt.assert_almost_equal(gp.data['evaluations'][-2:], [51.0, 60.0])
+        npt.assert_almost_equal(gp.data['points'][-2:, :], [[50.0, 1.0], [60.0, 0.0]])
+
+    def test_optimize_with_pool(self):
+        gp = GPFittingGaussian(
+            [PRODUCT_KERNELS_SEPARABLE, MATERN52_NAME, TASKS_KERNEL_NAME],
+            deepcopy(self.training_data), [2, 1, 2], bounds_domain=[[0, 100], [0, 1]],
+            type_bounds=[0, 1], var_noise_value=[self.params[0]], mean_value=[self.params[1]],
+            kernel_values=list(self.params[2:]))
+        mean = gp.compute_posterior_parameters(np.array([[20.0, 0.0]]), only_mean=True)['mean']
+
+        bgo = BGO.__new__(BGO)
+        bgo.gp_model = gp
+        bgo.parallel = True
+
+        def optimize(**kwargs):
+            assert kwargs == {'n_restarts': 1}
+            arrays_dir = Parallel._arrays_dir
+            result = Parallel.run_function_different_arguments_parallel(
+                posterior_mean, {0: 20.0}, True, None, True, 0, gp)
+            return arrays_dir, result[0]
+
+        with patch.object(BGO, '_optimize', side_effect=optimize):
+            arrays_dir, result = bgo._optimize_with_pool(n_restarts=1)
+            assert arrays_dir is None
+            assert not result[0]
+            npt.assert_almost_equal(result[1], mean[0])
+
+            arrays_dir, result = bgo._optimize_with_pool(shared_memory=True, n_restarts=1)
+            assert arrays_dir is not None
+            assert result[0]
+            npt.assert_almost_equal(result[1], mean[0])
+
+        assert Parallel._pool is None
+
+    def test_checkpoint(self):
+        dir = tempfile.mkdtemp()
+
+        def build_bgo():
+            gp = GPFittingGaussian(
+                [PRODUCT_KERNELS_SEPARABLE, MATERN52_NAME, TASKS_KERNEL_NAME],
+                deepcopy(self.training_data), [2, 1, 2], bounds_domain=[[0, 100], [0, 1]],
+                type_bounds=[0, 1])
+            bgo = BGO.__new__(BGO)
+            bgo.gp_model = gp
+            bgo.quadrature = BayesianQuadrature(gp, [0], UNIFORM_FINITE, {TASKS: 2})
+            bgo.acquisition_function = MagicMock()
+            bgo.objective = MagicMock()
+            bgo.checkpoint_path = path.join(dir, 'results.checkpoint')
+            return bgo
+
+        bgo = build_bgo()
+        assert bgo._restore_checkpoint() is None
+
+        bgo.gp_model.add_points_evaluations(np.array([[50.0, 1.0]]), np.array([51.0]))
+        bgo.gp_model.update_value_parameters(self.params)
+        bgo.gp_model.samples_parameters = [np.array(self.params), np.array(self.params) + 1.0]
+        bgo.gp_model.chain_n_points = 5
+        bgo.gp_model.compute_posterior_parameters(np.array([[20.0, 0.0]]))
+
+        key = (1.0, 2.0, (3.0, 4.0, 5.0, 6.0))
+        bgo.quadrature.optimal_solutions = {
+            key: [{'solution': np.array([10.0]), 'optimal_value': [2.0]}]}
+        bgo.quadrature.max_mean = {key: 2.0}
+        bgo.objective.serialize.return_value = {
+            'evaluated_points': [[10.0]],
+            'objective_values': [10.5],
+            'model_objective_values': [2.0],
+            'standard_deviation_evaluations': [],
+        }
+
+        np.random.seed(1)
+        bgo._write_checkpoint(1, {'solution': np.array([10.0]), 'optimal_value': [2.0]}, 10.5)
+        value = np.random.uniform()
+
+        bgo_2 = build_bgo()
+        state = bgo_2._restore_checkpoint()
+
+        assert state['iteration'] == 1
+        assert state['optimal_value'] == 10.5
+        npt.assert_almost_equal(state['optimize_mean']['solution'], [10.0])
+        assert np.random.uniform() == value
+
+        gp = bgo_2.gp_model
+        assert gp.serialize() == bgo.gp_model.serialize()
+        assert gp.chain_n_points == 5
+        assert gp.cache_chol_cov.keys() == bgo.gp_model.cache_chol_cov.keys()
+        npt.assert_almost_equal(
+            gp.compute_posterior_parameters(np.array([[20.0, 0.0]]))['mean'],
+            bgo.gp_model.compute_posterior_parameters(np.array([[20.0, 0.0]]))['mean'])
+
+        assert bgo_2.quadrature.max_mean == {key: 2.0}
+        npt.assert_almost_equal(bgo_2.quadrature.optimal_solutions[key][0]['solution'], [10.0])
+        assert bgo_2.objective.objective_values == [10.5]
+        bgo_2.objective.compact.assert_called_once_with()
+        bgo_2.acquisition_function.clean_cache.assert_called_once_with(keep_factors=True)
+
+        with self.assertRaises(ValueError):
+            bgo_2.optimize(n_in_flight=2, checkpoint=True)
+
+        shutil.rmtree(dir)
+
+    def test_from_spec_resume(self):
+        dir = tempfile.mkdtemp()
+        file_path = path.join(dir, 'results.json')
+
+        training_data = {
+            'evaluations': self.training_data['evaluations'][0:4],
+            'points': self.training_data['points'][0:4],
+            'var_noise': [],
+        }
+        gp = GPFittingGaussian(
+            [PRODUCT_KERNELS_SEPARABLE, MATERN52_NAME, TASKS_KERNEL_NAME],
+            training_data, [2, 1, 2], bounds_domain=[[0, 100], [0, 1]],
+            type_bounds=[0, 1], training_name='test_bgo', problem_name='test_problem_with_tasks')
+        gp.add_points_evaluations(np.array([[50.0, 1.0]]), np.array([51.0]))
+        gp.update_value_parameters(self.params)
+        gp.samples_parameters = [np.array(self.params), np.array(self.params) + 1.0]
+        gp.chain_n_points = 6
+
+        bgo = BGO.__new__(BGO)
+        bgo.gp_model = gp
+        bgo.quadrature = None
+        bgo.objective = MagicMock()
+        bgo.objective.serialize.return_value = {
+            'evaluated_points': [[50.0]],
+            'objective_values': [51.0],
+            'model_objective_values': [51.0],
+            'standard_deviation_evaluations': [],
+        }
+        bgo.checkpoint_path = BGO._get_checkpoint_path(file_path)
+        bgo._write_checkpoint(1, {'solution': np.array([50.0]), 'optimal_value': [51.0]}, 51.0)
+
+        spec = deepcopy(self.spec)
+        spec.resume = True
+
+        with patch.object(Objective, 'get_file_path', return_value=file_path), \
+                patch.object(GPFittingService, 'get_gp') as get_gp, \
+                patch.object(GPFittingGaussian, 'train') as train, \
+                patch.object(GPFittingGaussian, 'sample_parameters') as sample_parameters, \
+                patch.object(GPFittingGaussian, 'sample_parameters_chains') as sample_chains:
+            bgo_2 = BGO.from_spec(spec)
+
+        get_gp.assert_not_called()
+        train.assert_not_called()
+        sample_parameters.assert_not_called()
+        sample_chains.assert_not_called()
+
+        gp_2 = bgo_2.gp_model
+        assert gp_2.serialize() == gp.serialize()
+        assert gp_2.chain_n_points == 6
+        assert bgo_2.quadrature.gp is gp_2
+        assert bgo_2.checkpoint_path == bgo.checkpoint_path
+
+        shutil.rmtree(dir)
+
     def test_optimize_2(self):
         bgo_2 = BGO.from_spec(self.spec_2)
         sol = bgo_2.optimize(random_seed=1, n_restarts=1)
@@ -1,15 +1,19 @@
 import unittest
+import shutil
+import tempfile
 
 from doubles import expect
 import numpy.testing as npt
 
 from mock import patch
+from os import path, mkdir
 
 import numpy as np
 
 from stratified_bayesian_optimization.services.gp_fitting import GPFittingService
 from stratified_bayesian_optimization.models.gp_fitting_gaussian import GPFittingGaussian
 from stratified_bayesian_optimization.util.json_file import JSONFile
+from stratified_bayesian_optimization.util.json_journal import JSONJournal
 from stratified_bayesian_optimization.lib.constant import (
     MATERN52_NAME,
     PRODUCT_KERNELS_SEPARABLE,
@@ -32,6 +36,86 @@ class TestGpFitting(unittest.TestCase):
                'Kernel_Matern52_training.json'
         assert name == file
 
+    @patch('os.mkdir', new=mkdir)
+    def test_write_gp_model(self):
+        dir = tempfile.mkdtemp()
+        training_data = {
+            "evaluations": [42.2851784656, 72.3121248508, 1.0113231069],
+            "points": [[42.2851784656], [72.3121248508], [1.0113231069]],
+            "var_noise": []}
+        gp = GPFittingGaussian([SCALED_KERNEL, MATERN52_NAME], training_data, [1],
+                               bounds_domain=[[0, 100]], problem_name=self.problem_name,
+                               training_name=self.trainining_name)
+
+        with patch('stratified_bayesian_optimization.services.gp_fitting.GP_DIR', dir):
+            GPFittingService.write_gp_model(gp)
+            gp.add_points_evaluations(np.array([[50.0]]), np.array([50.0]))
+            gp.samples_parameters.append(np.array([1.0, 2.0, 3.0, 4.0]))
+            GPFittingService.write_gp_model(gp)
+
+            gp_path = path.join(dir, self.problem_name, GPFittingService._get_filename_modified(
+                GPFittingGaussian, self.problem_name, gp.type_kernel, self.trainining_name,
+                'sbo', 0))
+
+            assert len(JSONJournal.read_records(gp_path)) == 1
+            data = JSONFile.read(gp_path)
+            assert len(data['data']['evaluations']) == 3
+
+            expected = gp.serialize()
+            expected['samples_parameters'][0] = data['samples_parameters'][0]
+            assert GPFittingService.read_gp_model(gp_path) == expected
+
+            gp.replace_evaluations(np.array([3]), np.array([51.0]))
+            GPFittingService.write_gp_model(gp)
+            assert JSONJournal.read_records(gp_path) == []
+            assert JSONFile.read(gp_path)['data']['evaluations'][3] == 51.0
+
+            gp.add_points_evaluations(np.array([[60.0]]), np.array([60.0]))
+            GPFittingService.write_gp_model(gp)
+            journal = GPFittingService._journals[gp_path][0]
+            assert journal._file is not None
+
+            with patch('stratified_bayesian_optimization.services.gp_fitting.MAX_OPEN_JOURNALS',
+                       1):
+                GPFittingService.write_gp_model(gp, method='ei')
+            assert gp_path not in GPFittingService._journals
+            assert journal._file is None
+
+            GPFittingService.close_journals()
+            assert GPFittingService._journals == {}
+
+        shutil.rmtree(dir)
+
+    @patch('os.mkdir', new=mkdir)
+    def test_write_gp_model_arrays(self):
+        dir = tempfile.mkdtemp()
+        training_data = {
+            "evaluations": [42.2851784656, 72.3121248508, 1.0113231069],
+            "points": [[42.2851784656], [72.3121248508], [1.0113231069]],
+            "var_noise": []}
+        gp = GPFittingGaussian([SCALED_KERNEL, MATERN52_NAME], training_data, [1],
+                               bounds_domain=[[0, 100]], problem_name=self.problem_name,
+                               training_name=self.trainining_name)
+        gp.add_points_evaluations(np.array([[50.0]]), np.array([50.0]))
+        gp.compute_posterior_parameters(np.array([[20.0]]))
+
+        with patch('stratified_bayesian_optimization.services.gp_fitting.GP_DIR', dir):
+            assert GPFittingService.read_gp_model_arrays(
+                self.problem_name, gp.type_kernel, self.trainining_name) is None
+
+            directory = GPFittingService.write_gp_model_arrays(gp, cached_factors=True)
+            assert directory.endswith('_sbo_samples_parameters_0.npy_model')
+
+            model = GPFittingService.read_gp_model_arrays(
+                self.problem_name, gp.type_kernel, self.trainining_name)
+
+        assert model.serialize() == gp.serialize()
+        assert model.cache_chol_cov.keys() == gp.cache_chol_cov.keys()
+        index = gp.cache_chol_cov.keys()[0]
+        npt.assert_almost_equal(model.cache_chol_cov[index][0], gp.cache_chol_cov[index][0])
+
+        shutil.rmtree(dir)
+
     def test_get_gp(self):
         name_model = 'gp_fitting_gaussian'
         dimensions = [1]
@@ -64,6 +148,7 @@ class TestGpFitting(unittest.TestCase):
             'bounds_domain': bounds,
             'n_burning': 0,
             'max_steps_out': 1,
+            'n_chains': 1,
             'type_bounds': [0],
             'name_model': 'gp_fitting_gaussian',
             'problem_name': 'test_problem',
@@ -100,6 +185,7 @@ class TestGpFitting(unittest.TestCase):
             'bounds_domain': [[-5, 5], [0, 1]],
             'n_burning': 0,
             'max_steps_out': 1,
+            'n_chains': 1,
             'type_bounds': [0, 1],
             'name_model': 'gp_fitting_gaussian',
             'problem_name': 'test_problem_with_tasks',
@@ -136,6 +222,7 @@ class TestGpFitting(unittest.TestCase):
             'bounds_domain': bounds,
             'n_burning': 0,
             'max_steps_out': 1,
+            'n_chains': 1,
             'type_bounds': [0],
             'name_model': 'gp_fitting_gaussian',
             'problem_name': 'test_problem',
@@ -191,7 +278,9 @@ class TestGpFitting(unittest.TestCase):
             'random_seed': 1
         }
 
-        gp_2 = GPFittingService.from_dict(spec)
+        with patch.object(GPFittingService, 'read_gp_model') as mock_read:
+            gp_2 = GPFittingService.from_dict(spec)
+        assert mock_read.call_count == 0
 
         model_2 = gp_2.serialize()
 
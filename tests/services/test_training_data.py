@@ -57,6 +57,26 @@ class TestTrainingDataService(unittest.TestCase):
             assert np.all(training_data['evaluations'] == training_data_['evaluations'])
             assert np.all(training_data['points'] == training_data_['points'])
 
+    def test_get_training_data_journal(self):
+        problem_name = 'test_problem'
+        training_name = 'test_journal'
+        bounds_domain = [[1, 100]]
+        points = [[1.0], [2.0], [3.0]]
+        journal_path = os.path.join('problems', problem_name, 'data',
+                                    'training_data_test_problem_test_journal_3_0.json.journal')
+
+        with open(journal_path, 'w') as f:
+            f.write('{"point": [2.0], "output": [20.0], "time": 1.0}\n')
+
+        expect(JSONFile).read.and_return(None)
+        expect(JSONFile).write.once()
+        training_data = \
+            TrainingDataService.get_training_data(problem_name, training_name, bounds_domain,
+                                                  points=points, parallel=False)
+
+        assert training_data['evaluations'] == [1.0, 20.0, 3.0]
+        assert not os.path.exists(journal_path)
+
     def test_cached_get_training_data(self):
         problem_name = 'test_problem'
         training_name = 'test'
@@ -0,0 +1,68 @@
+import unittest
+import shutil
+import tempfile
+
+from os import path
+
+from stratified_bayesian_optimization.util.json_file import JSONFile
+from stratified_bayesian_optimization.util.json_journal import JSONJournal
+
+
+def apply_record(data, record):
+    if data is None:
+        data = []
+    return data + [record['value']]
+
+
+class TestJSONJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = path.join(self.dir, 'test.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_append(self):
+        journal = JSONJournal(self.filename, fsync_interval=2)
+        assert JSONJournal.read(self.filename, apply_record) is None
+
+        journal.append({'value': 1.0})
+        assert journal.n_unsynced == 1
+        journal.append({'value': 0.1234567890123})
+        assert journal.n_unsynced == 0
+
+        assert JSONJournal.read_records(self.filename) == \
+            [{'value': 1.0}, {'value': 0.1234567890123}]
+        assert JSONJournal.read(self.filename, apply_record) == [1.0, 0.1234567890123]
+
+    def test_compact(self):
+        journal = JSONJournal(self.filename)
+        journal.append({'value': 1.0})
+        journal.compact([1.0])
+        journal.append({'value': 2.0})
+
+        assert journal.n_records == 1
+        assert journal.n_compactions == 1
+        assert JSONFile.read(self.filename) == [1.0]
+        assert JSONJournal.read(self.filename, apply_record) == [1.0, 2.0]
+
+        journal.remove()
+        assert not path.exists(journal.journal_path)
+        assert JSONJournal.read(self.filename, apply_record) == [1.0]
+
+    def test_incomplete_record(self):
+        journal = JSONJournal(self.filename)
+        journal.append({'value': 1.0})
+        journal.close()
+
+        with open(journal.journal_path, 'a') as f:
+            f.write('{"val')
+
+        assert JSONJournal.read(self.filename, apply_record) == [1.0]
+
+        journal = JSONJournal(self.filename)
+        journal.append({'value': 2.0})
+        journal.close()
+
+        assert JSONJournal.read(self.filename, apply_record) == [1.0, 2.0]
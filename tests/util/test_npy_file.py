@@ -0,0 +1,85 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from os import path
+from mock import patch
+
+import numpy as np
+import numpy.testing as npt
+
+from stratified_bayesian_optimization.util.npy_file import NPYFile
+
+
+class TestNPYFile(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.directory = path.join(self.dir, 'model.npy_model')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_read(self):
+        assert NPYFile.read(self.directory) is None
+
+    def test_write(self):
+        content = {'value': 0.1234567890123, 'index': [[1.0, [2.0, 3.0]]]}
+        arrays = {'points': np.array([[1.0, 2.0], [3.0, 4.0]]), 'evaluations': np.array([5.0])}
+
+        NPYFile.write(content, arrays, self.directory)
+        content_, arrays_ = NPYFile.read(self.directory)
+
+        assert content_ == content
+        assert sorted(arrays_.keys()) == ['evaluations', 'points']
+        assert isinstance(arrays_['points'], np.memmap)
+        npt.assert_almost_equal(arrays_['points'], arrays['points'])
+
+        arrays_['evaluations'][0] = 6.0
+        NPYFile.write(content, {'evaluations': np.array([7.0])}, self.directory)
+        content_, arrays_ = NPYFile.read(self.directory, mmap_mode=None)
+
+        assert arrays_.keys() == ['evaluations']
+        assert not isinstance(arrays_['evaluations'], np.memmap)
+        npt.assert_almost_equal(arrays_['evaluations'], [7.0])
+        assert not path.exists(self.directory + '.old')
+        assert not path.exists(self.directory + '.tmp')
+
+    def test_interrupted_write(self):
+        rename = os.rename
+
+        def interrupted_rename(source, destination):
+            if source.endswith('.tmp'):
+                raise OSError('interrupted')
+            rename(source, destination)
+
+        NPYFile.write({'value': 1}, {'evaluations': np.array([1.0])}, self.directory)
+
+        with patch('os.rename', new=interrupted_rename):
+            with self.assertRaises(OSError):
+                NPYFile.write({'value': 2}, {'evaluations': np.array([2.0])}, self.directory)
+
+        assert not path.exists(self.directory)
+        content, arrays = NPYFile.read(self.directory)
+        assert content == {'value': 2}
+        npt.assert_almost_equal(arrays['evaluations'], [2.0])
+
+        with open(path.join(self.directory + '.tmp', 'header.json'), 'w') as f:
+            f.write('{"content": {"val')
+        content, arrays = NPYFile.read(self.directory)
+        assert content == {'value': 1}
+        npt.assert_almost_equal(arrays['evaluations'], [1.0])
+
+        NPYFile.write({'value': 3}, {'evaluations': np.array([3.0])}, self.directory)
+        assert NPYFile.read(self.directory)[0] == {'value': 3}
+        assert not path.exists(self.directory + '.old')
+
+        with patch('os.rename', new=interrupted_rename):
+            with self.assertRaises(OSError):
+                NPYFile.write({'value': 4}, {'evaluations': np.array([4.0])}, self.directory)
+        shutil.rmtree(self.directory + '.tmp')
+
+        NPYFile.write({'value': 5}, {'evaluations': np.array([5.0])}, self.directory)
+        assert NPYFile.read(self.directory)[0] == {'value': 5}
+        assert not path.exists(self.directory + '.old')